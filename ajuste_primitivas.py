@@ -0,0 +1,1171 @@
+# -*- coding: utf-8 -*-
+"""
+Ajuste de primitivas geométricas (planos, cilindros y conos) a nubes de puntos mediante RANSAC vectorizado.
+
+Las hipótesis se generan por lotes a partir de tríos de puntos aleatorios, y se evalúan
+todas a la vez con NumPy. El puntaje de cada hipótesis se calcula por bloques de puntos
+sobre un buffer float32 centrado, de esta forma la memoria usada se mantiene acotada
+incluso para mallas de millones de vértices.
+
+La cantidad de hipótesis se adapta a la proporción de inliers del mejor modelo encontrado,
+deteniendo la búsqueda al alcanzar la confianza pedida. Cada ajuste entrega además un reporte
+con iteraciones usadas, proporción de inliers y tiempo por etapa.
+
+Opcionalmente el mejor modelo se refina por mínimos cuadrados (Levenberg-Marquardt) sobre sus inliers,
+en el caso de planos el refinamiento se hace con PCA.
+
+Los ajustes son reproducibles dada una semilla: cada lote de hipótesis usa su propio generador,
+derivado de la semilla con np.random.SeedSequence. Los lotes se pueden repartir entre los procesos del pool
+compartido, evaluándose en rondas de un lote por proceso. Los resultados de cada ronda se recorren en el orden
+de los lotes, deteniéndose igual que en serie, por lo que el resultado no depende de la cantidad de procesos.
+"""
+import uuid
+import timeit
+import numpy as np
+import pool_procesos
+from multiprocessing import shared_memory
+from scipy.optimize import least_squares
+from scipy.spatial import cKDTree
+from typing import Callable, Dict, List, Tuple
+
+# Datos del ajuste en curso dentro de cada proceso trabajador, se cargan una vez por proceso y ajuste
+_DATOS_TRABAJADOR = {}
+
+# Evaluaciones (hipótesis x puntos) bajo las que un ajuste se ejecuta en serie, el envío de los lotes al pool
+# no compensa para ajustes pequeños
+MIN_TRABAJO_PARALELO = 5e7
+
+
+def _normalizar(vectores: np.ndarray) -> np.ndarray:
+    """
+        Normaliza vectores por filas, vectores nulos quedan en cero.
+
+        Parameters
+        ----------
+        vectores : np.ndarray
+            array de vectores con forma (..., 3)
+
+        Returns
+        -------
+        np.ndarray
+            vectores unitarios con la misma forma que la entrada
+    """
+
+    normas = np.linalg.norm(vectores, axis=-1, keepdims=True)
+    return np.divide(vectores, normas, out=np.zeros_like(vectores), where=normas > 0)
+
+
+def _tam_bloque(cant_hipotesis: int, max_elementos: int=4000000) -> int:
+    """
+        Calcula cantidad de puntos por bloque para que las matrices (hipótesis x puntos)
+        no superen max_elementos.
+
+        Parameters
+        ----------
+        cant_hipotesis : int
+            cantidad de hipótesis evaluadas en conjunto
+        max_elementos : int, optional
+            máximo de elementos de las matrices intermedias, by default 4000000
+
+        Returns
+        -------
+        int
+            cantidad de puntos por bloque
+    """
+
+    return max(1024, max_elementos // max(cant_hipotesis, 1))
+
+
+def iteraciones_requeridas(proporcion_inliers: float, confianza: float=0.99, tam_muestra: int=3) -> float:
+    """
+        Calcula la cantidad de hipótesis necesarias para que, con probabilidad confianza,
+        al menos una se haya generado solo con inliers: log(1 - confianza)/log(1 - w^m).
+
+        Parameters
+        ----------
+        proporcion_inliers : float
+            proporción de inliers del mejor modelo encontrado, w
+        confianza : float, optional
+            probabilidad objetivo de haber encontrado el modelo, by default 0.99
+        tam_muestra : int, optional
+            cantidad de puntos usados por hipótesis, m, by default 3
+
+        Returns
+        -------
+        float
+            cantidad de hipótesis requeridas, np.inf si no se puede estimar
+    """
+
+    prob_muestra = proporcion_inliers**tam_muestra
+    if confianza >= 1 or prob_muestra <= 0:
+        return np.inf
+    if prob_muestra >= 1:
+        return 0
+    return np.ceil(np.log(1 - confianza)/np.log(1 - prob_muestra))
+
+
+def _nuevo_reporte() -> Dict:
+    """
+        Crea un reporte vacío de ajuste.
+
+        Returns
+        -------
+        Dict
+            reporte con iteraciones, inliers, y tiempos por etapa en cero
+    """
+
+    return {'iteraciones': 0, 'iteraciones_requeridas': np.inf, 'inliers': 0, 'puntos_evaluados': 0,
+            'proporcion_inliers': 0.0, 'tiempos': {'muestreo': 0.0, 'hipotesis': 0.0, 'puntaje': 0.0, 'refinamiento': 0.0}, 'tiempo_total': 0.0}
+
+
+def formatear_reporte(reporte: Dict) -> str:
+    """
+        Entrega un resumen de una línea del reporte de un ajuste, para imprimir en consola.
+
+        Parameters
+        ----------
+        reporte : Dict
+            reporte entregado por ransac_cilindro o ransac_cono
+
+        Returns
+        -------
+        str
+            resumen del reporte
+    """
+
+    tiempos = ", ".join("{}: {:.3f} s".format(etapa, tiempo) for etapa, tiempo in reporte['tiempos'].items())
+    return "Iteraciones: {} (requeridas: {:.0f}), Inliers: {}/{} ({:.1%}), Tiempo: {:.3f} s ({})".format(
+        reporte['iteraciones'], reporte['iteraciones_requeridas'], reporte['inliers'], reporte['puntos_evaluados'],
+        reporte['proporcion_inliers'], reporte['tiempo_total'], tiempos)
+
+
+def _compartir_datos(datos: Dict) -> Tuple[Dict, List[shared_memory.SharedMemory]]:
+    """
+        Copia los arrays de los datos del ajuste a memoria compartida, para entregarlos a los procesos
+        del pool compartido sin enviarlos con cada lote.
+
+        Parameters
+        ----------
+        datos : Dict
+            datos del ajuste (vértices, normales, umbral, etc.)
+
+        Returns
+        -------
+        Tuple[Dict, List[shared_memory.SharedMemory]]
+            descriptor de los datos (clave del ajuste, arrays en memoria compartida y demás valores),
+            y bloques de memoria compartida creados, que se deben liberar al terminar el ajuste
+    """
+
+    descriptor = {'clave': uuid.uuid4().hex, 'arreglos': {}, 'valores': {}}
+    bloques = []
+    for nombre, valor in datos.items():
+        if isinstance(valor, np.ndarray) and valor.nbytes > 0:
+            bloque = shared_memory.SharedMemory(create=True, size=valor.nbytes)
+            bloques.append(bloque)
+            np.ndarray(valor.shape, dtype=valor.dtype, buffer=bloque.buf)[...] = valor
+            descriptor['arreglos'][nombre] = (bloque.name, valor.shape, valor.dtype.str)
+        else:
+            descriptor['valores'][nombre] = valor
+    return descriptor, bloques
+
+
+def _liberar_datos(bloques: List[shared_memory.SharedMemory]) -> None:
+    """
+        Libera los bloques de memoria compartida de un ajuste.
+
+        Parameters
+        ----------
+        bloques : List[shared_memory.SharedMemory]
+            bloques creados por _compartir_datos
+    """
+
+    for bloque in bloques:
+        bloque.close()
+        bloque.unlink()
+
+
+def _cargar_datos_trabajador(descriptor: Dict) -> None:
+    """
+        Carga en el proceso trabajador los datos del ajuste indicado por el descriptor, si no están cargados.
+        Los arrays son vistas de la memoria compartida, sin copiarlos.
+
+        Parameters
+        ----------
+        descriptor : Dict
+            descriptor entregado por _compartir_datos
+    """
+
+    if _DATOS_TRABAJADOR.get('clave') == descriptor['clave']:
+        return
+
+    bloques = _DATOS_TRABAJADOR.get('bloques', [])
+    _DATOS_TRABAJADOR.clear()
+    for bloque in bloques:
+        bloque.close()
+
+    datos = dict(descriptor['valores'])
+    bloques = []
+    for nombre, (nombre_bloque, forma, tipo) in descriptor['arreglos'].items():
+        bloque = shared_memory.SharedMemory(name=nombre_bloque)
+        bloques.append(bloque)
+        datos[nombre] = np.ndarray(forma, dtype=tipo, buffer=bloque.buf)
+    _DATOS_TRABAJADOR.update({'clave': descriptor['clave'], 'bloques': bloques, 'datos': datos})
+
+
+def _evaluar_lote_trabajador(argumentos: Tuple[Callable, Dict, np.random.SeedSequence, int]) -> Tuple[int, Tuple, Dict]:
+    """
+        Evalúa un lote de hipótesis dentro de un proceso trabajador.
+
+        Parameters
+        ----------
+        argumentos : Tuple[Callable, Dict, np.random.SeedSequence, int]
+            función de lote, descriptor de los datos del ajuste, semilla del lote y cantidad de hipótesis
+
+        Returns
+        -------
+        Tuple[int, Tuple, Dict]
+            puntaje y modelo de la mejor hipótesis del lote, y tiempos por etapa
+    """
+
+    funcion_lote, descriptor, semilla, cantidad = argumentos
+    _cargar_datos_trabajador(descriptor)
+    return funcion_lote(_DATOS_TRABAJADOR['datos'], np.random.default_rng(semilla), cantidad)
+
+
+def _ejecutar_ransac(funcion_lote: Callable, datos: Dict, num_iter: int, tam_lote: int, confianza: float,
+                     max_puntaje: int, semilla_lotes: np.random.SeedSequence, procesos: int,
+                     tiempos: Dict) -> Tuple[int, Tuple, int, float]:
+    """
+        Ejecuta la búsqueda RANSAC por lotes, repartiendo los lotes entre procesos si procesos > 1.
+        Cada lote usa un generador propio derivado de semilla_lotes, y los resultados de cada ronda se recorren
+        en el orden de los lotes, deteniéndose en el primer lote con el que se alcanzan las hipótesis requeridas
+        (los lotes siguientes de la ronda se descartan). De esta forma el resultado y las hipótesis evaluadas
+        dependen solo de la semilla, y son los mismos con cualquier cantidad de procesos.
+        Los procesos son los del pool compartido (pool_procesos), y los datos se les entregan en memoria compartida.
+        Ajustes con menos de MIN_TRABAJO_PARALELO evaluaciones (hipótesis x puntos) se ejecutan en serie.
+
+        Parameters
+        ----------
+        funcion_lote : Callable
+            función (datos, rng, cantidad) -> (puntaje, modelo, tiempos) que genera y evalúa un lote
+        datos : Dict
+            datos del ajuste entregados a funcion_lote
+        num_iter : int
+            cantidad máxima de hipótesis a evaluar
+        tam_lote : int
+            cantidad de hipótesis por lote
+        confianza : float
+            probabilidad objetivo para la detención temprana
+        max_puntaje : int
+            cantidad de puntos evaluados, usada para calcular la proporción de inliers
+        semilla_lotes : np.random.SeedSequence
+            semilla de la que se derivan las semillas de cada lote
+        procesos : int
+            cantidad de procesos a usar
+        tiempos : Dict
+            tiempos por etapa del reporte, se acumulan los tiempos de cada lote usado
+
+        Returns
+        -------
+        Tuple[int, Tuple, int, float]
+            puntaje y modelo de la mejor hipótesis (None si no hay hipótesis válidas),
+            hipótesis evaluadas, e hipótesis requeridas
+    """
+
+    lotes = [min(tam_lote, num_iter - inicio) for inicio in range(0, num_iter, tam_lote)]
+    semillas = semilla_lotes.spawn(len(lotes))
+    ejecutor = None
+    if len(lotes) > 1 and num_iter*max_puntaje >= MIN_TRABAJO_PARALELO:
+        ejecutor = pool_procesos.obtener_ejecutor(procesos)
+    if ejecutor is None:
+        procesos = 1
+    procesos = min(procesos, len(lotes))
+
+    mejor_puntaje = 0
+    mejor_modelo = None
+    requeridas = np.inf
+    evaluadas = 0
+    indice = 0
+    bloques = []
+    try:
+        if ejecutor is not None:
+            descriptor, bloques = _compartir_datos(datos)
+        while indice < len(lotes) and evaluadas < requeridas:
+            ronda = range(indice, min(indice + procesos, len(lotes)))
+            if ejecutor is None:
+                resultados = [funcion_lote(datos, np.random.default_rng(semillas[i]), lotes[i]) for i in ronda]
+            else:
+                resultados = ejecutor.map(_evaluar_lote_trabajador, [(funcion_lote, descriptor, semillas[i], lotes[i]) for i in ronda])
+
+            for i, (puntaje, modelo, tiempos_lote) in zip(ronda, resultados):
+                for etapa, tiempo in tiempos_lote.items():
+                    tiempos[etapa] += tiempo
+                if puntaje > mejor_puntaje:
+                    mejor_puntaje = puntaje
+                    mejor_modelo = modelo
+                    requeridas = iteraciones_requeridas(mejor_puntaje/max_puntaje, confianza)
+                evaluadas += lotes[i]
+                if evaluadas >= requeridas:
+                    break
+            # map entrega los resultados en orden, los lotes descartados de la ronda terminan antes de liberar los datos
+            list(resultados)
+            indice = ronda.stop
+    finally:
+        _liberar_datos(bloques)
+
+    return mejor_puntaje, mejor_modelo, evaluadas, requeridas
+
+
+def hipotesis_cilindro(puntos: np.ndarray, normales: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Calcula eje y radio de un lote de hipótesis de cilindro, cada una a partir de 3 puntos con sus normales.
+        La dirección del eje es el promedio de los productos cruz entre pares de normales.
+        Cada punto define un plano que contiene a su normal y al eje, el punto del eje se obtiene
+        resolviendo por mínimos cuadrados la intersección de los 3 planos, fijando su posición
+        a lo largo del eje en el centroide de los 3 puntos.
+        El radio es el promedio de las distancias de los puntos al eje, distancias menores al 75% de la
+        mayor se reemplazan por la mayor.
+
+        Parameters
+        ----------
+        puntos : np.ndarray
+            puntos de las hipótesis, con forma (H, 3, 3)
+        normales : np.ndarray
+            normales de los puntos de las hipótesis, con forma (H, 3, 3)
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            radios (H,), puntos en el eje (H, 3) y direcciones unitarias del eje (H, 3).
+            Hipótesis degeneradas entregan radio NaN.
+    """
+
+    n1, n2, n3 = normales[:, 0], normales[:, 1], normales[:, 2]
+    direcciones = (np.cross(n1, n2) + np.cross(n1, n3) + np.cross(n2, n3)) / 3
+    direcciones = _normalizar(direcciones)
+
+    # Normales de los planos que contienen al eje, uno por punto
+    normales_planos = _normalizar(np.cross(normales, direcciones[:, None, :]))
+    centroides = puntos.mean(axis=1)
+
+    # Sistema normal de mínimos cuadrados: sum(n n^T) + d d^T
+    matriz = np.einsum('hki,hkj->hij', normales_planos, normales_planos)
+    matriz += np.einsum('hi,hj->hij', direcciones, direcciones)
+    lado_derecho = np.einsum('hki,hk->hi', normales_planos, np.einsum('hki,hki->hk', normales_planos, puntos))
+    lado_derecho += direcciones * np.einsum('hi,hi->h', direcciones, centroides)[:, None]
+
+    radios = np.full(len(puntos), np.nan)
+    posiciones = np.zeros((len(puntos), 3))
+    validos = np.abs(np.linalg.det(matriz)) > 1e-9
+    if validos.any():
+        posiciones[validos] = np.linalg.solve(matriz[validos], lado_derecho[validos][..., None])[..., 0]
+
+        relativos = puntos[validos] - posiciones[validos][:, None, :]
+        distancias = np.linalg.norm(np.cross(relativos, direcciones[validos][:, None, :]), axis=2)
+        maximos = distancias.max(axis=1, keepdims=True)
+        distancias = np.where(distancias < 0.75*maximos, maximos, distancias)
+        radios[validos] = distancias.mean(axis=1)
+
+    return radios, posiciones, direcciones
+
+
+def puntaje_cilindro(vertices: np.ndarray, radios: np.ndarray, posiciones: np.ndarray, direcciones: np.ndarray,
+                    umbral: float=0.01) -> np.ndarray:
+    """
+        Cuenta los inliers de un lote de hipótesis de cilindro.
+        Un punto es inlier si su distancia al eje está dentro de radio*(1 ± umbral).
+        Las distancias se calculan por bloques de puntos usando productos matriciales,
+        sin generar arrays de forma (hipótesis, puntos, 3).
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            puntos a evaluar, con forma (N, 3). Se recomienda float32 centrado en el origen.
+        radios : np.ndarray
+            radios de las hipótesis, con forma (H,)
+        posiciones : np.ndarray
+            puntos en el eje de las hipótesis, con forma (H, 3)
+        direcciones : np.ndarray
+            direcciones unitarias del eje de las hipótesis, con forma (H, 3)
+        umbral : float, optional
+            tolerancia relativa al radio, by default 0.01
+
+        Returns
+        -------
+        np.ndarray
+            cantidad de inliers de cada hipótesis, con forma (H,)
+    """
+
+    dtype = vertices.dtype
+    posiciones = posiciones.astype(dtype)
+    direcciones = direcciones.astype(dtype)
+    inferior = (radios*(1 - umbral))**2
+    superior = (radios*(1 + umbral))**2
+    pos_pos = np.einsum('hi,hi->h', posiciones, posiciones)[:, None]
+    pos_dir = np.einsum('hi,hi->h', posiciones, direcciones)[:, None]
+
+    puntajes = np.zeros(len(radios), dtype=np.int64)
+    bloque = _tam_bloque(len(radios))
+    for inicio in range(0, len(vertices), bloque):
+        v = vertices[inicio:inicio + bloque]
+        # |v - a|^2 - ((v - a)·u)^2, expandido para usar productos matriciales
+        v_v = np.einsum('ni,ni->n', v, v)[None, :]
+        proyeccion = direcciones @ v.T - pos_dir
+        dist_sqrd = v_v - 2*(posiciones @ v.T) + pos_pos - proyeccion**2
+        puntajes += ((dist_sqrd > inferior[:, None]) & (dist_sqrd < superior[:, None])).sum(axis=1)
+
+    return puntajes
+
+
+def _base_ortogonal(direccion: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Calcula dos vectores unitarios ortogonales entre sí y a la dirección ingresada.
+
+        Parameters
+        ----------
+        direccion : np.ndarray
+            vector unitario, con forma (3,)
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            vectores unitarios perpendiculares a la dirección
+    """
+
+    auxiliar = np.eye(3)[np.argmin(np.abs(direccion))]
+    e1 = _normalizar(np.cross(direccion, auxiliar))
+    e2 = np.cross(direccion, e1)
+    return e1, e2
+
+
+def refinar_cilindro(vertices: np.ndarray, radio: float, punto: np.ndarray, direccion: np.ndarray,
+                    umbral: float=0.01, max_puntos: int=20000, iteraciones: int=3,
+                    rng: np.random.Generator=None) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+        Refina un cilindro por mínimos cuadrados (Levenberg-Marquardt) sobre sus inliers.
+        El residuo de cada punto es su distancia al eje menos el radio.
+        Eje y punto se parametrizan como desplazamientos perpendiculares al eje inicial,
+        de esta forma el problema no tiene grados de libertad redundantes.
+        Los inliers se vuelven a seleccionar con el modelo refinado en cada iteración.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        radio : float
+            radio inicial del cilindro
+        punto : np.ndarray
+            punto inicial en el eje, con forma (3,)
+        direccion : np.ndarray
+            dirección unitaria inicial del eje, con forma (3,)
+        umbral : float, optional
+            tolerancia relativa al radio para seleccionar inliers, by default 0.01
+        max_puntos : int, optional
+            cantidad máxima de inliers usados en el refinamiento, by default 20000
+        iteraciones : int, optional
+            cantidad de veces que se vuelven a seleccionar inliers y se reajusta el modelo, by default 3
+        rng : np.random.Generator, optional
+            generador de números aleatorios, by default None
+
+        Returns
+        -------
+        Tuple[float, np.ndarray, np.ndarray]
+            radio, punto en el eje y dirección unitaria del eje refinados.
+            Si no hay suficientes inliers se retorna el último cilindro ajustado.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    punto = np.asarray(punto, dtype=np.float64)
+    direccion = _normalizar(np.asarray(direccion, dtype=np.float64))
+    for _ in range(iteraciones):
+        relativos = vertices - punto
+        distancias = np.linalg.norm(np.cross(relativos, direccion), axis=1)
+        inliers = relativos[np.abs(distancias - radio) < radio*umbral]
+        if len(inliers) < 5:
+            break
+        if len(inliers) > max_puntos:
+            inliers = inliers[rng.choice(len(inliers), size=max_puntos, replace=False)]
+
+        e1, e2 = _base_ortogonal(direccion)
+
+        def residuos(parametros):
+            a, b, c, d, r = parametros
+            eje = _normalizar(direccion + a*e1 + b*e2)
+            return np.linalg.norm(np.cross(inliers - (c*e1 + d*e2), eje), axis=1) - r
+
+        a, b, c, d, r = least_squares(residuos, [0.0, 0.0, 0.0, 0.0, radio], method='lm').x
+        radio, punto, direccion = float(r), punto + c*e1 + d*e2, _normalizar(direccion + a*e1 + b*e2)
+
+    return radio, punto, direccion
+
+
+def refinar_cono(vertices: np.ndarray, angulo: float, apex: np.ndarray, direccion: np.ndarray,
+                umbral: float, max_puntos: int=20000, iteraciones: int=3,
+                rng: np.random.Generator=None) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+        Refina un cono por mínimos cuadrados (Levenberg-Marquardt) sobre sus inliers.
+        El residuo de cada punto es xr*cos(phi) - xh*sin(phi), con xr la distancia al eje
+        y xh la distancia a lo largo del eje desde el apex.
+        El eje se parametriza como desplazamiento perpendicular a la dirección inicial.
+        Los inliers se vuelven a seleccionar con el modelo refinado en cada iteración.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        angulo : float
+            ángulo de apertura inicial en radianes
+        apex : np.ndarray
+            apex inicial, con forma (3,)
+        direccion : np.ndarray
+            dirección unitaria inicial del eje, con forma (3,)
+        umbral : float
+            distancia máxima al cono para seleccionar inliers
+        max_puntos : int, optional
+            cantidad máxima de inliers usados en el refinamiento, by default 20000
+        iteraciones : int, optional
+            cantidad de veces que se vuelven a seleccionar inliers y se reajusta el modelo, by default 3
+        rng : np.random.Generator, optional
+            generador de números aleatorios, by default None
+
+        Returns
+        -------
+        Tuple[float, np.ndarray, np.ndarray]
+            ángulo de apertura, apex y dirección unitaria del eje refinados.
+            Si no hay suficientes inliers se retorna el último cono ajustado.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    apex = np.asarray(apex, dtype=np.float64)
+    direccion = _normalizar(np.asarray(direccion, dtype=np.float64))
+    for _ in range(iteraciones):
+        relativos = vertices - apex
+        xh = relativos @ direccion
+        xr = np.linalg.norm(np.cross(relativos, direccion), axis=1)
+        inliers = relativos[np.abs(xr*np.cos(angulo) - np.abs(xh)*np.sin(angulo)) < umbral]
+        if len(inliers) < 6:
+            break
+        if len(inliers) > max_puntos:
+            inliers = inliers[rng.choice(len(inliers), size=max_puntos, replace=False)]
+
+        e1, e2 = _base_ortogonal(direccion)
+
+        def residuos(parametros):
+            a, b, dx, dy, dz, phi = parametros
+            eje = _normalizar(direccion + a*e1 + b*e2)
+            relativos_apex = inliers - np.array([dx, dy, dz])
+            xh = np.abs(relativos_apex @ eje)
+            xr = np.linalg.norm(np.cross(relativos_apex, eje), axis=1)
+            return xr*np.cos(phi) - xh*np.sin(phi)
+
+        a, b, dx, dy, dz, phi = least_squares(residuos, [0.0, 0.0, 0.0, 0.0, 0.0, angulo], method='lm').x
+        angulo, apex, direccion = float(phi), apex + np.array([dx, dy, dz]), _normalizar(direccion + a*e1 + b*e2)
+
+    return angulo, apex, direccion
+
+
+def _lote_cilindro(datos: Dict, rng: np.random.Generator, cantidad: int) -> Tuple[int, Tuple, Dict]:
+    """
+        Genera y evalúa un lote de hipótesis de cilindro para ransac_cilindro.
+
+        Parameters
+        ----------
+        datos : Dict
+            vértices centrados (float64 y float32), normales, umbral y radio_max del ajuste
+        rng : np.random.Generator
+            generador de números aleatorios del lote
+        cantidad : int
+            cantidad de hipótesis del lote
+
+        Returns
+        -------
+        Tuple[int, Tuple, Dict]
+            puntaje y modelo (radio, punto, dirección) de la mejor hipótesis del lote, y tiempos por etapa
+    """
+
+    tiempos = {'muestreo': 0.0, 'hipotesis': 0.0, 'puntaje': 0.0}
+    vertices = datos['vertices']
+
+    tiempo = timeit.default_timer()
+    trios = rng.integers(0, len(vertices), size=(cantidad, 3))
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    tiempo = timeit.default_timer()
+    radios, posiciones, direcciones = hipotesis_cilindro(vertices[trios], datos['normales'][trios])
+    tiempos['hipotesis'] += timeit.default_timer() - tiempo
+
+    validos = np.isfinite(radios) & (radios > 0) & (radios <= datos['radio_max'])
+    validos &= (trios[:, 0] != trios[:, 1]) & (trios[:, 0] != trios[:, 2]) & (trios[:, 1] != trios[:, 2])
+    if not validos.any():
+        return 0, None, tiempos
+
+    tiempo = timeit.default_timer()
+    puntajes = np.zeros(cantidad, dtype=np.int64)
+    puntajes[validos] = puntaje_cilindro(datos['vertices_32'], radios[validos], posiciones[validos], direcciones[validos],
+                                         datos['umbral'])
+    # Hipótesis que contienen todos los puntos se descartan, igual que en la versión iterativa
+    puntajes[puntajes >= len(vertices)] = 0
+    tiempos['puntaje'] += timeit.default_timer() - tiempo
+
+    mejor = int(np.argmax(puntajes))
+    return int(puntajes[mejor]), (float(radios[mejor]), posiciones[mejor], direcciones[mejor]), tiempos
+
+
+def ransac_cilindro(vertices: np.ndarray, normales: np.ndarray, num_iter: int=500, umbral: float=0.01,
+                    radio_max: float=np.inf, max_puntos: int=500000, tam_lote: int=100, confianza: float=0.99,
+                    refinar: bool=False, semilla: int=None, procesos: int=1) -> Tuple[float, np.ndarray, np.ndarray, Dict]:
+    """
+        Ajusta un cilindro a los vértices ingresados mediante RANSAC vectorizado.
+        Las hipótesis se generan por lotes de tam_lote tríos de índices aleatorios,
+        y se evalúan todas a la vez sobre un buffer float32 centrado en el centroide de los puntos.
+        Si hay más de max_puntos vértices, se usa una submuestra aleatoria de ese tamaño.
+        Se descartan las hipótesis con radio mayor a radio_max.
+        La búsqueda se detiene antes de num_iter si la cantidad de hipótesis evaluadas alcanza
+        las requeridas para la confianza dada, según la proporción de inliers del mejor modelo.
+        Si refinar es True, el mejor cilindro se refina con refinar_cilindro.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        normales : np.ndarray
+            normales de los vértices, con forma (N, 3)
+        num_iter : int, optional
+            cantidad máxima de hipótesis a evaluar, by default 500
+        umbral : float, optional
+            tolerancia relativa al radio para considerar inliers, by default 0.01
+        radio_max : float, optional
+            radio máximo aceptado para una hipótesis, by default np.inf
+        max_puntos : int, optional
+            cantidad máxima de puntos usados para generar y evaluar hipótesis, by default 500000
+        tam_lote : int, optional
+            cantidad de hipótesis evaluadas en conjunto, by default 100
+        confianza : float, optional
+            probabilidad objetivo para la detención temprana, 1 evalúa siempre num_iter hipótesis, by default 0.99
+        refinar : bool, optional
+            indicador para refinar el mejor modelo por mínimos cuadrados sobre sus inliers, by default False
+        semilla : int, optional
+            semilla para obtener resultados reproducibles, by default None
+        procesos : int, optional
+            cantidad de procesos entre los que se reparten los lotes de hipótesis, by default 1
+
+        Returns
+        -------
+        Tuple[float, np.ndarray, np.ndarray, Dict]
+            radio, punto en el eje y dirección unitaria del eje del mejor cilindro encontrado,
+            y reporte del ajuste (iteraciones, inliers, proporción de inliers y tiempos por etapa)
+    """
+
+    inicio_ajuste = timeit.default_timer()
+    reporte = _nuevo_reporte()
+    tiempos = reporte['tiempos']
+    semilla_muestreo, semilla_lotes = np.random.SeedSequence(semilla).spawn(2)
+    rng = np.random.default_rng(semilla_muestreo)
+
+    tiempo = timeit.default_timer()
+    vertices = np.asarray(vertices, dtype=np.float64)
+    normales = _normalizar(np.asarray(normales, dtype=np.float64))
+    if len(vertices) > max_puntos:
+        indices = rng.choice(len(vertices), size=max_puntos, replace=False)
+        vertices = vertices[indices]
+        normales = normales[indices]
+
+    # Centrar evita pérdida de precisión en float32 para piezas lejos del origen
+    centroide = vertices.mean(axis=0)
+    vertices = vertices - centroide
+    max_puntaje = len(vertices)
+    datos = {'vertices': vertices, 'vertices_32': vertices.astype(np.float32), 'normales': normales,
+             'umbral': umbral, 'radio_max': radio_max}
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    mejor_puntaje, mejor_modelo, evaluadas, requeridas = _ejecutar_ransac(_lote_cilindro, datos, num_iter, tam_lote, confianza,
+                                                                          max_puntaje, semilla_lotes, procesos, tiempos)
+    if mejor_modelo is None:
+        mejor_modelo = (0.0, np.zeros(3), np.array([0.0, 0.0, 1.0]))
+
+    if refinar and mejor_puntaje > 0:
+        tiempo = timeit.default_timer()
+        mejor_modelo = refinar_cilindro(vertices, *mejor_modelo, umbral=umbral, rng=rng)
+        tiempos['refinamiento'] += timeit.default_timer() - tiempo
+
+    reporte.update(iteraciones=evaluadas, iteraciones_requeridas=requeridas, inliers=int(mejor_puntaje),
+                   puntos_evaluados=max_puntaje, proporcion_inliers=mejor_puntaje/max_puntaje,
+                   tiempo_total=timeit.default_timer() - inicio_ajuste)
+
+    radio, punto, direccion = mejor_modelo
+    return radio, punto + centroide, direccion, reporte
+
+
+def hipotesis_cono(puntos: np.ndarray, normales: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Calcula apex, eje y ángulo de apertura de un lote de hipótesis de cono, cada una a partir de 3 puntos con sus normales.
+        El apex es la intersección de los 3 planos tangentes, obtenida resolviendo los sistemas de 3x3 apilados.
+        La dirección del eje es la normal del plano que pasa por los 3 puntos trasladados a distancia unitaria
+        del apex, orientada desde el apex hacia los puntos.
+        El ángulo es el promedio de arcsin(distancia al eje / distancia al apex) de los 3 puntos.
+
+        Parameters
+        ----------
+        puntos : np.ndarray
+            puntos de las hipótesis, con forma (H, 3, 3)
+        normales : np.ndarray
+            normales de los puntos de las hipótesis, con forma (H, 3, 3)
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            ángulos (H,), apex (H, 3) y direcciones unitarias del eje (H, 3).
+            Hipótesis degeneradas entregan ángulo NaN.
+    """
+
+    angulos = np.full(len(puntos), np.nan)
+    apices = np.zeros((len(puntos), 3))
+    direcciones = np.zeros((len(puntos), 3))
+
+    lado_derecho = np.einsum('hki,hki->hk', normales, puntos)
+    validos = np.abs(np.linalg.det(normales)) > 1e-6
+    if not validos.any():
+        return angulos, apices, direcciones
+
+    apices[validos] = np.linalg.solve(normales[validos], lado_derecho[validos][..., None])[..., 0]
+
+    relativos = puntos[validos] - apices[validos][:, None, :]
+    unitarios = _normalizar(relativos)
+    eje = _normalizar(np.cross(unitarios[:, 1] - unitarios[:, 0], unitarios[:, 2] - unitarios[:, 0]))
+    signo = np.sign(np.einsum('hki,hi->h', unitarios, eje))
+    signo[signo == 0] = 1
+    eje *= signo[:, None]
+
+    dist_apex = np.linalg.norm(relativos, axis=2)
+    dist_eje = np.linalg.norm(np.cross(relativos, eje[:, None, :]), axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angulos_puntos = np.arcsin(np.clip(dist_eje/dist_apex, 0, 1))
+
+    angulos[validos] = np.where(np.linalg.norm(eje, axis=1) > 0, angulos_puntos.mean(axis=1), np.nan)
+    direcciones[validos] = eje
+
+    return angulos, apices, direcciones
+
+
+def puntaje_cono(vertices: np.ndarray, angulos: np.ndarray, apices: np.ndarray, direcciones: np.ndarray,
+                umbral: float) -> np.ndarray:
+    """
+        Cuenta los inliers de un lote de hipótesis de cono.
+        La distancia de un punto al cono es |xr*cos(phi) - xh*sin(phi)|, con xr la distancia al eje
+        y xh la distancia a lo largo del eje desde el apex, igual que Procesador.dist_point_to_cone.
+        Las distancias se calculan por bloques de puntos usando productos matriciales.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            puntos a evaluar, con forma (N, 3)
+        angulos : np.ndarray
+            ángulos de apertura de las hipótesis en radianes, con forma (H,)
+        apices : np.ndarray
+            apex de las hipótesis, con forma (H, 3)
+        direcciones : np.ndarray
+            direcciones unitarias del eje de las hipótesis, con forma (H, 3)
+        umbral : float
+            distancia máxima al cono para considerar un punto como inlier
+
+        Returns
+        -------
+        np.ndarray
+            cantidad de inliers de cada hipótesis, con forma (H,)
+    """
+
+    cosenos = np.cos(angulos)[:, None]
+    senos = np.sin(angulos)[:, None]
+    apex_apex = np.einsum('hi,hi->h', apices, apices)[:, None]
+    apex_dir = np.einsum('hi,hi->h', apices, direcciones)[:, None]
+
+    puntajes = np.zeros(len(angulos), dtype=np.int64)
+    bloque = _tam_bloque(len(angulos))
+    for inicio in range(0, len(vertices), bloque):
+        v = vertices[inicio:inicio + bloque]
+        v_v = np.einsum('ni,ni->n', v, v)[None, :]
+        dist_apex_sqrd = v_v - 2*(apices @ v.T) + apex_apex
+        xh = direcciones @ v.T - apex_dir
+        xr = np.sqrt(np.maximum(dist_apex_sqrd - xh**2, 0))
+        distancias = np.abs(xr*cosenos - np.abs(xh)*senos)
+        puntajes += (distancias < umbral).sum(axis=1)
+
+    return puntajes
+
+
+def _lote_cono(datos: Dict, rng: np.random.Generator, cantidad: int) -> Tuple[int, Tuple, Dict]:
+    """
+        Genera y evalúa un lote de hipótesis de cono para ransac_cono.
+        El KD-tree de la muestra de vecindad se construye la primera vez que se usa en cada proceso.
+
+        Parameters
+        ----------
+        datos : Dict
+            muestra de vecindad con sus normales, puntos evaluados, y parámetros del ajuste
+        rng : np.random.Generator
+            generador de números aleatorios del lote
+        cantidad : int
+            cantidad de hipótesis del lote
+
+        Returns
+        -------
+        Tuple[int, Tuple, Dict]
+            puntaje y modelo (ángulo, apex, dirección) de la mejor hipótesis del lote, y tiempos por etapa
+    """
+
+    tiempos = {'muestreo': 0.0, 'hipotesis': 0.0, 'puntaje': 0.0}
+    muestra = datos['muestra']
+    vecinos = datos['vecinos']
+
+    tiempo = timeit.default_timer()
+    if 'arbol' not in datos:
+        datos['arbol'] = cKDTree(muestra)
+    semillas = rng.integers(0, len(muestra), size=cantidad)
+    # Vecinos ordenados por distancia, la primera columna es la misma semilla
+    _, cercanos = datos['arbol'].query(muestra[semillas], k=vecinos + 1, distance_upper_bound=datos['radio_vecindad'])
+    disponibles = (cercanos[:, 1:] < len(muestra)).sum(axis=1)
+
+    # Dos vecinos distintos elegidos al azar entre los disponibles de cada semilla
+    primero = (rng.random(cantidad)*disponibles).astype(int)
+    segundo = (rng.random(cantidad)*(disponibles - 1)).astype(int)
+    segundo += segundo >= primero
+    filas = np.arange(cantidad)
+    trios = np.stack([semillas, cercanos[filas, primero + 1], cercanos[filas, segundo + 1]], axis=1)
+    trios[disponibles < 2] = 0
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    tiempo = timeit.default_timer()
+    angulos, apices, direcciones = hipotesis_cono(muestra[trios], datos['normales_muestra'][trios])
+    tiempos['hipotesis'] += timeit.default_timer() - tiempo
+
+    validos = np.isfinite(angulos) & (angulos >= datos['angulo_min']) & (angulos <= datos['angulo_max']) & (disponibles >= 2)
+    if not validos.any():
+        return 0, None, tiempos
+
+    tiempo = timeit.default_timer()
+    puntajes = np.zeros(cantidad, dtype=np.int64)
+    puntajes[validos] = puntaje_cono(datos['evaluados'], angulos[validos], apices[validos], direcciones[validos], datos['umbral'])
+    tiempos['puntaje'] += timeit.default_timer() - tiempo
+
+    mejor = int(np.argmax(puntajes))
+    return int(puntajes[mejor]), (float(angulos[mejor]), apices[mejor], direcciones[mejor]), tiempos
+
+
+def ransac_cono(vertices: np.ndarray, normales: np.ndarray, umbral: float, num_iter: int=1000,
+                radio_vecindad: float=np.inf, vecinos: int=30, puntos_vecindad: int=2000,
+                max_puntos: int=100000, tam_lote: int=100, angulo_min: float=np.radians(5),
+                angulo_max: float=np.radians(90), confianza: float=0.99, refinar: bool=False,
+                semilla: int=None, procesos: int=1) -> Tuple[float, np.ndarray, np.ndarray, Dict]:
+    """
+        Ajusta un cono a los vértices ingresados mediante RANSAC vectorizado.
+        Cada hipótesis usa un punto semilla y 2 de sus vecinos, buscados en un KD-tree construido una sola vez
+        sobre una submuestra de puntos_vecindad vértices. Los vecinos se limitan a radio_vecindad del punto semilla.
+        Las hipótesis se evalúan por lotes sobre una submuestra aleatoria de max_puntos vértices.
+        Se descartan las hipótesis con ángulo de apertura fuera de [angulo_min, angulo_max].
+        La búsqueda se detiene antes de num_iter si la cantidad de hipótesis evaluadas alcanza
+        las requeridas para la confianza dada, según la proporción de inliers del mejor modelo.
+        Si refinar es True, el mejor cono se refina con refinar_cono.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        normales : np.ndarray
+            normales de los vértices, con forma (N, 3)
+        umbral : float
+            distancia máxima al cono para considerar un punto como inlier
+        num_iter : int, optional
+            cantidad máxima de hipótesis a evaluar, by default 1000
+        radio_vecindad : float, optional
+            distancia máxima entre el punto semilla y sus vecinos, by default np.inf
+        vecinos : int, optional
+            cantidad de vecinos más cercanos entre los que se eligen los 2 puntos restantes, by default 30
+        puntos_vecindad : int, optional
+            cantidad de puntos usados para construir el KD-tree, by default 2000
+        max_puntos : int, optional
+            cantidad máxima de puntos usados para evaluar hipótesis, by default 100000
+        tam_lote : int, optional
+            cantidad de hipótesis evaluadas en conjunto, by default 100
+        angulo_min : float, optional
+            ángulo de apertura mínimo aceptado en radianes, by default np.radians(5)
+        angulo_max : float, optional
+            ángulo de apertura máximo aceptado en radianes, by default np.radians(90)
+        confianza : float, optional
+            probabilidad objetivo para la detención temprana, 1 evalúa siempre num_iter hipótesis, by default 0.99
+        refinar : bool, optional
+            indicador para refinar el mejor modelo por mínimos cuadrados sobre sus inliers, by default False
+        semilla : int, optional
+            semilla para obtener resultados reproducibles, by default None
+        procesos : int, optional
+            cantidad de procesos entre los que se reparten los lotes de hipótesis, by default 1
+
+        Returns
+        -------
+        Tuple[float, np.ndarray, np.ndarray, Dict]
+            ángulo de apertura, apex y dirección unitaria del eje del mejor cono encontrado,
+            y reporte del ajuste (iteraciones, inliers, proporción de inliers y tiempos por etapa)
+    """
+
+    inicio_ajuste = timeit.default_timer()
+    reporte = _nuevo_reporte()
+    tiempos = reporte['tiempos']
+    semilla_muestreo, semilla_lotes = np.random.SeedSequence(semilla).spawn(2)
+    rng = np.random.default_rng(semilla_muestreo)
+
+    tiempo = timeit.default_timer()
+    vertices = np.asarray(vertices, dtype=np.float64)
+    normales = _normalizar(np.asarray(normales, dtype=np.float64))
+    centroide = vertices.mean(axis=0)
+    vertices = vertices - centroide
+
+    if len(vertices) > max_puntos:
+        evaluados = vertices[rng.choice(len(vertices), size=max_puntos, replace=False)]
+    else:
+        evaluados = vertices
+
+    if len(vertices) > puntos_vecindad:
+        indices = rng.choice(len(vertices), size=puntos_vecindad, replace=False)
+        muestra, normales_muestra = vertices[indices], normales[indices]
+    else:
+        muestra, normales_muestra = vertices, normales
+    datos = {'muestra': muestra, 'normales_muestra': normales_muestra, 'evaluados': evaluados,
+             'vecinos': min(vecinos, len(muestra) - 1), 'radio_vecindad': radio_vecindad, 'umbral': umbral,
+             'angulo_min': angulo_min, 'angulo_max': angulo_max}
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    mejor_puntaje, mejor_modelo, evaluadas, requeridas = _ejecutar_ransac(_lote_cono, datos, num_iter, tam_lote, confianza,
+                                                                          len(evaluados), semilla_lotes, procesos, tiempos)
+    if mejor_modelo is None:
+        mejor_modelo = (0.0, np.zeros(3), np.array([0.0, 0.0, 1.0]))
+
+    if refinar and mejor_puntaje > 0:
+        tiempo = timeit.default_timer()
+        mejor_modelo = refinar_cono(evaluados, *mejor_modelo, umbral=umbral, rng=rng)
+        tiempos['refinamiento'] += timeit.default_timer() - tiempo
+
+    reporte.update(iteraciones=evaluadas, iteraciones_requeridas=requeridas, inliers=int(mejor_puntaje),
+                   puntos_evaluados=len(evaluados), proporcion_inliers=mejor_puntaje/len(evaluados),
+                   tiempo_total=timeit.default_timer() - inicio_ajuste)
+
+    angulo, apex, direccion = mejor_modelo
+    return angulo, apex + centroide, direccion, reporte
+
+
+def hipotesis_plano(puntos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Calcula normal y distancia al origen de un lote de hipótesis de plano, cada una a partir de 3 puntos.
+
+        Parameters
+        ----------
+        puntos : np.ndarray
+            puntos de las hipótesis, con forma (H, 3, 3)
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            normales unitarias (H, 3) y distancias al origen (H,), el plano es normal·x = distancia.
+            Hipótesis degeneradas (puntos colineales) entregan normal nula.
+    """
+
+    normales = _normalizar(np.cross(puntos[:, 1] - puntos[:, 0], puntos[:, 2] - puntos[:, 0]))
+    distancias = np.einsum('hi,hi->h', normales, puntos[:, 0])
+    return normales, distancias
+
+
+def puntaje_plano(vertices: np.ndarray, normales: np.ndarray, distancias: np.ndarray, umbral: float) -> np.ndarray:
+    """
+        Cuenta los inliers de un lote de hipótesis de plano.
+        Un punto es inlier si su distancia al plano es menor a umbral.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            puntos a evaluar, con forma (N, 3). Se recomienda float32 centrado en el origen.
+        normales : np.ndarray
+            normales unitarias de las hipótesis, con forma (H, 3)
+        distancias : np.ndarray
+            distancias al origen de las hipótesis, con forma (H,)
+        umbral : float
+            distancia máxima al plano para considerar un punto como inlier
+
+        Returns
+        -------
+        np.ndarray
+            cantidad de inliers de cada hipótesis, con forma (H,)
+    """
+
+    normales = normales.astype(vertices.dtype)
+    distancias = distancias.astype(vertices.dtype)[:, None]
+
+    puntajes = np.zeros(len(normales), dtype=np.int64)
+    bloque = _tam_bloque(len(normales))
+    for inicio in range(0, len(vertices), bloque):
+        v = vertices[inicio:inicio + bloque]
+        puntajes += (np.abs(normales @ v.T - distancias) < umbral).sum(axis=1)
+
+    return puntajes
+
+
+def refinar_plano(vertices: np.ndarray, normal: np.ndarray, punto: np.ndarray, umbral: float,
+                  iteraciones: int=3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Refina un plano mediante PCA sobre sus inliers.
+        La normal es la componente principal de menor varianza de los inliers, y el punto su centroide.
+        Los inliers se vuelven a seleccionar con el plano refinado en cada iteración.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        normal : np.ndarray
+            normal unitaria inicial del plano, con forma (3,)
+        punto : np.ndarray
+            punto inicial del plano, con forma (3,)
+        umbral : float
+            distancia máxima al plano para seleccionar inliers
+        iteraciones : int, optional
+            cantidad de veces que se vuelven a seleccionar inliers y se reajusta el plano, by default 3
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            normal unitaria, centroide de los inliers, y dirección principal de los inliers (componente de mayor varianza).
+            La normal conserva el sentido de la normal inicial.
+    """
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    normal = _normalizar(np.asarray(normal, dtype=np.float64))
+    punto = np.asarray(punto, dtype=np.float64)
+    principal = _base_ortogonal(normal)[0]
+    for _ in range(iteraciones):
+        inliers = vertices[np.abs((vertices - punto) @ normal) < umbral]
+        if len(inliers) < 3:
+            break
+        punto = inliers.mean(axis=0)
+        _, _, componentes = np.linalg.svd(inliers - punto, full_matrices=False)
+        principal = componentes[0]
+        normal = componentes[2] if componentes[2] @ normal >= 0 else -componentes[2]
+
+    return normal, punto, principal
+
+
+def _lote_plano(datos: Dict, rng: np.random.Generator, cantidad: int) -> Tuple[int, Tuple, Dict]:
+    """
+        Genera y evalúa un lote de hipótesis de plano para ransac_plano.
+
+        Parameters
+        ----------
+        datos : Dict
+            vértices centrados (float64 y float32) y umbral del ajuste
+        rng : np.random.Generator
+            generador de números aleatorios del lote
+        cantidad : int
+            cantidad de hipótesis del lote
+
+        Returns
+        -------
+        Tuple[int, Tuple, Dict]
+            puntaje y modelo (normal, distancia) de la mejor hipótesis del lote, y tiempos por etapa
+    """
+
+    tiempos = {'muestreo': 0.0, 'hipotesis': 0.0, 'puntaje': 0.0}
+    vertices = datos['vertices']
+
+    tiempo = timeit.default_timer()
+    trios = rng.integers(0, len(vertices), size=(cantidad, 3))
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    tiempo = timeit.default_timer()
+    normales, distancias = hipotesis_plano(vertices[trios])
+    tiempos['hipotesis'] += timeit.default_timer() - tiempo
+
+    validos = np.linalg.norm(normales, axis=1) > 0
+    if not validos.any():
+        return 0, None, tiempos
+
+    tiempo = timeit.default_timer()
+    puntajes = np.zeros(cantidad, dtype=np.int64)
+    puntajes[validos] = puntaje_plano(datos['vertices_32'], normales[validos], distancias[validos], datos['umbral'])
+    tiempos['puntaje'] += timeit.default_timer() - tiempo
+
+    mejor = int(np.argmax(puntajes))
+    return int(puntajes[mejor]), (normales[mejor], distancias[mejor]), tiempos
+
+
+def ransac_plano(vertices: np.ndarray, umbral: float, num_iter: int=500, max_puntos: int=500000,
+                 tam_lote: int=100, confianza: float=0.99, semilla: int=None,
+                 procesos: int=1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+    """
+        Ajusta el plano dominante de los vértices ingresados mediante RANSAC vectorizado y refinamiento por PCA.
+        Las hipótesis se generan por lotes de tam_lote tríos de índices aleatorios,
+        y se evalúan todas a la vez sobre un buffer float32 centrado en el centroide de los puntos.
+        Si hay más de max_puntos vértices, se usa una submuestra aleatoria de ese tamaño.
+        La búsqueda se detiene antes de num_iter si la cantidad de hipótesis evaluadas alcanza
+        las requeridas para la confianza dada, según la proporción de inliers del mejor modelo.
+        El mejor plano se refina con refinar_plano.
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            vértices de la malla, con forma (N, 3)
+        umbral : float
+            distancia máxima al plano para considerar un punto como inlier
+        num_iter : int, optional
+            cantidad máxima de hipótesis a evaluar, by default 500
+        max_puntos : int, optional
+            cantidad máxima de puntos usados para generar y evaluar hipótesis, by default 500000
+        tam_lote : int, optional
+            cantidad de hipótesis evaluadas en conjunto, by default 100
+        confianza : float, optional
+            probabilidad objetivo para la detención temprana, 1 evalúa siempre num_iter hipótesis, by default 0.99
+        semilla : int, optional
+            semilla para obtener resultados reproducibles, by default None
+        procesos : int, optional
+            cantidad de procesos entre los que se reparten los lotes de hipótesis, by default 1
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]
+            normal unitaria, punto en el plano, y dirección principal de los inliers del mejor plano encontrado,
+            y reporte del ajuste (iteraciones, inliers, proporción de inliers y tiempos por etapa)
+    """
+
+    inicio_ajuste = timeit.default_timer()
+    reporte = _nuevo_reporte()
+    tiempos = reporte['tiempos']
+    semilla_muestreo, semilla_lotes = np.random.SeedSequence(semilla).spawn(2)
+    rng = np.random.default_rng(semilla_muestreo)
+
+    tiempo = timeit.default_timer()
+    vertices = np.asarray(vertices, dtype=np.float64)
+    if len(vertices) > max_puntos:
+        vertices = vertices[rng.choice(len(vertices), size=max_puntos, replace=False)]
+
+    centroide = vertices.mean(axis=0)
+    vertices = vertices - centroide
+    max_puntaje = len(vertices)
+    datos = {'vertices': vertices, 'vertices_32': vertices.astype(np.float32), 'umbral': umbral}
+    tiempos['muestreo'] += timeit.default_timer() - tiempo
+
+    mejor_puntaje, mejor_modelo, evaluadas, requeridas = _ejecutar_ransac(_lote_plano, datos, num_iter, tam_lote, confianza,
+                                                                          max_puntaje, semilla_lotes, procesos, tiempos)
+    if mejor_modelo is None:
+        mejor_modelo = (np.array([0.0, 0.0, 1.0]), 0.0)
+
+    tiempo = timeit.default_timer()
+    normal, distancia = mejor_modelo
+    normal, punto, principal = refinar_plano(vertices, normal, normal*distancia, umbral)
+    tiempos['refinamiento'] += timeit.default_timer() - tiempo
+
+    reporte.update(iteraciones=evaluadas, iteraciones_requeridas=requeridas, inliers=int(mejor_puntaje),
+                   puntos_evaluados=max_puntaje, proporcion_inliers=mejor_puntaje/max_puntaje,
+                   tiempo_total=timeit.default_timer() - inicio_ajuste)
+
+    return normal, punto + centroide, principal, reporte
+
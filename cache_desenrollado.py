@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en memoria de mallas desenrolladas de piezas cilíndricas y cónicas.
+
+Para cortar cilindros y conos la malla se transforma a coordenadas cilíndricas (y en conos además se
+rota según el ángulo de apertura) antes de cortarla como placa. Cada malla desenrollada se identifica
+por un hash de los vértices y caras de la malla original, el tipo de pieza y el descriptor, por lo que
+al volver a cortar la misma pieza con otra geometría de cordón no se vuelve a transformar. La topología
+no cambia al desenrollar, así que la malla se crea sin procesar ni validar.
+"""
+import hashlib
+import trimesh
+import numpy as np
+import utilidades
+from collections import OrderedDict
+from scipy.spatial.transform import Rotation
+from typing import Sequence
+
+
+class CacheDesenrollado:
+    """
+        Caché en memoria de mallas desenrolladas, con eliminación LRU acotada por cantidad de mallas.
+
+        Attributes
+        ----------
+        max_mallas: int, by default 2
+            cantidad máxima de mallas desenrolladas guardadas.
+
+        Methods
+        -------
+        clave
+            Calcula la clave de una malla a partir del hash de sus vértices, caras, tipo de pieza y descriptor.
+
+        desenrollar
+            Entrega la malla desenrollada de una pieza cilíndrica o cónica, calculándola solo si no está guardada.
+
+        limpiar
+            Elimina todas las mallas guardadas.
+    """
+
+    def __init__(self, max_mallas: int=2) -> None:
+        """
+            Constructor para la clase CacheDesenrollado.
+
+            Parameters
+            ----------
+            max_mallas : int, optional
+                cantidad máxima de mallas desenrolladas guardadas, by default 2
+        """
+
+        self.max_mallas = max_mallas
+        self._mallas = OrderedDict()
+
+    def clave(self, vertices: np.ndarray, caras: np.ndarray, tipo_pieza: int, descriptor: Sequence[float]) -> str:
+        """
+            Calcula la clave de una malla a partir del hash de sus vértices, caras, tipo de pieza y descriptor.
+
+            Parameters
+            ----------
+            vertices : np.ndarray
+                vértices de la malla original, con forma (N, 3)
+            caras : np.ndarray
+                caras de la malla original, con forma (M, 3)
+            tipo_pieza : int
+                tipo de pieza, 1 para cilindro y 2 para cono
+            descriptor : Sequence[float]
+                descriptor de la pieza, [radio base, ángulo apertura]
+
+            Returns
+            -------
+            str
+                clave hexadecimal de la malla desenrollada
+        """
+
+        resumen = hashlib.blake2b(digest_size=20)
+        resumen.update(np.ascontiguousarray(vertices, dtype=np.float64).tobytes())
+        resumen.update(np.ascontiguousarray(caras, dtype=np.int64).tobytes())
+        resumen.update(np.asarray([tipo_pieza, *descriptor], dtype=np.float64).tobytes())
+        return resumen.hexdigest()
+
+    def desenrollar(self, pieza: trimesh.Trimesh, tipo_pieza: int, descriptor: Sequence[float]) -> trimesh.Trimesh:
+        """
+            Entrega la malla desenrollada de una pieza cilíndrica o cónica, calculándola solo si no está guardada.
+            En cilindros se transforma a coordenadas cilíndricas con el radio del descriptor. En conos el radio
+            depende de la posición en el eje, y luego de transformar se rota en Y el ángulo de apertura.
+            La malla entregada es compartida entre llamadas, no debe modificarse.
+
+            Parameters
+            ----------
+            pieza : trimesh.Trimesh
+                pieza orientada a desenrollar
+            tipo_pieza : int
+                tipo de pieza, 1 para cilindro y 2 para cono
+            descriptor : Sequence[float]
+                descriptor de la pieza, [radio base, ángulo apertura]
+
+            Returns
+            -------
+            trimesh.Trimesh
+                malla desenrollada, lista para cortar como placa
+        """
+
+        clave = self.clave(pieza.vertices, pieza.faces, tipo_pieza, descriptor)
+        if clave in self._mallas:
+            self._mallas.move_to_end(clave)
+            return self._mallas[clave]
+
+        if tipo_pieza == 2:
+            # Radio depende de la posición en el eje del cono y el ángulo de apertura
+            radio = -1*(np.tan(np.deg2rad(descriptor[1]))*pieza.vertices[:, 0] - descriptor[0])
+        else:
+            radio = descriptor[0]
+        vertices = utilidades.transform_cilindrical(pieza.vertices, radio=radio, inv=False)
+        if tipo_pieza == 2:
+            # Se necesita transformar a cilindricas antes de rotar el cono, para calcular el cambio de radios
+            vertices = Rotation.from_euler('y', -descriptor[1], degrees=True).apply(vertices)
+
+        malla = trimesh.Trimesh(vertices=vertices, faces=pieza.faces, process=False, validate=False)
+        self._mallas[clave] = malla
+        while len(self._mallas) > self.max_mallas:
+            self._mallas.popitem(last=False)
+        return malla
+
+    def limpiar(self) -> None:
+        """
+            Elimina todas las mallas guardadas.
+        """
+
+        self._mallas.clear()
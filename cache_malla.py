@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en disco de mallas limpias.
+
+Al cargar una malla por primera vez se guardan los vértices, caras y normales de la malla ya procesada
+y limpia como archivos .npy sin comprimir, en una carpeta de ~/.ima/cache_malla identificada por el hash
+de la ruta del archivo original, junto al tamaño y la fecha de modificación del original. Al volver a
+abrir la pieza, si el original no cambió, los arreglos se mapean directamente a memoria desde los .npy,
+sin leer ni limpiar la malla de nuevo. Al superar el tamaño máximo se eliminan las entradas usadas
+hace más tiempo (LRU).
+
+En Windows un archivo mapeado a memoria no se puede reemplazar ni eliminar mientras la malla exista,
+por esto cada versión de una malla se escribe en una subcarpeta nueva, y las versiones anteriores
+se eliminan cuando ya no están en uso (al cargar o guardar la malla de nuevo).
+"""
+import os
+import time
+import shutil
+import hashlib
+import trimesh
+import numpy as np
+from typing import List, Union
+
+VERSION_CACHE = 3
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser('~'), '.ima', 'cache_malla')
+MAX_BYTES_CACHE = 2*1024**3
+ARREGLOS_CACHE = ('vertices', 'caras', 'normales')
+
+
+def ruta_cache(path: str) -> str:
+    """
+        Entrega la carpeta de caché de una malla.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo de la malla original
+
+        Returns
+        -------
+        str
+            carpeta de caché de la malla, dentro de DIRECTORIO_CACHE, contiene una subcarpeta por versión
+    """
+
+    ruta_absoluta = os.path.normcase(os.path.abspath(path))
+    return os.path.join(DIRECTORIO_CACHE, hashlib.blake2b(ruta_absoluta.encode(), digest_size=20).hexdigest())
+
+
+def _firma(path: str) -> np.ndarray:
+    """
+        Entrega la firma del archivo original usada para validar la caché.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo de la malla original
+
+        Returns
+        -------
+        np.ndarray
+            [versión de la caché, tamaño en bytes, fecha de modificación en ns]
+    """
+
+    estado = os.stat(path)
+    return np.array([VERSION_CACHE, estado.st_size, estado.st_mtime_ns], dtype=np.int64)
+
+
+def cargar(path: str) -> Union[trimesh.Trimesh, None]:
+    """
+        Carga la malla desde su caché si existe y el archivo original no cambió.
+        Los vértices, caras y normales quedan mapeados a memoria en modo copy-on-write, sin copiarlos.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo de la malla original
+
+        Returns
+        -------
+        Union[trimesh.Trimesh, None]
+            malla cargada desde la caché, o None si no hay caché válida
+    """
+
+    carpeta = ruta_cache(path)
+    if not os.path.isdir(carpeta):
+        return None
+    try:
+        firma = _firma(path)
+        arreglos = None
+        for version in _versiones(carpeta):
+            ruta_firma = os.path.join(version, 'firma.npy')
+            if os.path.isfile(ruta_firma) and np.array_equal(np.load(ruta_firma), firma):
+                arreglos = {nombre: np.load(os.path.join(version, nombre + '.npy'), mmap_mode='c') for nombre in ARREGLOS_CACHE}
+                os.utime(ruta_firma)
+                _eliminar_versiones(carpeta, conservar=version)
+                break
+    except (OSError, ValueError):
+        return None
+    if arreglos is None:
+        return None
+    # La malla de la caché ya fue procesada y limpiada al guardarla
+    return trimesh.Trimesh(vertices=arreglos['vertices'], faces=arreglos['caras'],
+                           vertex_normals=arreglos['normales'], process=False, validate=False)
+
+
+def guardar(path: str, malla: trimesh.Trimesh) -> None:
+    """
+        Guarda la caché de una malla ya limpia, y elimina las entradas menos usadas si se supera MAX_BYTES_CACHE.
+        La malla se escribe en una subcarpeta nueva, sin reemplazar archivos que podrían estar mapeados a memoria,
+        y las versiones anteriores que no estén en uso se eliminan. La firma se escribe al final, de esta forma
+        una escritura interrumpida deja la versión inválida. Errores de escritura (OSError) se propagan.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo de la malla original
+        malla : trimesh.Trimesh
+            malla procesada y limpia cargada desde path
+    """
+
+    carpeta = ruta_cache(path)
+    # Nombre único por escritura, hora en ns y proceso
+    version = os.path.join(carpeta, '{:x}_{:x}'.format(time.time_ns(), os.getpid()))
+    os.makedirs(version)
+
+    arreglos = {'vertices': np.ascontiguousarray(malla.vertices, dtype=np.float64),
+                'caras': np.ascontiguousarray(malla.faces, dtype=np.int64),
+                'normales': np.ascontiguousarray(malla.vertex_normals, dtype=np.float64),
+                'firma': _firma(path)}
+    for nombre, arreglo in arreglos.items():
+        with open(os.path.join(version, nombre + '.npy'), 'wb') as archivo:
+            np.save(archivo, arreglo)
+    _eliminar_versiones(carpeta, conservar=version)
+    _recortar()
+
+
+def _versiones(carpeta: str) -> List[str]:
+    """
+        Entrega las subcarpetas de versión de una carpeta de caché, de la más nueva a la más antigua.
+
+        Parameters
+        ----------
+        carpeta : str
+            carpeta de caché de una malla
+
+        Returns
+        -------
+        List[str]
+            rutas de las subcarpetas de versión
+    """
+
+    versiones = [os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta)]
+    return sorted((version for version in versiones if os.path.isdir(version)), key=os.path.getmtime, reverse=True)
+
+
+def _eliminar_versiones(carpeta: str, conservar: str) -> None:
+    """
+        Elimina los archivos y versiones de una carpeta de caché, salvo la versión indicada.
+        Los archivos que no se pueden eliminar (mapeados a memoria en Windows) se dejan para un próximo intento.
+
+        Parameters
+        ----------
+        carpeta : str
+            carpeta de caché de una malla
+        conservar : str
+            subcarpeta de la versión que se mantiene
+    """
+
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.samefile(ruta, conservar):
+            continue
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta, ignore_errors=True)
+        else:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+
+def _recortar() -> None:
+    """
+        Elimina las entradas usadas hace más tiempo hasta que el tamaño total sea menor a MAX_BYTES_CACHE.
+        La fecha de modificación de la firma de cada versión se usa como registro del último uso.
+    """
+
+    entradas = []
+    for nombre in os.listdir(DIRECTORIO_CACHE):
+        carpeta = os.path.join(DIRECTORIO_CACHE, nombre)
+        if not os.path.isdir(carpeta):
+            continue
+        for version in _versiones(carpeta):
+            ruta_firma = os.path.join(version, 'firma.npy')
+            if not os.path.isfile(ruta_firma):
+                continue
+            tamano = sum(os.path.getsize(os.path.join(version, archivo)) for archivo in os.listdir(version))
+            entradas.append((os.stat(ruta_firma).st_mtime, tamano, version))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, version in sorted(entradas):
+        if total <= MAX_BYTES_CACHE:
+            break
+        shutil.rmtree(version, ignore_errors=True)
+        total -= tamano
+
+
+def eliminar(path: str) -> None:
+    """
+        Elimina la caché de una malla, si existe.
+        Las versiones mapeadas a memoria que no se pueden eliminar se eliminan al volver a cargar o guardar la malla.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo de la malla original
+    """
+
+    carpeta = ruta_cache(path)
+    if os.path.isdir(carpeta):
+        shutil.rmtree(carpeta, ignore_errors=True)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Caché persistente en disco de resultados de orientación automática.
+
+Cada entrada se identifica por un hash del contenido de la malla (vértices y caras) y de los
+parámetros de la orientación, y guarda el modelo ajustado, el descriptor de la pieza y la
+transformación final aplicada a la malla. Las entradas se guardan como archivos .npz independientes,
+la fecha de modificación de cada archivo se usa como registro del último uso, de esta forma al
+superar el tamaño máximo se eliminan las entradas usadas hace más tiempo (LRU).
+"""
+import os
+import hashlib
+import numpy as np
+from typing import Dict, Sequence, Union
+
+
+class CacheOrientacion:
+    """
+        Caché en disco de orientaciones automáticas, con eliminación LRU acotada por tamaño.
+
+        Attributes
+        ----------
+        directorio: str, by default ~/.ima/cache_orientacion
+            carpeta donde se guardan las entradas.
+
+        max_bytes: int, by default 64 MB
+            tamaño máximo que pueden ocupar las entradas en disco.
+
+        error_reportado: bool, by default False
+            indica si ya se informó un error de escritura, los errores siguientes no se vuelven a informar.
+
+        Methods
+        -------
+        clave
+            Calcula la clave de una malla a partir del hash de sus vértices, caras y parámetros de orientación.
+
+        obtener
+            Entrega la entrada asociada a una clave, o None si no existe.
+
+        guardar
+            Guarda una entrada y elimina las entradas menos usadas si se supera el tamaño máximo.
+
+        limpiar
+            Elimina todas las entradas de la caché.
+    """
+
+    def __init__(self, directorio: str=None, max_bytes: int=64*1024**2) -> None:
+        """
+            Constructor para la clase CacheOrientacion.
+
+            Parameters
+            ----------
+            directorio : str, optional
+                carpeta donde se guardan las entradas, by default None usa ~/.ima/cache_orientacion
+            max_bytes : int, optional
+                tamaño máximo que pueden ocupar las entradas en disco, by default 64 MB
+        """
+
+        if directorio is None:
+            directorio = os.path.join(os.path.expanduser('~'), '.ima', 'cache_orientacion')
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.error_reportado = False
+
+    def clave(self, vertices: np.ndarray, caras: np.ndarray, parametros: Sequence=()) -> str:
+        """
+            Calcula la clave de una malla a partir del hash de sus vértices, caras y parámetros de orientación.
+
+            Parameters
+            ----------
+            vertices : np.ndarray
+                vértices de la malla, con forma (N, 3)
+            caras : np.ndarray
+                caras de la malla, con forma (M, 3)
+            parametros : Sequence, optional
+                parámetros que afectan el resultado de la orientación (tipo de pieza, marcadores, etc.), by default ()
+
+            Returns
+            -------
+            str
+                clave hexadecimal de la malla
+        """
+
+        resumen = hashlib.blake2b(digest_size=20)
+        resumen.update(np.ascontiguousarray(vertices, dtype=np.float64).tobytes())
+        resumen.update(np.ascontiguousarray(caras, dtype=np.int64).tobytes())
+        resumen.update(repr(tuple(parametros)).encode())
+        return resumen.hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        """
+            Entrega la ruta del archivo de una entrada.
+
+            Parameters
+            ----------
+            clave : str
+                clave de la entrada
+
+            Returns
+            -------
+            str
+                ruta del archivo .npz de la entrada
+        """
+
+        return os.path.join(self.directorio, clave + '.npz')
+
+    def obtener(self, clave: str) -> Union[Dict[str, np.ndarray], None]:
+        """
+            Entrega la entrada asociada a una clave, o None si no existe o no se puede leer.
+            Al encontrarla se actualiza su fecha de último uso.
+
+            Parameters
+            ----------
+            clave : str
+                clave de la malla, calculada con clave
+
+            Returns
+            -------
+            Union[Dict[str, np.ndarray], None]
+                diccionario con 'transformacion' (4, 4), 'modelo' y 'descriptor' de la orientación guardada
+        """
+
+        ruta = self._ruta(clave)
+        if not os.path.isfile(ruta):
+            return None
+        try:
+            with np.load(ruta) as datos:
+                entrada = {nombre: datos[nombre] for nombre in datos.files}
+            os.utime(ruta)
+        except (OSError, ValueError):
+            return None
+        return entrada
+
+    def guardar(self, clave: str, transformacion: np.ndarray, modelo: Sequence=(), descriptor: Sequence=()) -> None:
+        """
+            Guarda una entrada y elimina las entradas menos usadas si se supera el tamaño máximo.
+            Errores de escritura (OSError) no detienen la orientación, solo se informa el primero.
+
+            Parameters
+            ----------
+            clave : str
+                clave de la malla, calculada con clave
+            transformacion : np.ndarray
+                transformación homogénea final aplicada a la malla, con forma (4, 4)
+            modelo : Sequence, optional
+                parámetros del modelo ajustado, by default ()
+            descriptor : Sequence, optional
+                descriptor de la pieza [radio, ángulo], vacío si no aplica, by default ()
+        """
+
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            # Se escribe a un archivo temporal para no dejar entradas incompletas
+            temporal = self._ruta(clave) + '.tmp'
+            with open(temporal, 'wb') as archivo:
+                np.savez(archivo, transformacion=np.asarray(transformacion, dtype=np.float64),
+                         modelo=np.asarray(modelo, dtype=np.float64), descriptor=np.asarray(descriptor, dtype=np.float64))
+            os.replace(temporal, self._ruta(clave))
+            self._recortar()
+        except OSError as error:
+            if not self.error_reportado:
+                print("NO SE PUDO GUARDAR LA CACHÉ DE ORIENTACIÓN: {}".format(error))
+                self.error_reportado = True
+
+    def _recortar(self) -> None:
+        """
+            Elimina las entradas usadas hace más tiempo hasta que el tamaño total sea menor a max_bytes.
+        """
+
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.npz'):
+                estado = os.stat(os.path.join(self.directorio, nombre))
+                entradas.append((estado.st_mtime, estado.st_size, nombre))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, nombre in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directorio, nombre))
+            total -= tamano
+
+    def limpiar(self) -> None:
+        """
+            Elimina todas las entradas de la caché.
+        """
+
+        if not os.path.isdir(self.directorio):
+            return
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.npz'):
+                os.remove(os.path.join(self.directorio, nombre))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en memoria de secciones transversales de mallas.
+
+Cada malla se identifica por un hash de sus vértices y caras. Como las piezas cilíndricas y cónicas
+se cortan desenrolladas, el hash de la malla desenrollada incluye la transformación usada. Por cada
+malla se guardan las secciones ya calculadas indexadas por altura, de esta forma al cambiar solo la
+geometría del cordón se reutilizan las alturas ya cortadas (o las que están dentro de una tolerancia)
+y solo se cortan las alturas nuevas.
+"""
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import List, Sequence, Union
+
+
+class CacheSecciones:
+    """
+        Caché en memoria de secciones por altura, con eliminación LRU acotada por cantidad de mallas.
+
+        Attributes
+        ----------
+        max_mallas: int, by default 4
+            cantidad máxima de mallas con secciones guardadas.
+
+        tolerancia: float, by default 0.02
+            diferencia máxima entre una altura pedida y una guardada para reutilizar la sección guardada.
+
+        Methods
+        -------
+        clave
+            Calcula la clave de una malla a partir del hash de sus vértices y caras.
+
+        obtener
+            Entrega las secciones guardadas para las alturas pedidas, None en las alturas sin sección.
+
+        guardar
+            Guarda secciones de una malla para las alturas indicadas.
+
+        limpiar
+            Elimina todas las secciones guardadas.
+    """
+
+    def __init__(self, max_mallas: int=4, tolerancia: float=0.02) -> None:
+        """
+            Constructor para la clase CacheSecciones.
+
+            Parameters
+            ----------
+            max_mallas : int, optional
+                cantidad máxima de mallas con secciones guardadas, by default 4
+            tolerancia : float, optional
+                diferencia máxima entre una altura pedida y una guardada para reutilizar la sección, by default 0.02
+        """
+
+        self.max_mallas = max_mallas
+        self.tolerancia = tolerancia
+        # clave -> (alturas ordenadas, secciones en el mismo orden)
+        self._entradas = OrderedDict()
+
+    def clave(self, vertices: np.ndarray, caras: np.ndarray) -> str:
+        """
+            Calcula la clave de una malla a partir del hash de sus vértices y caras.
+
+            Parameters
+            ----------
+            vertices : np.ndarray
+                vértices de la malla, con forma (N, 3)
+            caras : np.ndarray
+                caras de la malla, con forma (M, 3)
+
+            Returns
+            -------
+            str
+                clave hexadecimal de la malla
+        """
+
+        resumen = hashlib.blake2b(digest_size=20)
+        resumen.update(np.ascontiguousarray(vertices, dtype=np.float64).tobytes())
+        resumen.update(np.ascontiguousarray(caras, dtype=np.int64).tobytes())
+        return resumen.hexdigest()
+
+    def obtener(self, clave: str, alturas: Sequence[float]) -> List[Union[list, None]]:
+        """
+            Entrega las secciones guardadas para las alturas pedidas.
+            Se usa la sección de la altura guardada más cercana si está dentro de la tolerancia.
+
+            Parameters
+            ----------
+            clave : str
+                clave de la malla, calculada con clave
+            alturas : Sequence[float]
+                alturas de corte pedidas
+
+            Returns
+            -------
+            List[Union[list, None]]
+                sección de cada altura pedida (lista de polígonos, vacía si el plano no corta la malla),
+                None en las alturas que no tienen sección guardada
+        """
+
+        alturas = np.asarray(alturas, dtype=np.float64)
+        if clave not in self._entradas or len(self._entradas[clave][0]) == 0:
+            return [None]*len(alturas)
+        self._entradas.move_to_end(clave)
+        alturas_guardadas, secciones = self._entradas[clave]
+
+        # Altura guardada más cercana: la anterior o la siguiente en el orden
+        siguientes = np.clip(np.searchsorted(alturas_guardadas, alturas), 0, len(alturas_guardadas) - 1)
+        anteriores = np.clip(siguientes - 1, 0, len(alturas_guardadas) - 1)
+        usar_anterior = np.abs(alturas - alturas_guardadas[anteriores]) <= np.abs(alturas - alturas_guardadas[siguientes])
+        indices = np.where(usar_anterior, anteriores, siguientes)
+        cercanas = np.abs(alturas - alturas_guardadas[indices]) <= self.tolerancia
+
+        return [secciones[indice] if cercana else None for indice, cercana in zip(indices, cercanas)]
+
+    def guardar(self, clave: str, alturas: Sequence[float], secciones: Sequence[list]) -> None:
+        """
+            Guarda secciones de una malla para las alturas indicadas.
+            Si se supera la cantidad máxima de mallas se eliminan las usadas hace más tiempo.
+
+            Parameters
+            ----------
+            clave : str
+                clave de la malla, calculada con clave
+            alturas : Sequence[float]
+                alturas de las secciones
+            secciones : Sequence[list]
+                sección de cada altura, lista de polígonos
+        """
+
+        alturas_guardadas, secciones_guardadas = self._entradas.get(clave, (np.empty(0), []))
+        alturas_nuevas = np.concatenate([alturas_guardadas, np.asarray(alturas, dtype=np.float64)])
+        secciones_nuevas = list(secciones_guardadas) + list(secciones)
+        orden = np.argsort(alturas_nuevas, kind='stable')
+        self._entradas[clave] = (alturas_nuevas[orden], [secciones_nuevas[i] for i in orden])
+        self._entradas.move_to_end(clave)
+
+        while len(self._entradas) > self.max_mallas:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        """
+            Elimina todas las secciones guardadas.
+        """
+
+        self._entradas.clear()
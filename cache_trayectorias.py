@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en memoria de trayectorias calculadas por contorno.
+
+Las capas consecutivas de un daño de paredes rectas entregan contornos casi iguales, que solo cambian en altura.
+Cada contorno se identifica por una firma de sus coordenadas relativas a su esquina mínima, cuantizadas y en un
+orden canónico (sentido antihorario, comenzando por el vértice menor), junto a la estrategia, el ángulo, la geometría
+del cordón y, en estrategias que lo usan, el punto final de la capa anterior (relativo a la misma esquina).
+Al encontrar una firma guardada se entrega la trayectoria guardada trasladada a la posición del nuevo contorno,
+sin volver a calcular la estrategia.
+"""
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from shapely import affinity
+from typing import Any, Sequence, Tuple, Union
+
+
+class CacheTrayectorias:
+    """
+        Caché en memoria de trayectorias por contorno, con eliminación LRU acotada por cantidad de entradas.
+
+        Attributes
+        ----------
+        max_entradas: int, by default 256
+            cantidad máxima de trayectorias guardadas.
+
+        cuantizacion: float, by default 0.01
+            tamaño de la cuantización de las coordenadas relativas de los contornos al calcular la firma.
+            Contornos que difieren en menos que este valor (salvo traslación) comparten trayectoria.
+
+        Methods
+        -------
+        clave
+            Calcula la clave de un contorno y su punto de referencia para trasladar trayectorias.
+
+        obtener
+            Entrega la trayectoria guardada para una clave, trasladada a la referencia indicada.
+
+        guardar
+            Guarda la trayectoria de un contorno.
+
+        limpiar
+            Elimina todas las trayectorias guardadas.
+    """
+
+    def __init__(self, max_entradas: int=256, cuantizacion: float=0.01) -> None:
+        """
+            Constructor para la clase CacheTrayectorias.
+
+            Parameters
+            ----------
+            max_entradas : int, optional
+                cantidad máxima de trayectorias guardadas, by default 256
+            cuantizacion : float, optional
+                tamaño de la cuantización de las coordenadas relativas de los contornos, by default 0.01
+        """
+
+        self.max_entradas = max_entradas
+        self.cuantizacion = cuantizacion
+        # clave -> (referencia del contorno guardado, trayectoria)
+        self._entradas = OrderedDict()
+
+    def clave(self, curva: np.ndarray, parametros: Sequence, endpoint: Tuple) -> Tuple[str, np.ndarray]:
+        """
+            Calcula la clave de un contorno y su punto de referencia para trasladar trayectorias.
+            La referencia es la esquina mínima (x, y, z) del contorno, la firma usa las coordenadas relativas
+            a la referencia, por lo que es invariante a traslaciones. Los vértices se ordenan en sentido antihorario
+            comenzando por el menor, por lo que la firma tampoco depende del vértice inicial ni del sentido del contorno.
+
+            Parameters
+            ----------
+            curva : np.ndarray
+                contorno con forma (N, 3)
+            parametros : Sequence
+                parámetros que definen la trayectoria (estrategia, ángulo, geometría del cordón, etc.)
+            endpoint : Tuple
+                punto final (x, y) de la capa anterior, (None, None) si no hay o la estrategia no lo usa
+
+            Returns
+            -------
+            Tuple[str, np.ndarray]
+                clave hexadecimal del contorno y referencia del contorno
+        """
+
+        curva = np.asarray(curva, dtype=np.float64)
+        referencia = curva.min(axis=0)
+        relativas = _orden_canonico(np.round((curva - referencia)/self.cuantizacion).astype(np.int64))
+        if endpoint[0] is None:
+            endpoint_relativo = None
+        else:
+            endpoint_relativo = tuple(np.round((np.asarray(endpoint, dtype=np.float64) - referencia[:2])/self.cuantizacion).astype(np.int64).tolist())
+
+        resumen = hashlib.blake2b(digest_size=20)
+        resumen.update(np.ascontiguousarray(relativas).tobytes())
+        resumen.update(repr((tuple(parametros), endpoint_relativo)).encode())
+        return resumen.hexdigest(), referencia
+
+    def obtener(self, clave: str, referencia: np.ndarray) -> Union[Any, None]:
+        """
+            Entrega la trayectoria guardada para una clave, trasladada a la referencia indicada.
+            Se trasladan todas las geometrías de shapely contenidas (también dentro de listas y tuplas),
+            los demás valores se entregan sin cambios.
+
+            Parameters
+            ----------
+            clave : str
+                clave del contorno, calculada con clave
+            referencia : np.ndarray
+                referencia del contorno, calculada con clave
+
+            Returns
+            -------
+            Union[Any, None]
+                trayectoria trasladada, None si la clave no está guardada
+        """
+
+        if clave not in self._entradas:
+            return None
+        self._entradas.move_to_end(clave)
+        referencia_guardada, trayectoria = self._entradas[clave]
+        dx, dy, dz = np.asarray(referencia, dtype=np.float64) - referencia_guardada
+        return _trasladar(trayectoria, dx, dy, dz)
+
+    def guardar(self, clave: str, referencia: np.ndarray, trayectoria: Any) -> None:
+        """
+            Guarda la trayectoria de un contorno.
+            Si se supera la cantidad máxima de entradas se eliminan las usadas hace más tiempo.
+
+            Parameters
+            ----------
+            clave : str
+                clave del contorno, calculada con clave
+            referencia : np.ndarray
+                referencia del contorno, calculada con clave
+            trayectoria : Any
+                trayectoria y resultados asociados, las geometrías de shapely se trasladan al obtenerla
+        """
+
+        self._entradas[clave] = (np.asarray(referencia, dtype=np.float64), trayectoria)
+        self._entradas.move_to_end(clave)
+
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        """
+            Elimina todas las trayectorias guardadas.
+        """
+
+        self._entradas.clear()
+
+
+def _orden_canonico(relativas: np.ndarray) -> np.ndarray:
+    """
+        Ordena los vértices cuantizados de un contorno en sentido antihorario, comenzando por el vértice menor
+        (orden lexicográfico x, y, z). El vértice de cierre repetido se elimina.
+
+        Parameters
+        ----------
+        relativas : np.ndarray
+            coordenadas cuantizadas del contorno, con forma (N, 3)
+
+        Returns
+        -------
+        np.ndarray
+            coordenadas en orden canónico, con forma (N, 3) o (N - 1, 3) si el contorno estaba cerrado
+    """
+
+    if len(relativas) > 1 and np.array_equal(relativas[0], relativas[-1]):
+        relativas = relativas[:-1]
+    if len(relativas) < 3:
+        return relativas
+    # Área con signo (fórmula del zapatero), negativa en sentido horario
+    x, y = relativas[:, 0], relativas[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+        relativas = relativas[::-1]
+    inicio = np.lexsort(relativas.T[::-1])[0]
+    return np.roll(relativas, -inicio, axis=0)
+
+
+def _trasladar(objeto: Any, dx: float, dy: float, dz: float) -> Any:
+    """
+        Traslada las geometrías de shapely de un objeto, recorriendo listas y tuplas.
+
+        Parameters
+        ----------
+        objeto : Any
+            geometría, lista o tupla de geometrías, u otro valor
+        dx : float
+            traslación en X
+        dy : float
+            traslación en Y
+        dz : float
+            traslación en Z
+
+        Returns
+        -------
+        Any
+            objeto con las geometrías trasladadas
+    """
+
+    if isinstance(objeto, (list, tuple)):
+        return type(objeto)(_trasladar(elemento, dx, dy, dz) for elemento in objeto)
+    if hasattr(objeto, 'geom_type'):
+        return affinity.translate(objeto, dx, dy, dz)
+    return objeto
@@ -1,6 +1,23 @@
 # -*- coding: utf-8 -*-
+import os
 import vedo
 import trimesh
+import numpy as np
+import cache_malla
+from malla_compartida import MallaCompartida, compartir
+from typing import Union
+
+# Fracciones de caras de la pirámide de niveles de detalle
+NIVELES_DETALLE = (0.01, 0.1, 1.0)
+# Nivel usado para orientar (visualización y ajustes RANSAC) y nivel usado para visualizar e interactuar
+DETALLE_ORIENTACION = NIVELES_DETALLE[0]
+DETALLE_VISUALIZACION = NIVELES_DETALLE[1]
+# Niveles reducidos no bajan de esta cantidad de caras
+MIN_CARAS_DETALLE = 20000
+# Formatos que siempre son nubes de puntos, PLY se revisa según su encabezado
+EXTENSIONES_NUBE = ('.pcd', '.xyz', '.xyzn', '.pts')
+# Voxel por defecto para nubes, como fracción de la dimensión mayor de la nube
+FRACCION_VOXEL = 0.002
 
 class DatosPieza:
     """"
@@ -50,17 +67,40 @@ class DatosPieza:
             TODO\n
             default = [0, 0]
 
+        es_nube : bool
+            indicador de pieza cargada como nube de puntos. En ese caso pieza_trmsh no tiene caras
+            y guarda las normales estimadas en vertex_normals\n
+            default = False
+
+        tam_voxel : float
+            tamaño de voxel usado para submuestrear la nube de puntos cargada\n
+            default = None
+
+        niveles_detalle : dict {fraccion : float, malla : trimesh.Trimesh}
+            niveles de detalle reducidos de pieza_trmsh, decimados una vez por carga y usados para
+            visualización y ajustes de orientación. Los cortes siempre usan pieza_trmsh\n
+            default = {}
+
         Methods
         -------
         cargar_malla
             Carga la malla indicada en el path.
-            Se carga usando Trimesh, y se guarda en el atributo pieza_trmsh
+            Se carga usando Trimesh, y se guarda en el atributo pieza_trmsh.
+            Si existe una caché válida del archivo (cache_malla), la malla limpia se mapea a memoria desde ella.
+            Archivos de nubes de puntos se cargan con cargar_nube
+
+        cargar_nube
+            Carga la nube de puntos indicada en el path, submuestreada por voxels y con normales estimadas.
+            Se guarda en pieza_trmsh como malla sin caras
         
         get_vedo_format
             Retorna la malla guardada en pieza_trmsh como malla de tipo vedo.Mesh
         
         get_trimesh_format
             Retorna la malla guardada en pieza_trmsh como malla de tipo trimesh.Trimesh
+
+        get_nivel_detalle
+            Retorna la malla guardada en pieza_trmsh decimada a la fracción de caras indicada
         
         get_cortes
             Retorna la malla guardada en pieza_trmsh como malla de tipo trimesh.Trimesh
@@ -86,15 +126,24 @@ class DatosPieza:
         self.step_over = None
         self.puntos_ancla_trayectorias = []
         self.pto_to_origen = [0, 0]  # [x,z], UTIL EN CASO DE CILINDROS
+        self.es_nube = False
+        self.tam_voxel = None
+        self.niveles_detalle = {}
+        self._hash_detalle = None
     
-    def cargar_malla(self, path: str) -> str:
+    def cargar_malla(self, path: str, usar_cache: bool=True) -> str:
         """
-        Carga la malla indicada por path y la guarda como malla trimesh.Trimesh
+        Carga la malla indicada por path y la guarda como malla trimesh.Trimesh.
+        La primera carga guarda la malla limpia en la caché de mallas (cache_malla), las siguientes
+        cargas la mapean a memoria sin leer ni limpiar el archivo mientras su tamaño y fecha no cambien.
+        Si la caché no se puede escribir, la malla se carga igual y el mensaje lo indica.
 
         Parameters
         ----------
         path : str
             Path al archivo que se cargará
+        usar_cache : bool, optional
+            indicador de uso de la caché de mallas, by default True
         
         Returns
         ----------
@@ -102,25 +151,107 @@ class DatosPieza:
             Mensaje indicando que operación se llevó a cabo con éxito
         """
         
+        if es_archivo_nube(path):
+            return self.cargar_nube(path)
+
         # TODO: Revisar si validación es necesaria
         self.path_pieza = path
-        self.pieza_trmsh = trimesh.load_mesh(path, file_type=None, process=True, validate=True)
+        self.es_nube = False
+        self.tam_voxel = None
+        self.pieza_trmsh = cache_malla.cargar(path) if usar_cache else None
+        msge = 'ARCHIVO CARGADO CORRECTAMENTE!\n'
 
-        # SE ELIMINAN VÉRTICES SOBRANTES DUPLICADOS
-        # RECORDAR QUE HAY VÉRTICES DUPLICADOS YA QUE SE COMPARTEN ENTRE TRIÁNGULOS
-        self.pieza_trmsh.remove_duplicate_faces()
-        self.pieza_trmsh.remove_degenerate_faces(height=1e-08)
-        self.pieza_trmsh.remove_unreferenced_vertices()
-        self.pieza_trmsh.remove_infinite_values()
+        if self.pieza_trmsh is None:
+            self.pieza_trmsh = trimesh.load_mesh(path, file_type=None, process=True, validate=True)
 
-        msge = 'ARCHIVO CARGADO CORRECTAMENTE!\n'
+            # SE ELIMINAN VÉRTICES SOBRANTES DUPLICADOS
+            # RECORDAR QUE HAY VÉRTICES DUPLICADOS YA QUE SE COMPARTEN ENTRE TRIÁNGULOS
+            self.pieza_trmsh.remove_duplicate_faces()
+            self.pieza_trmsh.remove_degenerate_faces(height=1e-08)
+            self.pieza_trmsh.remove_unreferenced_vertices()
+            self.pieza_trmsh.remove_infinite_values()
+
+            if usar_cache:
+                try:
+                    cache_malla.guardar(path, self.pieza_trmsh)
+                except OSError as error:
+                    msge += 'NO SE PUDO GUARDAR LA CACHÉ DE LA MALLA: {}\n'.format(error)
+
+        self.niveles_detalle = {}
         self.reiniciar_cortes()
         self.reiniciar_trayectorias()
 
         return msge
     
+    def cargar_nube(self, path: str, tam_voxel: float=None, punto_vista: np.ndarray=None) -> str:
+        """
+        Carga la nube de puntos indicada por path, sin mallarla.
+        La nube se submuestrea con una grilla de voxels. Si el archivo no trae normales se estiman, orientadas de forma
+        consistente y hacia el punto de vista desde el que se escaneó la pieza, si se conoce. Sin punto de vista se orientan
+        hacia afuera del material, alejándose del centroide (del eje en cilindros, ver direcciones_afuera).
+        Las normales del escáner se usan sin cambios.
+        Se guarda en pieza_trmsh como trimesh.Trimesh sin caras, con las normales en vertex_normals,
+        de esta forma visualización, orientación y cortes la usan directamente.
+
+        Parameters
+        ----------
+        path : str
+            Path al archivo de la nube (.pcd, .ply, .xyz, .xyzn, .pts)
+        tam_voxel : float, optional
+            tamaño de voxel para el submuestreo, by default None usa FRACCION_VOXEL de la dimensión mayor de la nube
+        punto_vista : np.ndarray, optional
+            posición del sensor al escanear, hacia la cual se orientan las normales estimadas, by default None
+            usa el VIEWPOINT del encabezado en archivos PCD si no es el valor por defecto
+
+        Returns
+        ----------
+        msge : str
+            Mensaje indicando que operación se llevó a cabo con éxito
+        """
+
+        import open3d as o3d
+
+        self.path_pieza = path
+        nube = o3d.io.read_point_cloud(path)
+        nube = nube.remove_non_finite_points()
+        if tam_voxel is None:
+            tam_voxel = FRACCION_VOXEL*max(nube.get_max_bound() - nube.get_min_bound())
+        nube = nube.voxel_down_sample(tam_voxel)
+
+        # Normales del escáner se mantienen, si no existen se estiman con los vecinos de cada punto
+        estimadas = not nube.has_normals()
+        if estimadas:
+            nube.estimate_normals(o3d.geometry.KDTreeSearchParamHybrid(radius=3*tam_voxel, max_nn=30))
+            nube.orient_normals_consistent_tangent_plane(15)
+        nube.normalize_normals()
+        puntos = np.asarray(nube.points)
+        normales = np.asarray(nube.normals)
+        # Orientación consistente no fija el signo global, se eligen normales hacia el sensor o hacia afuera
+        if estimadas:
+            if punto_vista is None:
+                punto_vista = punto_vista_pcd(path)
+            if punto_vista is None:
+                direcciones = direcciones_afuera(puntos, normales, self.tipo_pieza)
+            else:
+                direcciones = np.asarray(punto_vista, dtype=np.float64) - puntos
+            if np.einsum('ij,ij->', direcciones, normales) < 0:
+                normales = -normales
+
+        self.pieza_trmsh = trimesh.Trimesh(vertices=puntos, faces=np.empty((0, 3), dtype=np.int64),
+                                           vertex_normals=normales, process=False, validate=False)
+        self.es_nube = True
+        self.tam_voxel = tam_voxel
+
+        msge = 'NUBE DE PUNTOS CARGADA CORRECTAMENTE! {} PUNTOS\n'.format(len(puntos))
+        self.niveles_detalle = {}
+        self.reiniciar_cortes()
+        self.reiniciar_trayectorias()
+
+        return msge
+
     def get_vedo_format(self) -> vedo.Mesh:
         """Entrega la malla cargada en pieza_trmsh en formato Vedo.
+        La malla vedo comparte vértices, caras y normales con pieza_trmsh, sin copiarlos.
 
         Parameters
         ----------
@@ -132,7 +263,7 @@ class DatosPieza:
             Malla en formato vedo.Mesh
         """
 
-        return vedo.utils.trimesh2vedo(self.pieza_trmsh)
+        return MallaCompartida.desde_trimesh(self.pieza_trmsh).a_vedo()
 
     def get_trimesh_format(self) -> trimesh.Trimesh:
         """
@@ -149,6 +280,45 @@ class DatosPieza:
         """
 
         return self.pieza_trmsh
+
+    def get_nivel_detalle(self, fraccion: float=1.0) -> trimesh.Trimesh:
+        """
+            Entrega la malla cargada en pieza_trmsh decimada a la fracción de caras indicada.
+            Los niveles se deciman con el método de cuádricas la primera vez que se piden, y se guardan
+            en niveles_detalle hasta que pieza_trmsh cambie.
+            Niveles reducidos no bajan de MIN_CARAS_DETALLE caras, en mallas pequeñas se entrega la malla completa.
+
+            Parameters
+            ----------
+            fraccion : float, optional
+                fracción de caras de la malla completa, por ejemplo un valor de NIVELES_DETALLE, by default 1.0
+
+            Returns
+            ----------
+            trimesh.Trimesh
+                malla decimada, o pieza_trmsh si la fracción no reduce la malla
+        """
+
+        if self.pieza_trmsh is None:
+            return None
+
+        # Niveles se descartan si la malla cambió (nueva pieza, orientación, rotación de vértices)
+        # El hash de trimesh cubre vértices y caras, y se actualiza también con cambios en el lugar
+        hash_malla = hash(self.pieza_trmsh)
+        if self._hash_detalle != hash_malla:
+            self.niveles_detalle = {}
+            self._hash_detalle = hash_malla
+
+        cant_caras = len(self.pieza_trmsh.faces)
+        caras_objetivo = max(int(fraccion*cant_caras), MIN_CARAS_DETALLE)
+        if caras_objetivo >= cant_caras:
+            return self.pieza_trmsh
+
+        if fraccion not in self.niveles_detalle:
+            malla = MallaCompartida.desde_trimesh(self.pieza_trmsh).a_vedo()
+            malla.decimate(fraction=caras_objetivo/cant_caras, method='quadric')
+            self.niveles_detalle[fraccion] = compartir(malla).a_trimesh()
+        return self.niveles_detalle[fraccion]
     
     def get_cortes(self) -> list:
         """
@@ -216,3 +386,96 @@ class DatosPieza:
         """
 
         self.puntos_ancla_trayectorias = []
+
+
+def es_archivo_nube(path: str) -> bool:
+    """
+        Indica si el archivo corresponde a una nube de puntos.
+        Archivos PLY se consideran nubes si su encabezado no declara caras.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo
+
+        Returns
+        -------
+        bool
+            indicador de nube de puntos
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXTENSIONES_NUBE:
+        return True
+    if extension != '.ply':
+        return False
+
+    # Encabezado PLY es texto aunque el cuerpo sea binario
+    with open(path, 'rb') as archivo:
+        for linea in archivo:
+            palabras = linea.decode('ascii', errors='ignore').split()
+            if palabras[:2] == ['element', 'face']:
+                return int(palabras[2]) == 0
+            if palabras[:1] == ['end_header']:
+                break
+    return True
+
+
+def punto_vista_pcd(path: str) -> Union[np.ndarray, None]:
+    """
+        Entrega la posición del sensor declarada en el campo VIEWPOINT del encabezado de un archivo PCD.
+        El VIEWPOINT por defecto (origen) no indica un sensor real, al igual que archivos de otros formatos o sin VIEWPOINT.
+
+        Parameters
+        ----------
+        path : str
+            path al archivo
+
+        Returns
+        -------
+        Union[np.ndarray, None]
+            posición (x, y, z) del sensor, None si el archivo no declara un sensor
+    """
+
+    if os.path.splitext(path)[1].lower() == '.pcd':
+        # Encabezado PCD es texto aunque el cuerpo sea binario
+        with open(path, 'rb') as archivo:
+            for linea in archivo:
+                palabras = linea.decode('ascii', errors='ignore').split()
+                if palabras[:1] == ['VIEWPOINT']:
+                    punto_vista = np.array(palabras[1:4], dtype=np.float64)
+                    return punto_vista if np.any(punto_vista != 0) else None
+                if palabras[:1] == ['DATA']:
+                    break
+    return None
+
+
+def direcciones_afuera(puntos: np.ndarray, normales: np.ndarray, tipo_pieza: int=0) -> np.ndarray:
+    """
+        Entrega direcciones aproximadas hacia afuera del material en cada punto, usadas para fijar el signo
+        global de normales estimadas sin punto de vista.
+        En general son las direcciones desde el centroide de la nube. En cilindros se quita la componente a lo largo
+        del eje, estimado como la dirección más perpendicular a las normales, así las direcciones son radiales.
+
+        Parameters
+        ----------
+        puntos : np.ndarray
+            puntos de la nube, con forma (N, 3)
+        normales : np.ndarray
+            normales unitarias de los puntos, con signo arbitrario, con forma (N, 3)
+        tipo_pieza : int, optional
+            indicador de tipo de pieza, 0=placa, 1=cilindro, 2=cono, by default 0
+
+        Returns
+        -------
+        np.ndarray
+            direcciones hacia afuera del material, con forma (N, 3)
+    """
+
+    direcciones = puntos - puntos.mean(axis=0)
+    if tipo_pieza == 1:
+        # Normales de un cilindro son perpendiculares al eje, el eje es el vector propio de menor valor propio
+        _, vectores = np.linalg.eigh(normales.T @ normales)
+        eje = vectores[:, 0]
+        direcciones = direcciones - np.outer(direcciones @ eje, eje)
+    return direcciones
@@ -2,6 +2,7 @@ import wx
 import vedo
 import trimesh
 import utilidades
+from malla_compartida import MallaCompartida, compartir
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
@@ -84,6 +85,10 @@ class VedoPanel(wx.Panel):
         mesh: vedo.mesh.Mesh, by default None
             malla cargada o por cargar en el panel
         
+        mesh_visible: vedo.mesh.Mesh, by default None
+            malla dibujada en el panel. Corresponde a un nivel de detalle reducido de mesh si se ingresa al
+            insertar la pieza, si no es la misma mesh. Se mueve junto con mesh al orientar.
+        
         axes: vedo.addons.Axes, by default None
             instancia de Axes para visualización
         
@@ -115,7 +120,11 @@ class VedoPanel(wx.Panel):
 
         insertar_pieza
             inserta malla Trimesh o carga malla ingresada en file al Plotter del panel.
+            Puede recibir un nivel de detalle reducido de la malla para visualización.
             En caso de que ya haya una malla cargada la reemplaza.
+
+        mallas_panel
+            entrega las mallas del panel, la malla completa y la visible si son distintas.
         
         insertar_axes
             Inicializa e inserta ejes de coordenadas en el panel, usando las dimensiones 
@@ -201,6 +210,7 @@ class VedoPanel(wx.Panel):
         self.uso = "ver"
         self.plotter = None
         self.mesh = None
+        self.mesh_visible = None
         self.axes = None
         self.cortes = False
         self.trayectorias = False
@@ -302,10 +312,12 @@ class VedoPanel(wx.Panel):
                     ("MouseMove", self.paint_cells)]
             self.insertar_callbacks(lista)
 
-    def insertar_pieza(self, file: Union[trimesh.Trimesh, str]=None, centrada: bool=False) -> None:
+    def insertar_pieza(self, file: Union[trimesh.Trimesh, str]=None, centrada: bool=False, detalle: trimesh.Trimesh=None) -> None:
         """
             Inserta malla Trimesh o carga malla ingresada en file al Plotter del panel.
             En caso de que ya haya una malla cargada la reemplaza.
+            Si se ingresa un nivel de detalle reducido de la malla, este es el que se dibuja y se usa para
+            seleccionar puntos, mientras que la malla completa se mantiene para los cálculos.
 
             Parameters
             ----------
@@ -313,24 +325,53 @@ class VedoPanel(wx.Panel):
                 malla que se quiere ingresar al panel, by default None
             centrada : bool, optional
                 indicador de centrado de pieza al ingresarla, by default False
+            detalle : trimesh.Trimesh, optional
+                nivel de detalle reducido de file usado para visualización, by default None
         """
         if self.mesh is not None:
             self.reiniciar_panel()
-            self.plotter.remove([self.mesh], at=0)
+            self.plotter.remove([self.mesh_visible], at=0)
         
         if isinstance(file, trimesh.base.Trimesh):
-            self.mesh = vedo.utils.trimesh2vedo(file)
+            # Comparte vértices, caras y normales de la malla trimesh sin copiarlos
+            self.mesh = MallaCompartida.desde_trimesh(file).a_vedo()
         if isinstance(file, str):
             self.mesh = vedo.Mesh(file)
 
-        if centrada:
-            self.mesh.shift(dx=-self.mesh.centerOfMass()[0], dy=-self.mesh.centerOfMass()[1], dz=-self.mesh.centerOfMass()[2])
-            self.mesh.origin(x=self.mesh.centerOfMass()[0], y=self.mesh.centerOfMass()[1], z=self.mesh.centerOfMass()[2])
+        if detalle is not None and detalle is not file:
+            self.mesh_visible = MallaCompartida.desde_trimesh(detalle).a_vedo()
+        else:
+            self.mesh_visible = self.mesh
 
-        self.mesh.computeNormals()
-        self.mesh.color("tan")
-        self.plotter.add([self.mesh], at=0).resetCamera()
+        if centrada:
+            # Malla visible se centra con el centro de la malla completa para que ambas coincidan
+            centro = self.mesh.centerOfMass()
+            for malla in self.mallas_panel():
+                malla.shift(dx=-centro[0], dy=-centro[1], dz=-centro[2])
+            centro = self.mesh.centerOfMass()
+            for malla in self.mallas_panel():
+                malla.origin(x=centro[0], y=centro[1], z=centro[2])
+
+        # Normales solo se calculan si la malla no las trae
+        for malla in self.mallas_panel():
+            if malla.polydata(False).GetPointData().GetNormals() is None:
+                malla.computeNormals()
+        self.mesh_visible.color("tan")
+        self.plotter.add([self.mesh_visible], at=0).resetCamera()
         self.insertar_axes(self.mesh)
+
+    def mallas_panel(self) -> List[vedo.Mesh]:
+        """
+            Entrega las mallas del panel, la malla completa y la visible si son distintas.
+
+            Returns
+            -------
+            List[vedo.Mesh]
+                lista con mesh, y mesh_visible si corresponde a un nivel de detalle reducido
+        """
+        if self.mesh_visible is None or self.mesh_visible is self.mesh:
+            return [self.mesh]
+        return [self.mesh, self.mesh_visible]
         
     def insertar_axes(self, mesh: vedo.Mesh=None) -> None:
         """
@@ -505,9 +546,9 @@ class VedoPanel(wx.Panel):
         """
 
         # Radio de búsqueda es del 5% de la dimensión mayor de la pieza
-        rangex = self.mesh.bounds()[1] - self.mesh.bounds()[0]
-        rangey = self.mesh.bounds()[3] - self.mesh.bounds()[2]
-        rangez = self.mesh.bounds()[5] - self.mesh.bounds()[4]
+        rangex = self.mesh_visible.bounds()[1] - self.mesh_visible.bounds()[0]
+        rangey = self.mesh_visible.bounds()[3] - self.mesh_visible.bounds()[2]
+        rangez = self.mesh_visible.bounds()[5] - self.mesh_visible.bounds()[4]
         self.radio_busqueda = 0.05*np.amax([rangex, rangey, rangez])
         if event.picked3d is not None:
             # Esfera se agrega y quita contínuamente para actualizar posición
@@ -515,7 +556,8 @@ class VedoPanel(wx.Panel):
             self.esfera_seleccion = vedo.shapes.Sphere(pos=event.picked3d, r=self.radio_busqueda, c='black', alpha=0.4, res=30)
             self.plotter.add(self.esfera_seleccion)
             if self.pintar:
-                contour = self.mesh.closestPoint(event.picked3d, radius=self.radio_busqueda, returnPointId=False, returnCellId=False)
+                # Búsqueda sobre la malla visible, de menor resolución
+                contour = self.mesh_visible.closestPoint(event.picked3d, radius=self.radio_busqueda, returnPointId=False, returnCellId=False)
                 self.plotter.add(vedo.Mesh(vedo.Points(contour)).c('red5'))
                 if self.puntos_pintados is None:
                     self.puntos_pintados = contour
@@ -545,6 +587,8 @@ class VedoPanel(wx.Panel):
             a orientar con el eje Z.
             Actualiza y muestra malla en su orientación base necesaria para procesamiento de datos.
             Cálculos de orientación son hechos a través de instancia de Procesador.
+            Orientaciones automáticas de mallas ya conocidas se recuperan desde la caché del Procesador,
+            junto con el descriptor de cilindros y conos.
             Solo utilizada si uso='orientar'.
 
             Parameters
@@ -555,11 +599,17 @@ class VedoPanel(wx.Panel):
         
         # Se calcula orientación para la malla, ingresando el tipo de pieza y la lista de marcadores correspondiente
         # No es necesaria condición especial de placa, no requiere cálculos especiales
+        # Ajustes automáticos se hacen sobre la malla visible si es de menor resolución
+        malla_detalle = self.mesh_visible if self.mesh_visible is not self.mesh else None
         self.rotaciones, self.mesh, self.marcadores_orientacion = self.procesador.orientar_malla(self.mesh, 
                                                                                                 self.marcadores_orientacion, 
                                                                                                 self.rotaciones, 
                                                                                                 self.tipo_pieza,
-                                                                                                self.tipo_orientacion)
+                                                                                                self.tipo_orientacion,
+                                                                                                malla_detalle)
+        # Orientación automática (ajustada o recuperada desde caché) ya entrega descriptor de cilindros y conos
+        if self.procesador.descriptor_orientacion is not None:
+            self.descriptor_cilindro_cono = list(self.procesador.descriptor_orientacion)
         # TODO: MOVER CÁLCULO DE DESCRIPTORES A OBJETO DATOS
         # Para casos de cilindros y conos hay que calcular el descriptor
         # Caso de cilindros solo se estima el radio
@@ -581,7 +631,7 @@ class VedoPanel(wx.Panel):
             self.descriptor_cilindro_cono[0] = radio
             
             punto_origen = np.asarray(self.marcadores_orientacion[0].getTransform().GetPosition())
-            self.descriptor_cilindro_cono[1] = self.procesador.calcular_angulo_apertura_cono(vedo.utils.vedo2trimesh(self.mesh), punto_origen)            
+            self.descriptor_cilindro_cono[1] = self.procesador.calcular_angulo_apertura_cono(compartir(self.mesh).a_trimesh(), punto_origen)            
         # Actualizar axes con nueva posición de malla
         self.insertar_axes(self.mesh)
 
@@ -595,7 +645,7 @@ class VedoPanel(wx.Panel):
                 pieza orientada según marcadores
         """
         if self.mesh is not None:
-            return vedo.utils.vedo2trimesh(self.mesh)
+            return compartir(self.mesh).a_trimesh()
         else:
             return None
 
@@ -617,7 +667,9 @@ class VedoPanel(wx.Panel):
         
         # Roatación hecha con respecto al centro de la malla
         rotacion_final = None
-        self.mesh.shift(dx=-self.mesh.centerOfMass()[0], dy=-self.mesh.centerOfMass()[1], dz=-self.mesh.centerOfMass()[2])
+        centro = self.mesh.centerOfMass()
+        for malla in self.mallas_panel():
+            malla.shift(dx=-centro[0], dy=-centro[1], dz=-centro[2])
         # Rotaciones inversas son concatenadas
         # Creo que debería empezar al revés (de fin a principio, pero funciona)
         for rotacion in self.rotaciones:
@@ -627,7 +679,8 @@ class VedoPanel(wx.Panel):
                 rotacion_final *= rotacion.inv()
         # Rotación final es 'Single Rotation', se usa sola, no es subscribible
         if rotacion_final is not None:
-            self.mesh.applyTransform(rotacion_final.as_matrix(), reset=True)
+            for malla in self.mallas_panel():
+                malla.applyTransform(rotacion_final.as_matrix(), reset=True)
         self.rotaciones = []
 
     def eliminar_marcadores(self) -> None:
@@ -654,7 +707,7 @@ class VedoPanel(wx.Panel):
         if self.uso == "hardfacing":
             # Se elimina todo menos lo necesario
             # Hecho así porque no guardamos referencias a esferas de zona "pintada"
-            self.plotter.remove([actor for actor in self.plotter.actors if actor not in [self.mesh, self.axes]], render=False)
+            self.plotter.remove([actor for actor in self.plotter.actors if actor not in [self.mesh_visible, self.axes]], render=False)
             self.esfera_seleccion = None
             # Resetear variables relevantes a hardfacing
             self.crear_para_hardfacing()
@@ -193,6 +193,10 @@ class MainFrame(wx.Frame):
         self.button_hardfacing.SetFont(wx.Font(9, wx.FONTFAMILY_MODERN, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, 0, ""))
         sizer_19.Add(self.button_hardfacing, 1, wx.ALL | wx.EXPAND, 3)
 
+        self.checkbox_capas_adaptativas = wx.CheckBox(self.panel_2, wx.ID_ANY, "Capas adaptativas")
+        self.checkbox_capas_adaptativas.SetFont(wx.Font(9, wx.FONTFAMILY_MODERN, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, 0, ""))
+        sizer_19.Add(self.checkbox_capas_adaptativas, 0, wx.ALL | wx.EXPAND, 3)
+
         self.panel_3 = wx.Panel(self, wx.ID_ANY)
         self.panel_3.SetBackgroundColour(wx.Colour(255, 255, 255))
         sizer_1.Add(self.panel_3, 1, wx.EXPAND, 0)
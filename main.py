@@ -6,11 +6,12 @@ import vtkmodules
 import vtkmodules.all
 from vtkmodules.util import numpy_support
 import copy
+import multiprocessing
 import trimesh
 import utilidades
 import numpy as np
 from shapely.geometry import Polygon
-from datospieza import DatosPieza
+from datospieza import DatosPieza, DETALLE_ORIENTACION, DETALLE_VISUALIZACION
 from procesador import Procesador
 from path_generation import generatorcsr
 from interfaz.interfaz_IMA import MainFrame, VerPiezaFrame, DividirFrame, OrientarFrame, HardfacingFrame
@@ -1176,7 +1177,7 @@ class HerramientaIMA(MainFrame):
 
     def elegir_archivo_datos_pieza(self, event: wx.CommandEvent) -> None:
         """
-            Crea un dialogo para elegir un archivo de STL.
+            Crea un dialogo para elegir un archivo de STL, o de nube de puntos (PCD, PLY, XYZ).
             En caso que se esté eligiendo el mismo archivo se pregunta confirmación a usuario.
             Muestra mensajes de la operación en la consola de la ventana principal.
 
@@ -1186,7 +1187,8 @@ class HerramientaIMA(MainFrame):
                 evento dado por botón, no utilizado
         """
         filedialog = wx.FileDialog(self, message="Elegir archivo de pieza", defaultDir="", defaultFile="",
-                                wildcard="STL files (*.stl)|*.stl", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+                                wildcard="Archivos de pieza (*.stl;*.ply;*.pcd;*.xyz;*.xyzn;*.pts)|*.stl;*.ply;*.pcd;*.xyz;*.xyzn;*.pts|"
+                                         "STL files (*.stl)|*.stl|Nubes de puntos (*.pcd;*.ply;*.xyz;*.xyzn;*.pts)|*.pcd;*.ply;*.xyz;*.xyzn;*.pts", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
         filedialog.ShowModal()
 
         if not filedialog.GetPath():
@@ -1272,7 +1274,8 @@ class HerramientaIMA(MainFrame):
 
         if self.datos_pieza.path_pieza:
             if not self.mallas_iguales(self.datos_pieza.pieza_trmsh, self.ventana_orientar_manual.panel_3d.mesh):
-                self.ventana_orientar_manual.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh, centrada=True)
+                self.ventana_orientar_manual.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh, centrada=True,
+                                                                     detalle=self.datos_pieza.get_nivel_detalle(DETALLE_ORIENTACION))
             self.ventana_orientar_manual.panel_3d.tipo_pieza = self.datos_pieza.tipo_pieza
             self.ventana_orientar_manual.panel_3d.tipo_orientacion = self.tipo_orientacion
             self.ventana_orientar_manual.mostrar_ventana()
@@ -1301,7 +1304,8 @@ class HerramientaIMA(MainFrame):
 
         if self.datos_pieza.path_pieza:
             if not self.mallas_iguales(self.datos_pieza.pieza_trmsh, self.ventana_ver_pieza.panel_3d.mesh):
-                self.ventana_ver_pieza.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh)
+                self.ventana_ver_pieza.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh,
+                                                              detalle=self.datos_pieza.get_nivel_detalle(DETALLE_VISUALIZACION))
             self.ventana_ver_pieza.mostrar_ventana()
         else:
             msge = 'CARGAR ARCHIVO CON DATOS DE PIEZA!\n'
@@ -1345,6 +1349,7 @@ class HerramientaIMA(MainFrame):
         ancho = float(self.text_ctrl_ancho_cordon.GetValue())
         self.datos_pieza.reiniciar_cortes()
         self.datos_pieza.reiniciar_trayectorias()
+        self.procesador.capas_adaptativas = self.checkbox_capas_adaptativas.GetValue()
         
         if self.hardfacing:
             area_seleccion = self.ventana_hardfacing.panel_3d.puntos_pintados
@@ -1392,7 +1397,8 @@ class HerramientaIMA(MainFrame):
         """
 
         if self.datos_pieza.path_pieza:
-            self.ventana_hardfacing.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh, centrada=False)
+            self.ventana_hardfacing.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh, centrada=False,
+                                                            detalle=self.datos_pieza.get_nivel_detalle(DETALLE_VISUALIZACION))
             self.ventana_hardfacing.mostrar_ventana()
         else:
             msge = 'CARGAR ARCHIVO CON DATOS DE PIEZA!\n'
@@ -1447,7 +1453,8 @@ class HerramientaIMA(MainFrame):
 
         # SE CARGA ACÁ PARA QUE CORTES CORRESPONDAN CON PIEZA ORIENTADA
         if not self.mallas_iguales(self.datos_pieza.pieza_trmsh, self.ventana_ver_cortes.panel_3d.mesh):
-            self.ventana_ver_cortes.panel_3d.insertar_pieza(file=self.datos_pieza.pieza_trmsh)
+            self.ventana_ver_cortes.panel_3d.insertar_pieza(file=self.datos_pieza.pieza_trmsh,
+                                                            detalle=self.datos_pieza.get_nivel_detalle(DETALLE_VISUALIZACION))
 
         if self.datos_pieza.curvas_por_capa_modificada:
             self.ventana_ver_cortes.panel_3d.insertar_cortes(self.datos_pieza.curvas_por_capa_modificada)
@@ -1602,7 +1609,8 @@ class HerramientaIMA(MainFrame):
             return
         
         if not self.mallas_iguales(self.datos_pieza.pieza_trmsh, self.ventana_ver_trayectorias.panel_3d.mesh):
-            self.ventana_ver_trayectorias.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh)
+            self.ventana_ver_trayectorias.panel_3d.insertar_pieza(self.datos_pieza.pieza_trmsh,
+                                                                  detalle=self.datos_pieza.get_nivel_detalle(DETALLE_VISUALIZACION))
         self.ventana_ver_trayectorias.panel_3d.insertar_trayectorias(self.datos_pieza.puntos_ancla_trayectorias)
         self.ventana_ver_trayectorias.mostrar_ventana()
 
@@ -1641,5 +1649,7 @@ class MyApp(wx.App):
 
 
 if __name__ == '__main__':
+    # Necesario para usar procesos en el ejecutable de PyInstaller (ajustes RANSAC en paralelo)
+    multiprocessing.freeze_support()
     app = MyApp()
     app.MainLoop()
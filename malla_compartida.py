@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Contenedor de malla compartido entre vedo y trimesh.
+
+Vértices, caras y normales se guardan en un único buffer NumPy por atributo. Las vistas de
+trimesh (Trimesh con process=False) y de vedo (vtkPolyData con arrays deep=False) se construyen
+sobre esos mismos buffers, sin copiar datos. Los vértices se guardan en float64, por lo que mallas
+vedo con puntos float32 (el caso habitual de VTK) se convierten una vez al crear el contenedor. Las normales se calculan solo cuando se piden y la
+geometría cambió, las transformaciones rígidas las rotan en vez de recalcularlas.
+"""
+import vtk
+import vedo
+import trimesh
+import numpy as np
+from vtkmodules.util import numpy_support
+from typing import Union
+
+
+class MallaCompartida:
+    """
+        Contenedor de malla que expone un único buffer de vértices, caras y normales a vedo y trimesh.
+
+        Attributes
+        ----------
+        vertices: np.ndarray
+            vértices de la malla, float64 contiguo con forma (N, 3).
+
+        caras: np.ndarray
+            caras triangulares de la malla, índices contiguos con forma (M, 3).
+
+        normales: np.ndarray
+            normales de vértices, con forma (N, 3). Se calculan al pedirlas si la geometría cambió.
+
+        Methods
+        -------
+        desde_trimesh
+            Crea el contenedor a partir de una malla trimesh, usando sus buffers sin copiarlos.
+
+        desde_vedo
+            Crea el contenedor a partir de una malla vedo, usando los arrays de VTK sin copiarlos si ya son float64.
+
+        geometria_modificada
+            Indica que los vértices cambiaron, las normales se recalculan la próxima vez que se pidan.
+
+        aplicar_transformacion
+            Aplica una transformación rígida en el lugar, rotando las normales en vez de recalcularlas.
+
+        a_trimesh
+            Entrega una malla trimesh que comparte los buffers del contenedor.
+
+        a_vedo
+            Entrega una malla vedo que comparte los buffers del contenedor.
+    """
+
+    def __init__(self, vertices: np.ndarray, caras: np.ndarray, normales: np.ndarray=None) -> None:
+        """
+            Constructor para la clase MallaCompartida.
+            Los arrays ingresados solo se copian si no son contiguos o no tienen el tipo de dato necesario.
+
+            Parameters
+            ----------
+            vertices : np.ndarray
+                vértices de la malla, con forma (N, 3)
+            caras : np.ndarray
+                caras triangulares de la malla, con forma (M, 3)
+            normales : np.ndarray, optional
+                normales de vértices ya calculadas, by default None
+        """
+
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float64)
+        self.caras = np.ascontiguousarray(caras)
+        if self.caras.dtype not in (np.int32, np.int64):
+            self.caras = self.caras.astype(np.int64)
+        self._normales = None if normales is None else np.ascontiguousarray(normales, dtype=np.float64)
+
+    @classmethod
+    def desde_trimesh(cls, malla: trimesh.Trimesh) -> 'MallaCompartida':
+        """
+            Crea el contenedor a partir de una malla trimesh, usando sus buffers sin copiarlos.
+            Las normales se toman de vertex_normals, que reutiliza las normales en caché de trimesh si
+            siguen siendo válidas (y las normales guardadas de nubes sin caras), o las calcula si no existen.
+
+            Parameters
+            ----------
+            malla : trimesh.Trimesh
+                malla a compartir
+
+            Returns
+            -------
+            MallaCompartida
+                contenedor que comparte los buffers de la malla
+        """
+
+        return cls(malla.vertices.view(np.ndarray), malla.faces.view(np.ndarray), malla.vertex_normals.view(np.ndarray))
+
+    @classmethod
+    def desde_vedo(cls, mesh: vedo.Mesh) -> 'MallaCompartida':
+        """
+            Crea el contenedor a partir de una malla vedo, usando los arrays de VTK sin copiarlos.
+            Solo las caras se comparten siempre, puntos y normales se comparten si son float64, en otro caso
+            (puntos float32, el tipo por defecto de VTK) se convierten a float64, copiándolos una vez.
+            Si la malla tiene normales de puntos, se reutilizan.
+            Si la malla tiene transformaciones sin aplicar (por ejemplo shift), vedo entrega una copia
+            transformada y solo en ese caso se copian los datos.
+
+            Parameters
+            ----------
+            mesh : vedo.Mesh
+                malla a compartir
+
+            Returns
+            -------
+            MallaCompartida
+                contenedor que comparte los buffers de la malla
+        """
+
+        polydata = mesh.polydata()
+        vertices = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData())
+
+        # Conectividad de VTK 9 es directamente el array de caras si todas son triángulos
+        poligonos = polydata.GetPolys()
+        conectividad = numpy_support.vtk_to_numpy(poligonos.GetConnectivityArray())
+        if len(conectividad) == 3*poligonos.GetNumberOfCells():
+            caras = conectividad.reshape(-1, 3)
+        else:
+            caras = np.asarray(mesh.faces())
+
+        normales = polydata.GetPointData().GetNormals()
+        if normales is not None:
+            normales = numpy_support.vtk_to_numpy(normales)
+        return cls(vertices, caras, normales)
+
+    @property
+    def normales(self) -> np.ndarray:
+        """
+            Normales de vértices, promedio de las normales de las caras adyacentes ponderadas por área.
+            Se calculan solo si no existen o la geometría cambió.
+
+            Returns
+            -------
+            np.ndarray
+                normales unitarias de vértices, con forma (N, 3)
+        """
+
+        if self._normales is None:
+            triangulos = self.vertices[self.caras]
+            # Producto cruz sin normalizar ya está ponderado por el área de la cara
+            normales_caras = np.cross(triangulos[:, 1] - triangulos[:, 0], triangulos[:, 2] - triangulos[:, 0])
+            normales = np.zeros_like(self.vertices)
+            for i in range(3):
+                np.add.at(normales, self.caras[:, i], normales_caras)
+            normas = np.linalg.norm(normales, axis=1, keepdims=True)
+            self._normales = np.divide(normales, normas, out=np.zeros_like(normales), where=normas > 0)
+        return self._normales
+
+    def geometria_modificada(self) -> None:
+        """
+            Indica que los vértices cambiaron, las normales se recalculan la próxima vez que se pidan.
+        """
+
+        self._normales = None
+
+    def aplicar_transformacion(self, transformacion: np.ndarray) -> None:
+        """
+            Aplica una transformación rígida en el lugar, sobre el mismo buffer de vértices.
+            Las vistas de vedo y trimesh creadas desde el contenedor ven el cambio, en el caso de vedo
+            se debe llamar a Modified sobre sus puntos para actualizar la visualización.
+            Si las normales existen se rotan en vez de recalcularlas.
+
+            Parameters
+            ----------
+            transformacion : np.ndarray
+                matriz de rotación (3, 3) o transformación homogénea (4, 4)
+        """
+
+        transformacion = np.asarray(transformacion, dtype=np.float64)
+        rotacion = transformacion[:3, :3]
+        self.vertices[:] = self.vertices @ rotacion.T
+        if transformacion.shape == (4, 4):
+            self.vertices += transformacion[:3, 3]
+        if self._normales is not None:
+            if self._normales.flags.writeable:
+                self._normales[:] = self._normales @ rotacion.T
+            else:
+                # Normales de solo lectura provienen del caché de trimesh
+                self._normales = self._normales @ rotacion.T
+
+    def a_trimesh(self) -> trimesh.Trimesh:
+        """
+            Entrega una malla trimesh que comparte los buffers del contenedor.
+            Se crea sin procesar ni validar, ya que esos pasos reordenan y copian los buffers.
+
+            Returns
+            -------
+            trimesh.Trimesh
+                malla trimesh sobre los mismos vértices, caras y normales
+        """
+
+        caras = self.caras if self.caras.dtype == np.int64 else self.caras.astype(np.int64)
+        return trimesh.Trimesh(vertices=self.vertices, faces=caras, vertex_normals=self._normales,
+                               process=False, validate=False)
+
+    def a_vedo(self) -> vedo.Mesh:
+        """
+            Entrega una malla vedo que comparte los buffers del contenedor.
+            Los arrays de VTK se crean con deep=False, apuntando a la memoria de los arrays NumPy.
+            Si el contenedor no tiene caras se entrega la nube de puntos, con una celda de vértice por punto.
+
+            Returns
+            -------
+            vedo.Mesh
+                malla vedo sobre los mismos vértices, caras y normales
+        """
+
+        puntos = vtk.vtkPoints()
+        puntos.SetData(numpy_support.numpy_to_vtk(self.vertices, deep=False))
+
+        # Nubes de puntos (sin caras) se dibujan como celdas de un vértice cada una
+        tipo_id = numpy_support.ID_TYPE_CODE
+        es_nube = len(self.caras) == 0
+        if es_nube:
+            conectividad = np.arange(len(self.vertices), dtype=tipo_id)
+        else:
+            conectividad = self.caras.reshape(-1)
+        if conectividad.dtype != tipo_id:
+            conectividad = conectividad.astype(tipo_id)
+        desplazamientos = np.arange(0, len(conectividad) + 1, 1 if es_nube else 3, dtype=tipo_id)
+        celdas = vtk.vtkCellArray()
+        celdas.SetData(numpy_support.numpy_to_vtkIdTypeArray(desplazamientos, deep=False),
+                       numpy_support.numpy_to_vtkIdTypeArray(conectividad, deep=False))
+        # Referencias para que los arrays no se liberen mientras VTK los usa
+        celdas._arrays_numpy = (desplazamientos, conectividad)
+
+        polydata = vtk.vtkPolyData()
+        polydata.SetPoints(puntos)
+        if es_nube:
+            polydata.SetVerts(celdas)
+        else:
+            polydata.SetPolys(celdas)
+        polydata.GetPointData().SetNormals(numpy_support.numpy_to_vtk(self.normales, deep=False))
+        return vedo.Mesh(polydata)
+
+
+def compartir(malla: Union[trimesh.Trimesh, vedo.Mesh, MallaCompartida]) -> MallaCompartida:
+    """
+        Entrega un contenedor compartido para la malla ingresada, sin copiar sus buffers.
+
+        Parameters
+        ----------
+        malla : trimesh.Trimesh, vedo.Mesh o MallaCompartida
+            malla a compartir
+
+        Returns
+        -------
+        MallaCompartida
+            contenedor de la malla
+    """
+
+    if isinstance(malla, MallaCompartida):
+        return malla
+    if isinstance(malla, trimesh.Trimesh):
+        return MallaCompartida.desde_trimesh(malla)
+    return MallaCompartida.desde_vedo(malla)
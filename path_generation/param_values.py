@@ -25,15 +25,17 @@ from descartes import PolygonPatch
 import pandas as pd
 import time
 import copy
+import ast
 import matplotlib.gridspec as gridspec
 from statistics import mean
 from sklearn.neighbors import KDTree
 
 # Librerias locales
-from path_generation.path_strategies import rot_raster, rot_continuos, rot_zigzag, offset_closed, offset_spiral
+from path_generation.path_strategies import rot_raster, rot_raster_2d, rot_continuos, rot_zigzag, offset_closed, offset_spiral
 from path_generation.partition import points_concaves, filter_lines, cut_coeficient, gen_subplot
 from path_generation.concavity.utils import gaussian_smooth_3d, gaussian_smooth_3d1
 from path_generation.generatorcsr import printProgressBar
+import pool_procesos
 
 
 # %%
@@ -306,58 +308,202 @@ def pass_curve(data, ancho_cordon):
     return filtered_data
 
 
-def obtain_angle(data_o, o, p, w, h, S, MD):
-    # SE FILTRAN LAS CAPAS QUE NO TENGAN EL ÁREA MINIMA
-    data = pass_curve(data_o, w)
+# Búsqueda del ángulo de raster: barrido grueso y refinamiento local alrededor de los mejores ángulos
+# Los ángulos gruesos se podan con el ancho del poligono perpendicular a las lineas (cota de la cantidad de lineas),
+# comparado con el de las orientaciones del rectángulo mínimo, que siempre se evalúan
+paso_grueso = 10  # [°] paso del barrido grueso
+pasos_refinamiento = (5, 2, 1)  # [°] pasos de la búsqueda local, hasta resolución de 1°
+candidatos_refinamiento = 3  # cantidad de mejores ángulos que se refinan en cada paso
+holgura_ancho = 1.15  # se descartan ángulos gruesos con ancho mayor a holgura_ancho veces el menor ancho del rectángulo
+max_evaluaciones = 30  # máximo de ángulos evaluados por curva, incluyendo el refinamiento
+
+
+# Métricas de raster de una curva a un ángulo: (elementos, % área cubierta, % volumen no cubierto), None si no aplica
+# completa: usa rot_raster con valores z, si no rot_raster_2d que entrega las mismas métricas sin calcular z
+def metricas_angulo(curva, ang, poligono, s_poly, o, p, w, h, S, MD, completa):
+    # Existen angulos que al rotar no queda alguna linea dentro del poligono
+    # debido a que el espacio entre las dos lineas es mas grande que el ancho de la figura
+    try:
+        if completa:
+            lineas, subp_lines, points_final = rot_raster(curva, ang, poligono, s_poly, o, p, w)
+        else:
+            lineas, subp_lines = rot_raster_2d(curva, ang, poligono, s_poly, o, p, w)
+        elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
+            lineas, subp_lines, poligono, 'raster', h, w, p, MD, S)
+        return (elements, percent_areac, percent_vvoids)
+    except:
+        return None
+
+
+# Orientaciones de los lados del rectángulo mínimo rotado del poligono, en grados enteros de 0 a 180
+# Las lineas paralelas al lado largo suelen dar menos elementos, se usan como candidatos iniciales
+def angulos_rectangulo(poligono):
+    x, y = poligono.minimum_rotated_rectangle.exterior.xy
+    angulo = int(round(np.degrees(np.arctan2(y[1] - y[0], x[1] - x[0])))) % 180
+    return [angulo, (angulo + 90) % 180]
+
+
+# Ancho del poligono perpendicular a lineas de raster con ángulo ang [°], proporcional a la cantidad de lineas
+def ancho_perpendicular(poligono, ang):
+    x, y = poligono.convex_hull.exterior.xy
+    rad = np.radians(ang)
+    return np.ptp(-np.sin(rad) * np.asarray(x) + np.cos(rad) * np.asarray(y))
+
+
+# Búsqueda del mejor ángulo de raster para una curva, se ejecuta en serie o en un proceso trabajador
+# trabajo: (tipo, centro_df, curva, poligono, s_poly, o, p, w, h, S, MD)
+# Entrega las filas de resultados de los ángulos evaluados, el mejor se confirma con rot_raster completo
+def buscar_angulo(trabajo):
+    tipo, centro_df, curva, poligono, s_poly, o, p, w, h, S, MD = trabajo
+    evaluados = {}  # ángulo -> métricas, en orden de evaluación
+
+    def evaluar(ang):
+        ang = int(ang) % 180
+        if ang not in evaluados and len(evaluados) < max_evaluaciones:
+            evaluados[ang] = metricas_angulo(curva, ang, poligono, s_poly, o, p, w, h, S, MD, False)
+
+    # Mismo criterio que la selección: mayor área cubierta y luego menos elementos, empates por orden de evaluación
+    def ordenados():
+        validos = [ang for ang, metricas in evaluados.items() if metricas is not None]
+        return sorted(validos, key=lambda ang: (-evaluados[ang][1], evaluados[ang][0]))
+
+    # Orientaciones del rectángulo mínimo primero, luego el barrido grueso podado por la cota de ancho
+    rectangulo = angulos_rectangulo(poligono)
+    for ang in rectangulo:
+        evaluar(ang)
+    limite = holgura_ancho * min(ancho_perpendicular(poligono, ang) for ang in rectangulo)
+    anchos = {ang: ancho_perpendicular(poligono, ang) for ang in range(0, 180, paso_grueso)}
+    for ang in sorted(anchos, key=anchos.get):
+        if anchos[ang] <= limite:
+            evaluar(ang)
+    # Refinamiento local, los ángulos alejados de los mejores candidatos no se evalúan
+    for paso in pasos_refinamiento:
+        for ang in ordenados()[:candidatos_refinamiento]:
+            evaluar(ang - paso)
+            evaluar(ang + paso)
+    # Confirmar el mejor con el cálculo completo, si falla se pasa al siguiente
+    for ang in ordenados():
+        evaluados[ang] = metricas_angulo(curva, ang, poligono, s_poly, o, p, w, h, S, MD, True)
+        if evaluados[ang] is not None:
+            break
+    return [(tipo, 'raster', ang, centro_df) + metricas for ang, metricas in evaluados.items() if metricas is not None]
+
+
+# Evalúa funcion para cada trabajo, entregando los resultados en el mismo orden que los trabajos
+# Con más de un proceso los trabajos se reparten en lotes entre un pool de procesos,
+# los resultados son los mismos que en serie. La barra de progreso avanza con cada trabajo terminado
+# ejecutor: pool de procesos opcional a reutilizar (sus trabajadores no deben mostrar figuras),
+#           si es None se usa el pool compartido de pool_procesos
+def mapear_trabajos(funcion, trabajos, procesos=1, ejecutor=None):
+    resultados = []
+    if len(trabajos) == 0:
+        return resultados
+    printProgressBar(0, len(trabajos), prefix='Progress:', suffix='Complete', length=50)
+    if min(procesos, len(trabajos)) <= 1:
+        for trabajo in trabajos:
+            resultados.append(funcion(trabajo))
+            printProgressBar(len(resultados), len(trabajos), prefix='Progress:', suffix='Complete', length=50)
+    else:
+        # Lotes más pequeños que trabajos/procesos reparten mejor curvas de distinto costo
+        tam_lote = max(1, len(trabajos)//(4*min(procesos, len(trabajos))))
+        # El pool compartido se pide con la cantidad completa de procesos para no volver a crearlo
+        if ejecutor is None:
+            ejecutor = pool_procesos.obtener_ejecutor(procesos)
+        for resultado in ejecutor.map(funcion, trabajos, chunksize=tam_lote):
+            resultados.append(resultado)
+            printProgressBar(len(resultados), len(trabajos), prefix='Progress:', suffix='Complete', length=50)
+    return resultados
 
-    # INICIA PRUEBAS CON ANGULOS
-    print("Buscando mejor ángulo...")
-    # Imprimir 0% progreso
-    printProgressBar(0, len(data), prefix='Progress:', suffix='Complete', length=50)
-    angles = np.arange(0, 180, 10)  # Valores de ángulos a testear
-    list_df = []  # lista para crear dataframe de comparacion de ángulos
-    list_circles =[] #lista de circulos del centro
-    tipo = 0  # Tipo para diferenciar entre curvas
 
+# Centro de una curva como tupla de floats, usada como clave en anglevalues y en las opciones
+# Acepta tuplas, arrays y centros guardados como texto "(x, y)" (sin usar eval)
+def clave_centro(centro):
+    if isinstance(centro, str):
+        centro = ast.literal_eval(centro)
+    return tuple(float(v) for v in centro)
+
+
+# Registro de curvas identificadas por el círculo alrededor de su centro, con índice espacial por celdas
+# Los círculos se guardan en una grilla de celdas de lado radio, un punto dentro de un círculo está en la celda
+# del centro o en una vecina, así cada búsqueda revisa solo los círculos cercanos en vez de todos los registrados
+class RegistroCurvas:
+    """
+        Registro de centros de curvas con búsqueda espacial de los círculos que contienen un punto.
+
+        Attributes
+        ----------
+        radio: float
+            radio de los círculos alrededor de cada centro, también lado de las celdas del índice.
+
+        centros: list
+            centros registrados, como tuplas de floats, en orden de registro.
+
+        Methods
+        -------
+        agregar
+            Registra un centro con su círculo, entrega el índice del registro.
+
+        buscar
+            Entrega los índices, en orden de registro, de los círculos que contienen un punto.
+    """
+
+    def __init__(self, radio):
+        self.radio = radio
+        self.centros = []
+        self._circulos = []
+        self._celdas = {}  # celda -> índices de los círculos con centro en la celda
+
+    def _celda(self, punto):
+        return (int(np.floor(punto[0] / self.radio)), int(np.floor(punto[1] / self.radio)))
+
+    def agregar(self, centro, circulo=None):
+        # circulo: poligono donde se verifica que contenga el pto, por defecto el buffer del centro con el radio
+        centro = clave_centro(centro)
+        if circulo is None:
+            circulo = Point(centro).buffer(self.radio)
+        self.centros.append(centro)
+        self._circulos.append(circulo)
+        self._celdas.setdefault(self._celda(centro), []).append(len(self.centros) - 1)
+        return len(self.centros) - 1
+
+    def buscar(self, punto):
+        cx, cy = self._celda(punto)
+        candidatos = [i for dx in (-1, 0, 1) for dy in (-1, 0, 1) for i in self._celdas.get((cx + dx, cy + dy), [])]
+        punto = Point(punto)
+        return [i for i in sorted(candidatos) if self._circulos[i].contains(punto)]
+
+
+# Curvas diferentes de todas las capas, una curva se repite en otra capa si su centro cae en el circulo de una anterior
+# Entrega lista de (capa, tipo, centro_df, curva, envelope, poligono, s_poly)
+def curvas_unicas(data, p):
+    registro = RegistroCurvas(3)  # mismo radio que buffer_centro de shapely_elements
+    curvas = []
+    tipo = 0  # Tipo para diferenciar entre curvas
     for capa in range(len(data)):
         for subc in range(len(data[capa])):
             curva = data[capa][subc]
             # Función para obtener elementos de shapely
             envelope, poligono, s_poly, c_centro, buffer_centro = shapely_elements(curva,p)  # Datos generales para trayectorias
-            centro = Point(c_centro)
-            if len(list_circles) == 0:
-                predicate = False
-            else: 
-                for circle in list_circles:
-                    contiene =  circle.contains(centro) 
-                    if contiene == True:
-                        predicate = True
-                        break
-                    else:
-                        predicate = False
-            if predicate == False:
+            if len(registro.buscar(c_centro)) == 0:
                 centro_df =list(buffer_centro.centroid.coords)[0] #centro a guardar en dataframe será el 
-                list_circles.append(buffer_centro) # Se añade el poligono donde se verifica que contenga el pto
-                for ang in angles:
-                    # Existen angulos que al rotar no queda alguna linea dentro del poligono
-                    # debido a que el espacio entre las dos lineas es mas grande que el ancho de la figura
-                    try:
-                        name = 'raster'
-                        lineas, subp_lines, points_final = rot_raster(curva, ang, poligono, s_poly, o, p, w)
-                        elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                            lineas, subp_lines, poligono,name, h, w, p, MD, S)
-                        new_row = (tipo, name, ang, centro_df, elements, percent_areac, percent_vvoids)
-                        list_df.append(new_row)
-                        # print("Para curva {}, SI aplica {}°".format(tipo,ang))
-                    except:
-                        # print("Para curva {}, no aplica {}°".format(tipo,ang))
-                        pass
+                registro.agregar(centro_df, buffer_centro) # Se añade el poligono donde se verifica que contenga el pto
+                curvas.append((capa, tipo, centro_df, curva, envelope, poligono, s_poly))
                 tipo += 1  # actualización del tipo de curva
-            else:
-                # print("Done") #Se evita el testeo
-                pass
-        time.sleep(0.1)
-        printProgressBar(capa + 1, len(data), prefix='Progress:', suffix='Complete', length=50)
+    return curvas
+
+
+# procesos: cantidad de procesos entre los que se reparte la búsqueda de ángulo de cada curva
+# ejecutor: pool de procesos opcional a reutilizar, ver mapear_trabajos
+def obtain_angle(data_o, o, p, w, h, S, MD, procesos=1, ejecutor=None):
+    # SE FILTRAN LAS CAPAS QUE NO TENGAN EL ÁREA MINIMA
+    data = pass_curve(data_o, w)
+
+    # INICIA PRUEBAS CON ANGULOS
+    print("Buscando mejor ángulo...")
+    trabajos = [(tipo, centro_df, curva, poligono, s_poly, o, p, w, h, S, MD)
+                for capa, tipo, centro_df, curva, envelope, poligono, s_poly in curvas_unicas(data, p)]
+    # lista para crear dataframe de comparacion de ángulos
+    list_df = [new_row for filas in mapear_trabajos(buscar_angulo, trabajos, procesos, ejecutor) for new_row in filas]
 
     df_angles = pd.DataFrame(list_df,
                              columns=['Curva', 'Estrategia', 'Grados', 'Centro', 'Elementos', '% Área C', '% Vol NC'])
@@ -377,166 +523,141 @@ def obtain_angle(data_o, o, p, w, h, S, MD):
 #                     SELECCIONAR ESTRATEGIA
 # =============================================================================
 
+# Estrategias evaluadas para cada curva: (nombre, opción para parameters_gral, tipo de gráfico)
+# Las de raster se evalúan al ángulo óptimo, el zigzag con la misma opción del raster continuo
+estrategias = [('Raster Discrete', 'raster', 'only'), ('Raster Continuos', 'raster_c', 'only'),
+               ('Rotatorio Zigzag', 'raster_c', 'only'), ('Contour Discrete', 'contorno', 'contours'),
+               ('Contour Continuos', 'continuo', 'union')]
+
+
+# Evaluación de una estrategia para una curva, sin graficar. Se ejecuta en serie o en un proceso trabajador
+# trabajo: (name, capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint)
+# Entrega (nombre, fila de resultados, lineas, sublineas, tipo de gráfico), o None si falla una estrategia de contorno
+def evaluar_estrategia(trabajo):
+    name, capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint = trabajo
+    opcion, grafico = [(opcion, grafico) for nombre, opcion, grafico in estrategias if nombre == name][0]
+    if name == 'Raster Discrete':
+        lineas, subp_lines, points_final = rot_raster(curva, grados, poligono, s_poly, o, p, w)
+    elif name == 'Raster Continuos':
+        lineas, subp_lines, points_final, unionls = rot_continuos(curva, grados, poligono, s_poly, o, p, w)
+    elif name == 'Rotatorio Zigzag':
+        lineas, subp_lines, points_final, unionls = rot_zigzag(curva, grados, poligono, s_poly, o, p, w)
+    else:
+        try:
+            #Estas estrategias generan error si hay partes muy estrechas que se cierran
+            # # o partes concavas muy pronunciadas, tal vez pueda solucionarse con division de poligonos
+            if name == 'Contour Discrete':
+                lineas, subp_lines, unionls = offset_closed(curva, poligono, s_poly, envelope, o, p, w, endpoint)
+            else:
+                lineas, subp_lines, unionls = offset_spiral(curva, poligono, s_poly, envelope, o, p, w, endpoint)
+        except:
+            # Topology exception:
+            return None
+    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
+        lineas, subp_lines, poligono, opcion, h, w, p, MD, S)
+    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out, percent_excs)
+    return (name, new_row, lineas, subp_lines, grafico)
+
+
+# Trabajos de evaluación de estrategias para una curva, sin ángulo no se evalúan las de raster
+def trabajos_estrategias(capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint):
+    return [(name, capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint)
+            for name, opcion, grafico in estrategias
+            if grados != None or opcion not in ('raster', 'raster_c')]
+
+
+# Junta las evaluaciones de una curva en el orden de las estrategias. Si falla una estrategia de contorno
+# no se consideran las siguientes (la espiral parte del contorno cerrado)
+def juntar_evaluaciones(resultados):
+    evaluaciones = []
+    for evaluacion in resultados:
+        if evaluacion is None:
+            return evaluaciones, True
+        evaluaciones.append(evaluacion)
+    return evaluaciones, False
+
+
+# Evaluación de las estrategias para una curva, sin graficar
+# Entrega lista de (nombre, fila de resultados, lineas, sublineas, tipo de gráfico) y si las estrategias de contorno fallaron
+def evaluar_estrategias(capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint):
+    resultados = []
+    for trabajo in trabajos_estrategias(capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly, o, p, w, h, S, MD, endpoint):
+        resultados.append(evaluar_estrategia(trabajo))
+        if resultados[-1] is None:
+            break
+    return juntar_evaluaciones(resultados)
+
+
+# Posición de cada estrategia en la figura de testing
+posiciones_estrategias = {'Raster Discrete': (0, 0), 'Raster Continuos': (0, 1), 'Rotatorio Zigzag': (0, 2),
+                          'Contour Discrete': (1, 0), 'Contour Continuos': (1, 1)}
+
+
+# Reporte gráfico de testing, se llama por separado con el reporte que llena testing
+# reporte: lista de (tipo, curva, evaluaciones, falla_contorno) por cada curva diferente
+def plot_testing(reporte, w):
+    for tipo, curva, evaluaciones, falla_contorno in reporte:
+        Fig, ax = plt.subplots(figsize=[15, 10], constrained_layout=True, sharex=True, sharey=True)
+        spec = gridspec.GridSpec(ncols=3, nrows=2, figure=Fig)
+        Fig.suptitle('Curva {}'.format(tipo), fontsize=20)
+        for name, new_row, lineas, subp_lines, grafico in evaluaciones:
+            percent_areac, percent_out, percent_excs = new_row[6], new_row[8], new_row[9]
+            ax_e = Fig.add_subplot(spec[posiciones_estrategias[name]])
+            ax_e.set_title("{}".format(name), fontsize=15)
+            variables = ("Covered area " + str(percent_areac) +
+                         "%  Exs.Overlap " + str(percent_excs) +
+                         "%  Outside " + str(percent_out) + "%")  # Variables a mostrar
+            ax_e.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
+                      linewidth=3, solid_capstyle='round', zorder=2, label=variables)  # ploteo de la curva
+            ax_e.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')
+            if grafico == 'contours':
+                plot_contours(lineas, subp_lines, w)
+            elif grafico == 'union':
+                plot_contours_union(lineas, subp_lines, w)
+            else:
+                plot_only(lineas, w)
+            ax_e.autoscale()
+        if falla_contorno:
+            ax4 = Fig.add_subplot(spec[1, 0])
+            ax4.text(0.5, 0.5, 'Concave parts or insufficient space',
+                     verticalalignment='center', horizontalalignment='center',
+                     transform=ax4.transAxes, color='black', fontsize=12)
+        ax.set_axis_off()
+        plt.show()
+
+
 # PASO 1. Realizar testeo para cada curva diferente que aparezca en todas las capas
-def testing(data_new, o, p, w, h, S, MD):
+# graficar: muestra la figura de estrategias de cada curva
+# reporte: lista opcional que se llena con las evaluaciones de cada curva, para graficarlas después con plot_testing
+# procesos: cantidad de procesos entre los que se reparten las pruebas (ángulo de cada curva y curva x estrategia),
+#           el resultado es el mismo que con un proceso
+# ejecutor: pool de procesos opcional a reutilizar en todas las pruebas, ver mapear_trabajos
+def testing(data_new, o, p, w, h, S, MD, graficar=True, reporte=None, procesos=1, ejecutor=None):
     data_copia = copy.deepcopy(data_new)
    # BUSCAR EL ÁNGULO ÓPTIMO
-    anglevalues, data = obtain_angle(data_copia, o, p, w, h, S, MD)  # Entrega lista de n angulos para n curvas
+    anglevalues, data = obtain_angle(data_copia, o, p, w, h, S, MD, procesos, ejecutor)  # Entrega lista de n angulos para n curvas
 
     print("\nRealizando pruebas con todas las estrategias...")
-    l = len(data)
-    printProgressBar(0, l, prefix='Progress:', suffix='Complete', length=50)  # Imprimir 0% progreso
-
-    list_circles =[] #lista de circulos del centro
-    list_df = []  # lista para dataframe de resultados
-    tipo = 0
+    if reporte is None and graficar:
+        reporte = []
     endpoint = (None,None) #variable inicial para punto final de capa
-    for capa in range(len(data)):       
-        for subc in range(len(data[capa])):
-            curva = data[capa][subc]
-            envelope, poligono, s_poly, c_centro, buffer_centro = shapely_elements(curva,p)
-            centro = Point(c_centro)
-            if len(list_circles) == 0:
-                predicate = False
-            else: 
-                for circle in list_circles:
-                    contiene =  circle.contains(centro) 
-                    if contiene == True:
-                        predicate = True
-                        break
-                    else:
-                        predicate = False
-            if predicate == False:
-                list_circles.append(buffer_centro)
-                centro_df =list(buffer_centro.centroid.coords)[0] #centro a guardar en dataframe será el 
-                grados = None #valor default grados
-                Fig, ax = plt.subplots(figsize=[15, 10], constrained_layout=True, sharex=True, sharey=True)
-                spec = gridspec.GridSpec(ncols=3, nrows=2, figure=Fig)
-                Fig.suptitle('Curva {}'.format(tipo), fontsize=20)
-                # Se busca el ángulo encontrado para ese caso
-                grados = None
-                for key, value in anglevalues.items():
-                    if centro_df == key:
-                        grados = value
-                        break
-                # ESTRATEGIAS
-                if grados != None:
-                    #En algunos caso no hay ángulo   
-                    # 1 Raster al angulo óptimo:
-                    name = 'Raster Discrete'
-                    opcion= 'raster'
-                    # print("{} to {}°".format(name,grados))
-                    ax1 = Fig.add_subplot(spec[0, 0])
-                    ax1.set_title("{}".format(name), fontsize=15)
-                    lineas, subp_lines, points_final = rot_raster(curva, grados, poligono, s_poly, o, p, w)
-                    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        lineas, subp_lines, poligono,opcion, h, w, p, MD, S)
-                    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out, percent_excs)
-                    list_df.append(new_row)
-                    variables1 = ("Covered area " + str(percent_areac) +
-                                  "%  Exs.Overlap " + str(percent_excs) +
-                                  "%  Outside " + str(percent_out) + "%")  # Variables a mostrar                
-                    ax1.set_title("{}".format(name), fontsize=15)
-                    ax1.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                              linewidth=3, solid_capstyle='round', zorder=2, label=variables1)  # ploteo de la curva
-                    plot_only(lineas, w)
-                    ax1.autoscale()
-                    ax1.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')  # , labelcolor='w'
-                    # 2 Raster continuo al ángulo óptimo
-                    name = 'Raster Continuos'
-                    opcion='raster_c'
-                    # # print("{} to {}°".format(name,grados))
-                    ax2 = Fig.add_subplot(spec[0, 1])
-                    ax2.set_title("{}".format(name), fontsize=15)
-                    lineas, subp_lines, points_final, unionls = rot_continuos(curva, grados, poligono, s_poly, o, p, w)
-                    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        lineas, subp_lines, poligono,opcion, h, w, p, MD, S)
-                    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out, percent_excs)
-                    list_df.append(new_row)
-                    variables2 = ("Covered area " + str(percent_areac) +
-                                  "%  Exs.Overlap " + str(percent_excs) +
-                                  "%  Outside " + str(percent_out) + "%")  # Variables a mostrar
-                    ax2.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                              linewidth=3, solid_capstyle='round', zorder=2, label=variables2)  # ploteo de la curva
-                    ax2.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')
-                    plot_only(lineas, w)
-                    ax2.autoscale()
-                    # 3 Raster zig zag  al ángulo óptimo
-                    # print("Raster rotatorio zig zag a {}°".format(grados))
-                    name = 'Rotatorio Zigzag'
-                    ax3 = Fig.add_subplot(spec[0, 2])
-                    ax3.set_title("{}".format(name), fontsize=15)
-                    lineas, subp_lines, points_final, unionls = rot_zigzag(curva, grados, poligono, s_poly, o, p, w)
-                    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        lineas, subp_lines, poligono,opcion, h, w, p, MD, S)
-                    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out, percent_excs)
-                    list_df.append(new_row)
-                    variables3 = ("Covered area " + str(percent_areac) +
-                                  "%  Exs.Overlap " + str(percent_excs) +
-                                  "%  Outside " + str(percent_out) + "%")  # Variables a mostrar
-                    ax3.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                              linewidth=3, solid_capstyle='round', zorder=2, label=variables3)  # ploteo de la curva
-                    ax3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')
-                    plot_only(lineas, w)
-                    ax3.autoscale()
-                else:
-                    # print("\n NO SE APLICA RASTER")
-                    pass
-                try:    
-                    #Estas estrategias generan error si hay partes muy estrechas que se cierran
-                    # # o partes concavas muy pronunciadas, tal vez pueda solucionarse con division de poligonos
-                    name = 'Contour Discrete'
-                    opcion= 'contorno'
-                    # # print("{}".format(name))
-                    ax4 = Fig.add_subplot(spec[1, 0])
-                    pol_lines, subp_lines, unionls = offset_closed(curva, poligono, s_poly, envelope, o, p, w, endpoint)
-                    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        pol_lines, subp_lines, poligono,opcion, h, w, p, MD, S)
-                    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out,
-                                percent_excs)
-                    list_df.append(new_row)
-                    ax4.set_title("{}".format(name), fontsize=15)
-                    variables4 = ("Covered area " + str(percent_areac) +
-                                  "%  Exs.Overlap " + str(percent_excs) +
-                                  "%  Outside " + str(percent_out) + "%")  # Variables a mostrar
-                    ax4.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                              linewidth=3, solid_capstyle='round', zorder=2, label=variables4)  # ploteo de la curva
-                    ax4.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')
-                    plot_contours(pol_lines, subp_lines, w)
-                    ax4.autoscale()
-                    # 4
-                    name = 'Contour Continuos'
-                    opcion= 'continuo'
-                    # print("{}".format(name))
-                    ax5 = Fig.add_subplot(spec[1, 1])
-                    pol_lines, subp_lines, unionls = offset_spiral(curva, poligono, s_poly, envelope, o, p, w, endpoint)
-                    # list_empty = [], unionls, list_empty #PENDIENTE CASO DE ELEMENTOS
-                    elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        pol_lines, subp_lines, poligono,opcion, h, w, p, MD, S)
-                    new_row = (capa, tipo, centro_df, name, elements, area_capa, percent_areac, percent_vvoids, percent_out,
-                                percent_excs)
-                    list_df.append(new_row)
-                    ax5.set_title("{}".format(name), fontsize=15)
-                    variables5 = ("Covered area " + str(percent_areac) +
-                                  "%  Exs.Overlap " + str(percent_excs) +
-                                  "%  Outside " + str(percent_out) + "%")  # Variables a mostrar
-                    ax5.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                              linewidth=3, solid_capstyle='round', zorder=2, label=variables5)  # ploteo de la curva
-                    ax5.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), facecolor='gainsboro')                    
-                    plot_contours_union(pol_lines, subp_lines, w)
-                    ax5.autoscale()
-                except:
-                    # Topology exception:
-                    ax4.text(0.5, 0.5, 'Concave parts or insufficient space',
-                              verticalalignment='center', horizontalalignment='center',
-                              transform=ax4.transAxes, color='black', fontsize=12)
-                    pass 
-                tipo += 1  # actualización del tipo de curva
-                ax.set_axis_off()
-                plt.show()
-        time.sleep(0.1)
-        # Actualizar barra de progresion
-        printProgressBar(capa + 1, l, prefix='Progress:', suffix='Complete', length=50)
+    curvas = curvas_unicas(data, p)
+    trabajos = []  # trabajos de cada curva
+    for capa, tipo, centro_df, curva, envelope, poligono, s_poly in curvas:
+        # Se busca el ángulo encontrado para ese caso
+        grados = anglevalues.get(centro_df)
+        trabajos.append(trabajos_estrategias(capa, tipo, centro_df, curva, grados, envelope, poligono, s_poly,
+                                             o, p, w, h, S, MD, endpoint))
+    # ESTRATEGIAS
+    resultados = iter(mapear_trabajos(evaluar_estrategia, [trabajo for trabajos_curva in trabajos for trabajo in trabajos_curva], procesos, ejecutor))
+    list_df = []  # lista para dataframe de resultados
+    for (capa, tipo, centro_df, curva, envelope, poligono, s_poly), trabajos_curva in zip(curvas, trabajos):
+        evaluaciones, falla_contorno = juntar_evaluaciones([next(resultados) for trabajo in trabajos_curva])
+        list_df.extend(new_row for name, new_row, lineas, subp_lines, grafico in evaluaciones)
+        if reporte is not None:
+            reporte.append((tipo, curva, evaluaciones, falla_contorno))
+    if graficar:
+        plot_testing(reporte, w)
     # Dataframe de todas las estrategias
     df_results = pd.DataFrame(list_df,
                               columns=['Capa', 'Curva', 'Centro', 'Estrategia', 'Elementos', 'Área', '% Área C', '% Vol NC',
@@ -585,10 +706,7 @@ def select_option(df_results):
             print("Área: {}% ".format(areacover), end= " ")
             print("Se realizará división")
             #Guardar para dividir
-            try:
-                values_c = (nameoption_ ,eval(centro_n))
-            except:
-                values_c = (nameoption_,centro_n)
+            values_c = (nameoption_, clave_centro(centro_n))
             list_todivide.append(values_c)
             areacompare.append(areacover)
             areadivision.append(areacover)
@@ -609,7 +727,7 @@ def select_option(df_results):
 # =============================================================================
 
 # Generar subpoligonos de la curva seleccionada
-def divide_curve(dividelist, data, slices, p):
+def divide_curve(dividelist, data, slices, p, graficar=True):
     # dividelist: son los centros de las curvas que necesitan division
     # data viene con lista de cpas x y y +lista de alturas z
     data=data[0]
@@ -632,28 +750,31 @@ def divide_curve(dividelist, data, slices, p):
                 lines_select = cut_coeficient(poligono, multils, df_lines, point_collection,
                                               slices)  # Seleccionar lineas por su coeficiente
                 results = gen_subplot(lines_select, poligono)  # Lista de poligonos resultantes
-                # plot poligono original
-                Fig, ax = plt.subplots(figsize=[20, 10], sharex=True, sharey=True)
-                spec = gridspec.GridSpec(ncols=slices+1, nrows=2, figure=Fig)
-                Fig.suptitle('Capa {}, Curva original'.format(capa + 1), fontsize=20)
-                ax = plt.gca()
-                ax.axis('equal')
-                ax.set_axis_off()
-                ax1 = Fig.add_subplot(spec[0, :])  # Curva original
-                ax1.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
-                         linewidth=3, solid_capstyle='round', zorder=2)
-                # Plot de lineas de división
-                plt.set_cmap = "seaborn",
-                plot_lsimple(ax1, lines_select)  # plot de lineas de corte
-                ax1 = plt.gca()
-                ax1.axis('equal')
-                ax1.set_axis_off()
+                if graficar:
+                    # plot poligono original
+                    Fig, ax = plt.subplots(figsize=[20, 10], sharex=True, sharey=True)
+                    spec = gridspec.GridSpec(ncols=slices+1, nrows=2, figure=Fig)
+                    Fig.suptitle('Capa {}, Curva original'.format(capa + 1), fontsize=20)
+                    ax = plt.gca()
+                    ax.axis('equal')
+                    ax.set_axis_off()
+                    ax1 = Fig.add_subplot(spec[0, :])  # Curva original
+                    ax1.plot(curva[:, 0], curva[:, 1], color=colorp, alpha=alfap,
+                             linewidth=3, solid_capstyle='round', zorder=2)
+                    # Plot de lineas de división
+                    plt.set_cmap = "seaborn",
+                    plot_lsimple(ax1, lines_select)  # plot de lineas de corte
+                    ax1 = plt.gca()
+                    ax1.axis('equal')
+                    ax1.set_axis_off()
                 # Guardar poligono como nueva curva
                 for spl in range(len(results)):
                     # print("Entra a guardar c/subpoligono ")
                     c_nueva = np.array(list((results[spl]).exterior.coords))  # Nuevo array de pts
                     list_capa.append(c_nueva)
                     poligono = Polygon(MultiPoint(list(c_nueva)))
+                    if not graficar:
+                        continue
                     #Plot de subdivisiones
                     ax2 = Fig.add_subplot(spec[1, spl])  # Curva original
                     ax2.set_title("Parte {}".format(spl + 1), fontsize=15)
@@ -701,7 +822,7 @@ def divide_save_curve(dividelist, data, slices, p):
 #                           RESULTADOS 
 # =============================================================================
 # FUNCIÓN PARA IDENTIFICAR DIVISIÓN O GENERACIÓN DE TRAYECTORIAS
-def generation_paths(anglevalues, data, nameoption, dividelist, areacompare,areadivision, o, p, w, h, S, MD):
+def generation_paths(anglevalues, data, nameoption, dividelist, areacompare,areadivision, o, p, w, h, S, MD, graficar=True, procesos=1, cache=None, ejecutor=None, trazos=None):
     # anglevalues: valor de angulo de inclinacion en caso de usar algun rotatorio
     # data: son la lista de curvas originales
     # nameoption: lista de nombre de estrategia y centro que se ocuparan p/rellenar en caso que no requiera división (List
@@ -710,20 +831,25 @@ def generation_paths(anglevalues, data, nameoption, dividelist, areacompare,area
     # division (List of tuples)
     # para divir necesitar solo la primera lista pero para generar trayectorias es la lista entera
     # areacompare: lista de  áreas max que se puede cubrir de la curva original, sirve para comparar resultados
+    # graficar: si es False no se generan gráficos ni pausas, los resultados son los mismos
+    # procesos: cantidad de procesos para el testeo de las curvas divididas
+    # ejecutor: pool de procesos opcional a reutilizar en el testeo de las curvas divididas, ver mapear_trabajos
+    # cache: CacheTrayectorias opcional para reutilizar trayectorias de contornos repetidos entre capas
+    # trazos: lista opcional que se llena con las trayectorias de cada curva, ver gen_path
     slices = 1  # Cantidad de lineas para dividir la curva
     # Si hay elementos en divide list se hace división
     if len(dividelist) >= 1:
         print("\nPASO 4.PLUS - DIVISIÓN DE POLIGONO")        
         for ccut in range(len(dividelist)):
             # print("Centro {}:{} ".format(ccut+1,dividelist[ccut][1]))
-            data_update = divide_curve([dividelist[ccut][1]], data, slices,p) #entrega las nuevas curvas generadas de la división
+            data_update = divide_curve([dividelist[ccut][1]], data, slices,p, graficar) #entrega las nuevas curvas generadas de la división
             print("\n Realizar testeo en nuevas curvas")
             c_amount = 0 #Variable para verificar cantidad de curvas resultantes
             for layer in data_update:
                 c_layer = len(layer)
                 c_amount += c_layer
             #SE REALIZA TESTEO NUEVAMENTE
-            anglevalues2, data2, nameoption2, dividelist2, areacompare2, areadivision2 = testing(data_update,o,p,w,h,S,MD)
+            anglevalues2, data2, nameoption2, dividelist2, areacompare2, areadivision2 = testing(data_update,o,p,w,h,S,MD, graficar, procesos=procesos, ejecutor=ejecutor)
             c_amount_final = 0 
             #se revisa cantidad de curvas para verificar que ninguna se elimino, en [0] porque se añadio una lista 
             for layer in data2[0]:
@@ -763,13 +889,13 @@ def generation_paths(anglevalues, data, nameoption, dividelist, areacompare,area
                 data2 = divide_save_curve([dividelist[ccut][1]],  data[0], slices,p) #entrega todas las curas en la capa correspondiente
         #Se generan las trayectorias en todas las capas
         print("\nPASO 5- GENERACIÓN DE TRAYECTORIAS")
-        df_final, list_totalp = gen_path(data2, nameoption, anglevalues,o,p,w,h,S,MD) #Función para calcular valores totales y plotear la estrategia elegida
+        df_final, list_totalp = gen_path(data2, nameoption, anglevalues,o,p,w,h,S,MD, graficar, cache, trazos) #Función para calcular valores totales y plotear la estrategia elegida
 
     else:
         # print("No es necesario dividir")
         print("\nPASO 5- GENERACIÓN DE TRAYECTORIAS")
         df_final, list_totalp = gen_path(data[0], nameoption, anglevalues, o, p, w, h, S,
-                                         MD)  # Función para calcular valores totales y plotear la estrategia elegida
+                                         MD, graficar, cache, trazos)  # Función para calcular valores totales y plotear la estrategia elegida
 
     data_3d = [list_totalp]
     return df_final, data_3d
@@ -779,9 +905,33 @@ def get_cmap(n, name='hsv'):
     RGB color; the keyword argument name must be a standard mpl colormap name.'''
     return plt.cm.get_cmap(name, n)
 
+# Reporte gráfico 3D de las trayectorias de gen_path, curva original y lineas de cada capa
+# trazos: lista de (capa, curva, lineas), entregada por gen_path o generation_paths
+# n_capas: cantidad de capas para los colores, si es None se usa la última capa de trazos
+def plot_trayectorias(trazos, n_capas=None):
+    if n_capas is None:
+        n_capas = max((capa for capa, curva, data_layer in trazos), default=0) + 1
+    fig = plt.figure()
+    ax = plt.axes(projection='3d')# Data for a three-dimensional line
+    cmap = get_cmap(n_capas)
+    for capa, curva, data_layer in trazos:
+        zdata = curva[:, 2]                       
+        ydata = curva[:, 1]
+        xdata = curva[:, 0]  
+        ax.plot3D(xdata, ydata, zdata,c = cmap(capa),  label = capa)
+        plot_lines_3DZ(ax, data_layer ,capa)
+    ax.legend(title='Capa', loc="upper right", bbox_to_anchor=(1.05, 1), borderaxespad=0., fancybox=True, shadow=True, 
+              ncol=1)  
+    #3D PLOT TOTAL
+    ax.set_xlabel('x')
+    ax.set_ylabel('y')
+    plt.show()
+
 # USAR LA ESTRATEGIA SELECCIONADA
 # Genera la estrategia seleccionada para cada curva en todas las capas
-def gen_path(data, option, anglevalues, o, p, w, h, S, MD):
+# cache: CacheTrayectorias opcional, los contornos que se repiten (salvo traslación) reutilizan la trayectoria calculada
+# trazos: lista opcional que se llena con (capa, curva, lineas) de cada curva, para graficarlas después con plot_trayectorias
+def gen_path(data, option, anglevalues, o, p, w, h, S, MD, graficar=True, cache=None, trazos=None):
     # start_time = time.time()
     # Crear diccionario de funciones con descripción
     dict_strat = {
@@ -800,9 +950,13 @@ def gen_path(data, option, anglevalues, o, p, w, h, S, MD):
     l = len(data)
     printProgressBar(0, l, prefix='Progress:', suffix='Complete', length=50)  # Imprimir 0% progreso
     endpoint = (None, None) #Valor incial de punto final 
-    fig = plt.figure()
-    ax = plt.axes(projection='3d')# Data for a three-dimensional line
-    cmap = get_cmap(len(data))
+    grados = None
+    # Centros de cada opción con el buffer (radio 2) en el que se verifica el centro de cada curva
+    registro_opciones = RegistroCurvas(2)
+    for opcion_nc in option:
+        registro_opciones.agregar(opcion_nc[1])
+    if trazos is None and graficar:
+        trazos = [] #curvas y lineas de cada capa para el gráfico 3D
     for capa in range(len(data)):
         # print("\nCapa {} de {}".format(capa+1,(len(data))))
         if len(data[capa]) == 0:
@@ -815,50 +969,51 @@ def gen_path(data, option, anglevalues, o, p, w, h, S, MD):
                 # print(("Curva {} de {}:".format(subc+1,(len(data[capa])))),end="")
                 # Función para obtener elementos de shapely
                 envelope, poligono, s_poly, c_centro, buffer_centro = shapely_elements(curva,p)
-                # Busco centro en la lista de option
-                for nc in range(len(option)):
-                    # Obtengo el nombre relacionado a ese centro
-                    try:
-                        option_l = eval(option[nc][1])
-                    except:
-                        option_l = (option[nc][1])  # con una curva no es de tipo string
-                    #Si el centro esta dentro del buffer del punto seleccionado
-                    centro_test = Point(c_centro) #CEntro actual a testear
-                    buffer_option = Point(option_l).buffer(2) #Poligono buffer en el que se verfica pto
-                    if buffer_option.contains(centro_test):
-                        #Se encontro un buffer al que pertenece, se ocupa el centro de ese para buscar angulo
-                        # es decir: option_l # Usando el nombre busco la función
-                        n_key = -1  # Encontrar indice de la opción
-                        for function, name in dict_strat.items():
-                            n_key += 1
-                            if name == option[nc][0]:
-                                break
-                        input_o = (list(dict_strat.keys())[n_key])  # Cambia el numero, cambia estrategia
-                        # En caso de ser una opción rotatoria se busca su ángulo
-                        for key, value in anglevalues.items():
-                            if option_l == key:
-                                grados = value
-                                break
-                        #Buscar ultimo punto correspondiente a ese daño 
-                        for key, value in dict_points.items():
-                            if option_l == key:
-                                endpoint = value
-                                break
-                # FUNCIÓN DE ESTRATEGIA                        
-                if n_key == 0:
-                    # Si la opción elegida es rotatoria añadir los grados
-                    opcion = 'raster'
-                    lineas, subp_lines, points_final = input_o(curva, grados, poligono, s_poly, o, p, w)
-                elif n_key == 1 or n_key == 2:
-                    opcion = 'raster_c'
-                    lineas, subp_lines, points_final, unionls = input_o(curva, grados, poligono, s_poly, o, p, w)
-                elif n_key == 3 or n_key == 4:
-                    opcion = 'contorno'
-                    lineas, subp_lines, unionls = input_o(curva, poligono, s_poly, envelope, o, p, w, endpoint)
-                
-                # FUNCIÓN DE PARÁMETROS
-                elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parameters_gral(
-                        lineas, subp_lines, poligono,opcion, h, w, p, MD, S)
+                # Busco centro en el registro de option, si está en el buffer de varias se usa la última
+                coincidencias = registro_opciones.buscar(c_centro)
+                if len(coincidencias) > 0:
+                    #Se encontro un buffer al que pertenece, se ocupa el centro de ese para buscar angulo
+                    nc = coincidencias[-1]
+                    option_l = registro_opciones.centros[nc]
+                    # es decir: option_l # Usando el nombre busco la función
+                    n_key = -1  # Encontrar indice de la opción
+                    for function, name in dict_strat.items():
+                        n_key += 1
+                        if name == option[nc][0]:
+                            break
+                    input_o = (list(dict_strat.keys())[n_key])  # Cambia el numero, cambia estrategia
+                    # En caso de ser una opción rotatoria se busca su ángulo
+                    grados = anglevalues.get(option_l, grados)
+                    #Buscar ultimo punto correspondiente a ese daño
+                    endpoint = dict_points.get(option_l, endpoint)
+                # Se reutiliza el resultado de un contorno igual (salvo traslación) ya calculado
+                guardado = None
+                if cache is not None:
+                    parametros = (n_key, None if grados is None else float(grados), o, p, w, h, S, MD)
+                    # Solo las estrategias de contorno usan el punto final de la capa anterior
+                    clave, referencia = cache.clave(curva, parametros, endpoint if n_key in (3, 4) else (None, None))
+                    guardado = cache.obtener(clave, referencia)
+                if guardado is not None:
+                    lineas, subp_lines, unionls, parametros_capa = guardado
+                else:
+                    # FUNCIÓN DE ESTRATEGIA                        
+                    if n_key == 0:
+                        # Si la opción elegida es rotatoria añadir los grados
+                        opcion = 'raster'
+                        lineas, subp_lines, points_final = input_o(curva, grados, poligono, s_poly, o, p, w)
+                        unionls = None
+                    elif n_key == 1 or n_key == 2:
+                        opcion = 'raster_c'
+                        lineas, subp_lines, points_final, unionls = input_o(curva, grados, poligono, s_poly, o, p, w)
+                    elif n_key == 3 or n_key == 4:
+                        opcion = 'contorno'
+                        lineas, subp_lines, unionls = input_o(curva, poligono, s_poly, envelope, o, p, w, endpoint)
+
+                    # FUNCIÓN DE PARÁMETROS
+                    parametros_capa = parameters_gral(lineas, subp_lines, poligono,opcion, h, w, p, MD, S)
+                    if cache is not None:
+                        cache.guardar(clave, referencia, (lineas, subp_lines, unionls, parametros_capa))
+                elements, area_capa, vol_capa, areacordon, vol_cover, percent_areac, percent_vvoids, time_pc, W_filler, percent_out, percent_excs = parametros_capa
                 # #PLOT 2D
                 # if n_key == 3:
                 #     plot_contours(lineas, subp_lines, w)
@@ -890,22 +1045,15 @@ def gen_path(data, option, anglevalues, o, p, w, h, S, MD):
                 endpoint = (int(p_end.x), int(p_end.y))
                 dict_points[option_l] = endpoint #Guardar punto para el centro del contorno correspondiente
                 #PLOT 3D 
-                zdata = curva[:, 2]                       
-                ydata = curva[:, 1]
-                xdata = curva[:, 0]  
-                ax.plot3D(xdata, ydata, zdata,c = cmap(capa),  label = capa)
-                plot_lines_3DZ(ax, data_layer ,capa)
-            # ax.set_title(f"Capa {capa + 1}")
-            ax.legend(title='Capa', loc="upper right", bbox_to_anchor=(1.05, 1), borderaxespad=0., fancybox=True, shadow=True, 
-                                    ncol=1)  
+                if trazos is not None:
+                    trazos.append((capa, curva, data_layer))
             new_capa = list_ptos
             list_totalp.append(new_capa)
-        #3D PLOT TOTAL
-        ax.set_xlabel('x')
-        ax.set_ylabel('y')
-        plt.show()
-        time.sleep(0.1)
+        if graficar:
+            time.sleep(0.1)
         printProgressBar(capa + 1, l, prefix='Progress:', suffix='Complete', length=50)
+    if graficar:
+        plot_trayectorias(trazos, len(data))
     # CREAR DATAFRAME DE RESULTADOS FINALES
     df_final = pd.DataFrame(list_df,
                             columns=['Capa', 'Curva', 'Centro', 'Elementos', 'Área Capa', 'Área C', '% Área C', 'Vol Capa',
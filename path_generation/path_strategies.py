@@ -39,6 +39,17 @@ def rot_raster(points,angle,polygon, s_poly,o,p,w):
     subp_lines = [] #Variable vacia util para utilizar una sola función para calcular parametros
     return total_lines,subp_lines,points_points
 
+#Lineas raster solo en x,y, mismas lineas que rot_raster sin calcular z (parte más costosa)
+#Sirve para evaluar ángulos con parameters_gral, que solo usa x,y. A 0° el raster horizontal ya es rápido
+def rot_raster_2d(points,angle,polygon, s_poly,o,p,w):
+    if angle == 0:
+        total_lines,subp_lines,points_points = rot_raster(points,angle,polygon, s_poly,o,p,w)
+        return total_lines,subp_lines
+    coords, amount, p = coords_raster(points,angle, polygon,s_poly,o,p)
+    total_lines = MultiLineString([LineString(c) for c in coords]) #lineas raster
+    subp_lines = []
+    return total_lines,subp_lines
+
 def rot_zigzag(points,angle,polygon, s_poly ,o,p,w):
     #a-Obtener puntos
     points_points, amount = opt_rotar(points,angle, polygon,s_poly,o,p)
@@ -147,7 +158,8 @@ def points_rasterh(points, polygon,s_poly,o,p):
     points_points = MultiPoint(points_order) #MultiPoint Z
     return points_points, amount
 
-def points_raster(points,angle, polygon,s_poly,o,p):
+#Lineas raster rotadas en x,y (sin z), entrega coordenadas de cada linea, cantidad de puntos por linea y step over usado
+def coords_raster(points,angle, polygon,s_poly,o,p):
     #Incrementar de tamaño la malla
     minx, miny, maxx, maxy = polygon.bounds
     dif_y = maxy - miny
@@ -226,8 +238,12 @@ def points_raster(points,angle, polygon,s_poly,o,p):
                     coords.append(list(partline.coords)) #Guardar coordenadas
         else:
             pass  
-    #OPCION PARA BUSCAR VALOR Z : buscar intersección de cada punto con la superficie de un poligono
     amount = len(list(partline.coords)) #Cantidad de puntos por linea
+    return coords, amount, p
+
+def points_raster(points,angle, polygon,s_poly,o,p):
+    coords, amount, p = coords_raster(points,angle, polygon,s_poly,o,p)
+    #OPCION PARA BUSCAR VALOR Z : buscar intersección de cada punto con la superficie de un poligono
     coords3d = []
     #Crear malla a 0 grados
     step = p/6 # valor de step pequeño para crear una malla de raster fina
@@ -340,12 +356,16 @@ def sort_list(list1, list2):
     z = [x for _, x in sorted(zipped_pairs)]     
     return z
 
+#REVISAR QUE EL OFFSET TENGA COORDENADAS
+#Lanza AttributeError si alguna parte no tiene coordenadas xy, señal de que no se pueden obtener mas offset
+#No usa pyplot, para no crear figuras al calcular trayectorias sin graficar
+def check_offset(ob):
+    parts = hasattr(ob, 'geoms') and ob or [ob]
+    for part in parts:
+        x, y = part.xy
+
 #OBTENER LINEAS PARA OFFSET
 def offset_closed(points,polygon, s_poly, envelope,o,p,w, endpoint):
-    def plot_offset(ax, ob, color='#999999'):
-        parts = hasattr(ob, 'geoms') and ob or [ob]
-        for part in parts:
-            x, y = part.xy
 
     z_one = points[0][2] #valor de z  único para todas las líneas generadas
     new_line=[] #variable para lineas offset del pol original
@@ -353,7 +373,6 @@ def offset_closed(points,polygon, s_poly, envelope,o,p,w, endpoint):
     sub_line= [] #variable para offset de subpoligonos  
     sub_ueps = [] #lista, ultimo en entrar primero en salir 
     poly_o = s_poly #primer linestring del poligono original
-    ax = plt.gca() #necesario para crear subp
     
     #CICLO LINEAS CERRADO
     x_min, y_min, x_max, y_max = envelope.bounds #puntos de extremos
@@ -431,7 +450,7 @@ def offset_closed(points,polygon, s_poly, envelope,o,p,w, endpoint):
                                 line_ring = LinearRing(line_sub)
                                 length_p = poly_s.length
                                 try:
-                                    plot_offset(ax, poly_s, color='purple') 
+                                    check_offset(poly_s)
                                 except AttributeError:
                                     #Si no se puede plotear tambien es señal de que no 
                                     #se pueden obtener mas offset
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de procesos compartido por los cálculos paralelos del programa.
+
+Crear un ProcessPoolExecutor implica lanzar los procesos trabajadores e importar en cada uno los
+módulos del programa, lo que en Windows (spawn) toma del orden de segundos. obtener_ejecutor entrega
+siempre el mismo pool, creado la primera vez que se pide, y solo lo vuelve a crear si se pide una
+cantidad distinta de procesos. El pool se cierra al terminar el programa.
+
+Los trabajadores usan el backend Agg de matplotlib, ya que no muestran figuras.
+"""
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+_EJECUTOR = None
+_PROCESOS = 0
+
+
+def _inicializar_trabajador() -> None:
+    """
+        Prepara un proceso trabajador del pool, cambiando matplotlib al backend Agg.
+    """
+
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def obtener_ejecutor(procesos: int) -> Union[ProcessPoolExecutor, None]:
+    """
+        Entrega el pool de procesos compartido, creándolo si no existe o si cambió la cantidad de procesos.
+
+        Parameters
+        ----------
+        procesos : int
+            cantidad de procesos del pool
+
+        Returns
+        -------
+        Union[ProcessPoolExecutor, None]
+            pool de procesos compartido, None si procesos <= 1
+    """
+
+    global _EJECUTOR, _PROCESOS
+    if procesos <= 1:
+        return None
+    if _EJECUTOR is None or _PROCESOS != procesos:
+        cerrar_ejecutor()
+        _EJECUTOR = ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador)
+        _PROCESOS = procesos
+    return _EJECUTOR
+
+
+def cerrar_ejecutor() -> None:
+    """
+        Cierra el pool de procesos compartido, si existe.
+    """
+
+    global _EJECUTOR, _PROCESOS
+    if _EJECUTOR is not None:
+        _EJECUTOR.shutdown()
+    _EJECUTOR = None
+    _PROCESOS = 0
+
+
+atexit.register(cerrar_ejecutor)
@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
+import os
 import vedo
-import random
 import timeit
 import trimesh
 import networkx
 from vedo.mesh import Mesh
 import utilidades
+import pool_procesos
+import ajuste_primitivas
+from cache_orientacion import CacheOrientacion
+from cache_secciones import CacheSecciones
+from cache_desenrollado import CacheDesenrollado
+from cache_trayectorias import CacheTrayectorias
+from malla_compartida import compartir
+from slicing_segmentacion import meshcut
 import shapely
 import shapely.ops
 import numpy as np
@@ -13,12 +21,17 @@ import pandas as pd
 from sklearn import linear_model
 from sklearn.utils import _typedefs, _heap, _sorting, _vector_sentinel
 from sklearn.neighbors import _partition_nodes
-from skspatial.objects import Line
-from skspatial.objects import Plane
+from scipy.spatial import cKDTree
 from scipy.spatial.transform import Rotation
 from path_generation import param_values
+from itertools import repeat
 from typing import List, Sequence, Tuple, Union
 
+# Parámetros por defecto de los ajustes RANSAC de orientación automática, por tipo de pieza (0=placa, 1=cilindro, 2=cono)
+AJUSTES_ORIENTACION = {0: {'num_iter': 500, 'umbral': 0.001},
+                       1: {'num_iter': 500, 'umbral': 0.01, 'refinar': True},
+                       2: {'num_iter': 1000, 'umbral': 0.001, 'refinar': True}}
+
 
 class Procesador:
     """
@@ -42,6 +55,56 @@ class Procesador:
             Contiene datos sobre peso por rollo, densidad, y precio de alambres de soldadura.
             Datos son usados para estimar cantidad de material usado.
 
+        reportes_orientacion: List[Dict], by default []
+            reportes de los ajustes RANSAC de la última orientación automática, uno por pasada.
+            Cada reporte contiene iteraciones usadas, proporción de inliers y tiempo por etapa.
+            Más de una pasada indica que el ajuste tuvo que repetirse para alinear la malla.
+
+        modelo_orientacion: List[float], by default None
+            parámetros del modelo ajustado en la última orientación automática.
+
+        descriptor_orientacion: List[float], by default None
+            descriptor [radio, ángulo de apertura] estimado en la última orientación automática de cilindros y conos.
+            None si la última orientación no entrega descriptor.
+
+        cache_orientacion: CacheOrientacion
+            caché en disco de orientaciones automáticas, indexada por contenido de la malla y parámetros.
+
+        semilla_orientacion: int, by default 0
+            semilla de los ajustes RANSAC de orientación automática, misma semilla y malla entregan la misma orientación.
+            None entrega resultados distintos en cada ejecución.
+
+        parametros_orientacion: dict, by default AJUSTES_ORIENTACION
+            parámetros de los ajustes RANSAC de orientación automática por tipo de pieza (iteraciones, umbral y refinamiento).
+            El umbral es relativo a la dimensión mayor de la malla en placas y conos, y relativo al radio en cilindros.
+
+        procesos_orientacion: int, by default os.cpu_count()
+            cantidad de procesos entre los que se reparten las hipótesis de los ajustes RANSAC.
+
+        procesos_cortes: int, by default os.cpu_count()
+            cantidad de procesos entre los que se reparte el post-procesamiento de las capas de cortes.
+
+        capas_por_proceso: int, by default 8
+            cantidad mínima de capas por proceso para usar procesamiento paralelo en los cortes.
+
+        cache_secciones: CacheSecciones, by default CacheSecciones()
+            caché en memoria de secciones por altura de las mallas cortadas, reutilizada al cambiar solo el cordón.
+
+        capas_adaptativas: bool, by default False
+            indicador de alturas de capas adaptativas según el cambio de la sección transversal de la pieza.
+
+        cache_desenrollado: CacheDesenrollado, by default CacheDesenrollado()
+            caché en memoria de las mallas de cilindros y conos transformadas a coordenadas cilíndricas.
+
+        cortes_isosuperficie: bool, by default False
+            indicador de cortes de cilindros y conos con superficies de radio constante sobre la malla original, sin desenrollarla.
+
+        procesos_trayectorias: int, by default os.cpu_count()
+            cantidad de procesos entre los que se reparten las pruebas de ángulos y estrategias de cada curva al calcular trayectorias.
+
+        cache_trayectorias: CacheTrayectorias, by default CacheTrayectorias()
+            caché en memoria de trayectorias por contorno, los contornos repetidos entre capas reutilizan la trayectoria trasladada.
+
         Methods
         -------
         cargar_archivo_soldaduras
@@ -71,6 +134,11 @@ class Procesador:
             Todos los marcadores deben estar en el mismo plano para obtener un buen resultado.
             Una vez rotada la malla se hace una traslación para colocar el origen de la pieza en el origen global.
         
+        orientar_placa_automaticamente
+            Orienta la malla de manera automática a partir de ajustar el plano de referencia dominante de la pieza,
+            mediante RANSAC vectorizado y refinamiento por PCA.
+            La normal del plano se alinea con el eje Z y la dirección principal de sus inliers con el eje X.
+        
         orientar_cilindro_manualmente
             Orienta la malla ingresada usando los marcadores colocados sobre su superficie para calcular las rotaciones necesarias.
             La malla es rotada respecto a su centro.
@@ -253,6 +321,21 @@ class Procesador:
 
         self.df_info_soldaduras = None
         self.df_info_materiales = None
+        self.reportes_orientacion = []
+        self.modelo_orientacion = None
+        self.descriptor_orientacion = None
+        self.cache_orientacion = CacheOrientacion()
+        self.semilla_orientacion = 0
+        self.parametros_orientacion = {tipo: dict(ajuste) for tipo, ajuste in AJUSTES_ORIENTACION.items()}
+        self.procesos_orientacion = os.cpu_count() or 1
+        self.procesos_cortes = os.cpu_count() or 1
+        self.capas_por_proceso = 8
+        self.cache_secciones = CacheSecciones()
+        self.capas_adaptativas = False
+        self.cache_desenrollado = CacheDesenrollado()
+        self.cortes_isosuperficie = False
+        self.procesos_trayectorias = os.cpu_count() or 1
+        self.cache_trayectorias = CacheTrayectorias()
 
     def cargar_archivo_soldaduras(self, path_soldaduras: str) -> str:
         """
@@ -413,12 +496,19 @@ class Procesador:
 
     def orientar_malla(self, mesh: vedo.Mesh, 
                         lista_marcadores: List[vedo.shapes.Cross3D], 
-                        rotaciones: List, tipo_pieza: int=0, tipo_orientacion: int=1) -> Tuple[List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]]:
+                        rotaciones: List, tipo_pieza: int=0, tipo_orientacion: int=1,
+                        malla_detalle: vedo.Mesh=None) -> Tuple[List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]]:
         """
             Orienta la malla ingresada usando los marcadores colocados sobre su superficie para calcular las rotaciones necesarias.
             La malla es rotada respecto a su centro.
             La estrategia de orientación utilizada depende del tipo de pieza que se quiera orientar.
             Para la orientación de placas se requieren 3 marcadores, para cilindros y conos se requieren 4.
+            Las orientaciones automáticas se guardan en cache_orientacion, indexadas por el contenido de la malla,
+            el tipo de pieza, el marcador de origen, los parámetros del ajuste (semilla y parametros_orientacion)
+            y la fracción de caras de la malla usada en el ajuste (malla de detalle o completa). Al reorientar una malla conocida se aplica directamente
+            la transformación guardada, sin volver a ajustar.
+            Si se ingresa una malla de detalle reducido, los ajustes automáticos se hacen sobre ella y la transformación
+            resultante se aplica a la malla completa. En orientaciones manuales la malla de detalle sigue a la completa.
             En todos los casos el primer marcador colocado corresponde al origen de la pieza, una vez rotada la malla
             se hace una traslación para colocar ese origen en el origen global.
 
@@ -440,29 +530,84 @@ class Procesador:
                 indicador de tipo de pieza.
                 0=placa, 1=cilindro, 2=cono, by default 0
 
+            tipo_orientacion : int, optional
+                indicador de tipo de orientación.
+                0=manual, 1=automática, by default 1
+
+            malla_detalle : vedo.Mesh, optional
+                nivel de detalle reducido de mesh, en la misma posición, by default None
+
             Returns
             -------
             List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]
                 lista de rotaciones usadas, malla orientada, lista con marcadores orientados
         """
 
+        self.modelo_orientacion = None
+        self.descriptor_orientacion = None
+
+        # Ajustes automáticos se hacen sobre la malla de detalle, manuales sobre la malla completa
+        malla_ajuste = malla_detalle if tipo_orientacion == 1 and malla_detalle is not None else mesh
+        malla_seguidora = mesh if malla_ajuste is malla_detalle else malla_detalle
+
+        # Orientaciones automáticas se buscan en caché antes de ajustar
+        if tipo_orientacion == 1:
+            # Transformaciones ajustadas con distintos parámetros o niveles de detalle no se comparten
+            ajuste = self.parametros_orientacion[tipo_pieza]
+            fraccion_detalle = round(len(malla_ajuste.faces())/max(len(mesh.faces()), 1), 4)
+            parametros = [tipo_pieza, self.semilla_orientacion, fraccion_detalle] + [valor for _, valor in sorted(ajuste.items())]
+            # Cono no usa marcadores, placas y cilindros usan el primero como origen
+            if tipo_pieza in (0, 1) and len(lista_marcadores) > 0:
+                parametros += list(np.round(lista_marcadores[0].GetPosition(), 3))
+            vertices_originales = np.array(mesh.points())
+            clave = self.cache_orientacion.clave(vertices_originales, mesh.faces(), parametros)
+            entrada = self.cache_orientacion.obtener(clave)
+            if entrada is not None:
+                mesh.applyTransform(entrada['transformacion'], reset=True)
+                if malla_detalle is not None:
+                    malla_detalle.applyTransform(entrada['transformacion'], reset=True)
+                lista_marcadores = self.orientar_marcadores(lista_marcadores, entrada['transformacion'])
+                if tipo_pieza == 0:
+                    rotaciones.append(Rotation.from_matrix(entrada['transformacion'][:3, :3]))
+                self.modelo_orientacion = list(entrada['modelo'])
+                self.descriptor_orientacion = list(entrada['descriptor']) if len(entrada['descriptor']) > 0 else None
+                print("Orientación recuperada desde caché")
+                return rotaciones, mesh, lista_marcadores
+
+        # Vértices mantienen su orden, la transformación final se estima con una muestra de ellos
+        puntos_ajuste = malla_ajuste.points()
+        muestra = np.linspace(0, len(puntos_ajuste) - 1, min(len(puntos_ajuste), 2000)).astype(int)
+        muestra_original = np.array(puntos_ajuste[muestra])
+
         # CASO DE PLACAS
         if tipo_pieza == 0:
-            rotaciones, mesh, lista_marcadores = self.orientar_placa(mesh, lista_marcadores, rotaciones)
+            if tipo_orientacion == 1:
+                rotaciones, malla_ajuste, lista_marcadores = self.orientar_placa_automaticamente(malla_ajuste, lista_marcadores, rotaciones)
+            elif tipo_orientacion == 0:
+                rotaciones, malla_ajuste, lista_marcadores = self.orientar_placa(malla_ajuste, lista_marcadores, rotaciones)
         
         # CASO CILINDROS
         if tipo_pieza == 1:
             if tipo_orientacion == 1:
-                mesh, lista_marcadores = self.orientar_cilindro_automaticamente(mesh, lista_marcadores)
+                malla_ajuste, lista_marcadores = self.orientar_cilindro_automaticamente(malla_ajuste, lista_marcadores)
             elif tipo_orientacion == 0:
-                rotaciones, mesh, lista_marcadores = self.orientar_cilindro_manualmente(mesh, lista_marcadores, rotaciones)
+                rotaciones, malla_ajuste, lista_marcadores = self.orientar_cilindro_manualmente(malla_ajuste, lista_marcadores, rotaciones)
 
         # CASO CONOS
         if tipo_pieza == 2:
             if tipo_orientacion == 1:
-                mesh = self.orientar_cono_automaticamente(mesh)
+                malla_ajuste = self.orientar_cono_automaticamente(malla_ajuste)
             elif tipo_orientacion == 0:
-                rotaciones, mesh, lista_marcadores = self.orientar_cono_manualmente(mesh, lista_marcadores, rotaciones)
+                rotaciones, malla_ajuste, lista_marcadores = self.orientar_cono_manualmente(malla_ajuste, lista_marcadores, rotaciones)
+
+        transformacion = utilidades.estimar_transformacion_rigida(muestra_original, np.asarray(malla_ajuste.points())[muestra])
+        if malla_seguidora is None:
+            mesh = malla_ajuste
+        else:
+            malla_seguidora.applyTransform(transformacion, reset=True)
+
+        if tipo_orientacion == 1:
+            self.cache_orientacion.guardar(clave, transformacion, self.modelo_orientacion or (), self.descriptor_orientacion or ())
         
         return rotaciones, mesh, lista_marcadores
     
@@ -530,10 +675,88 @@ class Procesador:
         else:
             return rotaciones, mesh, lista_marcadores
         
+    def orientar_placa_automaticamente(self, mesh: vedo.Mesh, lista_marcadores: List[vedo.shapes.Cross3D], rotaciones: List) -> Tuple[List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]]:
+        """
+            Orienta la malla de manera automática a partir de ajustar el plano de referencia dominante de la pieza,
+            mediante RANSAC vectorizado y refinamiento por PCA (ajuste_primitivas.ransac_plano).
+            La normal del plano se alinea con el eje Z y la dirección principal de sus inliers con el eje X.
+            Si hay un marcador, solo se consideran los vértices con normal similar a la del vértice más cercano al marcador,
+            de esta forma la cara marcada es la que queda orientada hacia Z positivo, y el marcador se usa como origen de la pieza.
+            Sin marcadores, la cara orientada hacia Z positivo es la indicada por las normales de los inliers,
+            y el origen es el centroide de los inliers.
+
+            Parameters
+            ----------
+            mesh : vedo.Mesh
+                malla a orientar, visualizada en VedoPanel
+            
+            lista_marcadores : List[vedo.shapes.Cross3D]
+                lista de marcadores colocados sobre la pieza, solo se usa el primero para elegir la cara y el origen.
+            
+            rotaciones : List
+                lista vacía para guardar las rotaciones aplicadas a la malla en la orientación actual.
+                Usado para poder resetear la última orientación guardada.
+            
+            Returns
+            -------
+            List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]
+                lista de rotaciones usadas, malla orientada, lista con marcadores orientados
+        """
+
+        malla = compartir(mesh)
+        vertices = malla.vertices
+        normales = malla.normales
+        max_dim = max(np.ptp(vertices, axis=0))
+        ajuste = self.parametros_orientacion[0]
+        Thresh = ajuste['umbral']*max_dim
+
+        # Cara marcada: vértices con normal a menos de 30° de la normal en el marcador
+        normal_referencia = None
+        if len(lista_marcadores) > 0:
+            punto_marcador = np.asarray(lista_marcadores[0].GetPosition())
+            cercano = np.argmin(np.einsum('ij,ij->i', vertices - punto_marcador, vertices - punto_marcador))
+            normal_referencia = normales[cercano]
+            cara = normales @ normal_referencia > np.cos(np.radians(30))
+            if cara.sum() >= 3:
+                vertices, normales = vertices[cara], normales[cara]
+
+        normal, punto, principal, reporte = ajuste_primitivas.ransac_plano(vertices, Thresh, num_iter=ajuste['num_iter'], semilla=self.semilla_orientacion, 
+                                                                           procesos=self.procesos_orientacion)
+        self.reportes_orientacion = [reporte]
+        self.modelo_orientacion = list(normal) + list(punto)
+        print("Plano: {}".format(ajuste_primitivas.formatear_reporte(reporte)))
+
+        # Sentido de la normal hacia afuera de la cara ajustada
+        if normal_referencia is None:
+            inliers = np.abs((vertices - punto) @ normal) < Thresh
+            normal_referencia = normales[inliers].sum(axis=0)
+        if normal @ normal_referencia < 0:
+            normal = -normal
+
+        ejes_alineacion = [[1, 0, 0], [0, 0, 1]]
+        vectores_elegidos = [principal, normal]
+        rotacion_transform = self.calcular_rotacion(ejes_alineacion, vectores_elegidos)
+        mesh.applyTransform(rotacion_transform.as_matrix(), reset=True)
+        lista_marcadores = self.orientar_marcadores(lista_marcadores, rotacion_transform.as_matrix())
+        rotaciones.append(rotacion_transform)
+
+        # SE MUEVE ESCENA AL ORIGEN DESPUÉS DE ROTAR
+        if len(lista_marcadores) > 0:
+            punto_origen = np.asarray(lista_marcadores[0].getTransform().GetPosition())
+        else:
+            punto_origen = rotacion_transform.apply(punto)
+        mesh.shift(-punto_origen)
+        for i, marcador in enumerate(lista_marcadores):
+            lista_marcadores[i] = marcador.shift(-punto_origen)
+
+        return rotaciones, mesh, lista_marcadores
+        
     def orientar_cilindro_automaticamente(self, mesh: vedo.Mesh, lista_marcadores: List[vedo.shapes.Cross3D]):
         """
             Orienta la malla de manera automática a partir de ajustar malla a un modelo obtenido mediante propiedades geométricas y RANSAC.
             Proceso de manera iterativa toma puntos aleatoriamente para ajustar un modelo que defina los parámetros de la malla usada.
+            Hipótesis son generadas y evaluadas por lotes mediante ajuste_primitivas.ransac_cilindro.
+            El mejor modelo se refina por mínimos cuadrados sobre sus inliers antes de calcular la rotación.
             Mediante ajuste se detecta eje central del cilindro y radio del mismo.
             Obtenidos los parámetros que mejor ajustan a la malla, se usan para rotar desde orientación arbitraria a una de utilidad.
             Una vez rotada la malla la orientación final debe ser [1, 0, 0]
@@ -551,127 +774,40 @@ class Procesador:
         """
         
         start_time = timeit.default_timer()
+        self.reportes_orientacion = []
         checkpoint = 0
         veces = 0
         while checkpoint == 0:
             """Carga de vertices del mesh como un array."""
-            if type(mesh) != trimesh.base.Trimesh:
-                malla_trimsh = vedo.utils.vedo2trimesh(mesh)
-            vertices_full = malla_trimsh.vertices
-            normales = malla_trimsh.vertex_normals
+            # Vistas sobre los buffers de la malla, sin convertir a trimesh en cada pasada
+            malla = compartir(mesh)
+            vertices_full = malla.vertices
+            normales = malla.normales
             axis_1 = max(vertices_full[:,0])-min(vertices_full[:,0])
             axis_2 = max(vertices_full[:,1])-min(vertices_full[:,1])
             axis_3 = max(vertices_full[:,2])-min(vertices_full[:,2])
             max_axis = axis_1, axis_2, axis_3
             max_dim = max(max_axis)
             
-            """Selección de los puntos con sus respectivas normales"""
-            Points_With_Normals = vertices_full[:,0],vertices_full[:,1],vertices_full[:,2],normales[:,0],normales[:,1],normales[:,2]
-        
-            Points_With_Normals = np.array(Points_With_Normals).T
-            List_PointsWithNormals_FullSize = list(Points_With_Normals)
-            if len(List_PointsWithNormals_FullSize) > 500000:
-                List_PointsWithNormals = random.sample(List_PointsWithNormals_FullSize,500000)
-                PointsWithNormals = np.asarray(List_PointsWithNormals)
-                vertices = PointsWithNormals[:,0], PointsWithNormals[:,1], PointsWithNormals[:,2]
-                vertices = np.asarray(vertices)
-                vertices = vertices.T   
-            else:
-                List_PointsWithNormals = List_PointsWithNormals_FullSize
-                vertices = vertices_full  
-                
-            NumIter = 500
-            Thresh = 0.01 # Percentage, use with radius
-            Score = 0
-            Best_Sample = [0, 0, 0, 0, 0, 0, 0, 0]
-            Best_Sample_Position = 0
-            Data_Iterations = list(range(NumIter))
-            Max_Possible_Score = len(vertices)
-            
-            for iteration in range(NumIter):  
-                """Se eligen 3 puntos al azar, se extraen sus posiciones XYZ y sus normales"""
-                points = np.asarray(random.sample(List_PointsWithNormals,3))
-                   
-                Point1 = np.array([points[0][0],points[0][1],points[0][2]])
-                Point2 = np.array([points[1][0],points[1][1],points[1][2]])
-                Point3 = np.array([points[2][0],points[2][1],points[2][2]])
-                
-                N1 = np.array([points[0][3],points[0][4],points[0][5]])
-                N2 = np.array([points[1][3],points[1][4],points[1][5]])
-                N3 = np.array([points[2][3],points[2][4],points[2][5]])
-                
-                """Se calcula el producto cruz de cada par y se promedian entre si"""
-                Orientation = (np.cross(N1,N2)+np.cross(N1,N3)+np.cross(N2,N3))/3
-                
-                """Producto cruz entre la normal calculada anteriormente y las 3 normales iniciales"""
-                N4 = np.cross(N1,Orientation)
-                N5 = np.cross(N2,Orientation)
-                N6 = np.cross(N3,Orientation)
-                
-                try:
-                    """Generacion de planos que pasan por los puntos elegidos con la normal calculada"""
-                    Plane1 = Plane(point=Point1, normal=N4)
-                    Plane2 = Plane(point=Point2, normal=N5)
-                    Plane3 = Plane(point=Point3, normal=N6)
-                    
-                    """A partir de los planos, se intersectan de a pares para generar 3 intersecciones"""
-                    Line1 = Plane1.intersect_plane(Plane2)
-                    Line2 = Plane1.intersect_plane(Plane3)
-                    Line3 = Plane2.intersect_plane(Plane3)
-                    
-                    """Linea que define al eje del cilindro"""
-                    Pnt = (Line1.point + Line2.point + Line3.point)/3
-                    Direction = (Line1.direction + Line2.direction + Line3.direction)/3
-                    line = Line(point=Pnt, direction=Direction)
-                    
-                    """Cálculo del radio"""
-                    R1 = self.calc_singlepointdist_to_line(Point1,line.point,line.direction)
-                    R2 = self.calc_singlepointdist_to_line(Point2,line.point,line.direction)
-                    R3 = self.calc_singlepointdist_to_line(Point3,line.point,line.direction)
-                    R = np.asarray([R1, R2, R3])
-                    maxR = max(R)
-                    R = R/maxR
-                    for i in range(len(R)):
-                        if R[i] < 0.75:
-                            R[i] = max(R)
-                    R = R*maxR
-                    R = R.mean()
-        
-                    """Se descartan soluciones que generen un radio más grande que toda la PCD"""
-                    if R > max_dim*0.5:
-                        continue
-        
-                    radius = R
-                    position_optimized = line.point
-                    orientation_optimized = line.direction
-                        
-                    """Threshold for comparison"""
-                    UmDist = radius*Thresh
-                    lowerRadius = radius-UmDist
-                    upperRadius = radius+UmDist
-                    comp_R = self.calc_dist_to_line(vertices,position_optimized, orientation_optimized)
-                    comparison = (comp_R > lowerRadius) & (comp_R < upperRadius)
-                    Local_Score = comparison.sum()
-                    RANSAC_Score = Local_Score
-                    Data_Iterations[iteration] = [radius,line.point,line.direction], RANSAC_Score
-                    
-                    if RANSAC_Score > Score and RANSAC_Score < Max_Possible_Score:
-                        Score = RANSAC_Score
-                        Best_Sample = radius, position_optimized[0], position_optimized[1], position_optimized[2], orientation_optimized[0], orientation_optimized[1], orientation_optimized[2]
-                        Best_Sample_Position = iteration+1
-                        print("Iteration: {}".format(iteration+1+veces*NumIter))
-                        print("Current Radius:", Best_Sample[0])
-                        print("Current Position: X: {}, Y:{}, Z:{}".format(Best_Sample[1],Best_Sample[2],Best_Sample[3]))
-                        print("Current Orientation: X: {}, Y:{}, Z:{}".format(Best_Sample[4],Best_Sample[5],Best_Sample[6]))
-                        print("RANSAC Score: {}, Score: {} (Found in Iteration {})".format(RANSAC_Score,Score,Best_Sample_Position))
-                        print("----------")
-                    else:
-                        print("Iteration: {}".format(iteration+1+veces*NumIter))
-                        print("Current Radius:", Best_Sample[0])
-                        print("RANSAC Score: {}, Score: {} (Found in Iteration {})".format(RANSAC_Score,Score,Best_Sample_Position))
-                        print("----------")
-                except:
-                    continue
+            ajuste = self.parametros_orientacion[1]
+            NumIter = ajuste['num_iter']
+            Thresh = ajuste['umbral'] # Percentage, use with radius
+
+            """RANSAC vectorizado, hipótesis se generan y evalúan por lotes"""
+            radius, position_optimized, orientation_optimized, reporte = ajuste_primitivas.ransac_cilindro(vertices_full, normales, 
+                                                                                                          num_iter=NumIter, umbral=Thresh, 
+                                                                                                          radio_max=max_dim*0.5, refinar=ajuste['refinar'], 
+                                                                                                          semilla=self.semilla_orientacion, 
+                                                                                                          procesos=self.procesos_orientacion)
+            reporte['pasada'] = veces + 1
+            self.reportes_orientacion.append(reporte)
+            Best_Sample = radius, position_optimized[0], position_optimized[1], position_optimized[2], orientation_optimized[0], orientation_optimized[1], orientation_optimized[2]
+            print("Pasada: {}, {}".format(reporte['pasada'], ajuste_primitivas.formatear_reporte(reporte)))
+            print("Current Radius:", Best_Sample[0])
+            print("Current Position: X: {}, Y:{}, Z:{}".format(Best_Sample[1],Best_Sample[2],Best_Sample[3]))
+            print("Current Orientation: X: {}, Y:{}, Z:{}".format(Best_Sample[4],Best_Sample[5],Best_Sample[6]))
+            print("----------")
+            veces += 1
                 
             """Parametros para la generacion de la primitiva del cilindro"""
             Cylinder_Radius = Best_Sample[0]
@@ -743,6 +879,8 @@ class Procesador:
         print("New Orientation: X: {:.5f}, Y:{:.5f}, Z:{:.5f}".format(New_Orientation[0],New_Orientation[1],New_Orientation[2]))
         print("Radio: {:.5f}".format(Cylinder_Radius))
         print('Time: {:.5} seconds'.format(stop_time - start_time))  
+        self.modelo_orientacion = list(Best_Sample)
+        self.descriptor_orientacion = [Cylinder_Radius, 0]
         return mesh, lista_marcadores
 
     def orientar_cilindro_manualmente(self, mesh: vedo.Mesh, lista_marcadores: List[vedo.shapes.Cross3D], rotaciones: List) -> Tuple[List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]]:
@@ -800,7 +938,7 @@ class Procesador:
             # Importante porque vector X hecho por usuario no necesariamente es necesariamente colinear a eje de cilindro
             # Esto hace que sea un poco más robusto con respecto a la elección de los puntos
             # Funciona porque cilindros son regulares
-            malla_trimsh = vedo.utils.vedo2trimesh(mesh)
+            malla_trimsh = compartir(mesh).a_trimesh()
             half = malla_trimsh.bounding_box_oriented.primitive.extents / 2
 
             puntos_esquinas_transformados = trimesh.transform_points(trimesh.bounds.corners([-half, half]), 
@@ -1068,6 +1206,8 @@ class Procesador:
             Proceso de manera iterativa toma puntos aleatoriamente para ajustar un modelo que defina los parámetros de la malla usada.
             Mediante ajuste se detecta posición del apex del cono (indistinto si el cono tiene un apex físico o solo imaginario),
             radio, ángulo de apertura y orientación en el espacio.
+            Hipótesis son generadas desde vecindades de un KD-tree y evaluadas por lotes mediante ajuste_primitivas.ransac_cono.
+            El mejor modelo se refina por mínimos cuadrados sobre sus inliers antes de calcular la rotación.
             Obtenidos los parámetros que mejor ajustan a la malla, se usan para rotar desde orientación arbitraria a una de utilidad.
             Una vez rotada la malla la orientación final debe ser [1, 0, 0]
 
@@ -1085,94 +1225,42 @@ class Procesador:
         
         # TODO: AGREGAR ROTACIONES USADAS A RETURN PARA PODER RESETEAR ORIENTACIÓN
         start_time = timeit.default_timer()
+        self.reportes_orientacion = []
         checkpoint = 0
         veces = 0
         while checkpoint == 0:
             """Carga de vertices del mesh como un array."""
-            malla_trimesh = vedo.utils.vedo2trimesh(mesh)
-            vertices_full = malla_trimesh.vertices
-            normales = malla_trimesh.vertex_normals
+            # Vistas sobre los buffers de la malla, sin convertir a trimesh en cada pasada
+            malla = compartir(mesh)
+            vertices_full = malla.vertices
+            normales = malla.normales
             axis_1 = max(vertices_full[:,0])-min(vertices_full[:,0])
             axis_2 = max(vertices_full[:,1])-min(vertices_full[:,1])
             axis_3 = max(vertices_full[:,2])-min(vertices_full[:,2])
             max_axis = axis_1, axis_2, axis_3
             max_dim = max(max_axis)
             
-            """Selección de los puntos con sus respectivas normales"""
-            Points_With_Normals = vertices_full[:,0],vertices_full[:,1],vertices_full[:,2],normales[:,0],normales[:,1],normales[:,2]
-        
-            Points_With_Normals = np.array(Points_With_Normals).T
-            List_PointsWithNormals_FullSize = list(Points_With_Normals)
-            if len(List_PointsWithNormals_FullSize) > 500000:
-                List_PointsWithNormals = random.sample(List_PointsWithNormals_FullSize,500000)
-                PointsWithNormals = np.asarray(List_PointsWithNormals)
-                vertices = PointsWithNormals[:,0], PointsWithNormals[:,1], PointsWithNormals[:,2]
-                vertices = np.asarray(vertices)
-                vertices = vertices.T   
-            else:
-                List_PointsWithNormals = List_PointsWithNormals_FullSize
-                vertices = vertices_full
+            vertices = vertices_full
                 
-            NumIter = 1000
-            Thresh = 0.001*max_dim
-            Score = 0
-            Best_Sample = [0, 0, 0, 0, 0, 0, 0]
-            Best_Sample_Position = 0
-            Data_Iterations = list(range(NumIter))
-            
-    
-            for iteration in range(NumIter):    
-                try:
-                    Local_Score = 0
-                    # points = np.asarray(random.sample(List_PointsWithNormals,3))
-                    points = np.asarray(random.sample(list(self.in_sphere(len(vertices)*0.01,Points_With_Normals[random.randint(0,len(vertices)-1)],Points_With_Normals)),3))
-                    
-                    Point1 = np.array([points[0][0],points[0][1],points[0][2]])
-                    Point2 = np.array([points[1][0],points[1][1],points[1][2]])
-                    Point3 = np.array([points[2][0],points[2][1],points[2][2]])
-                    N1 = np.array([points[0][3],points[0][4],points[0][5]])
-                    N2 = np.array([points[1][3],points[1][4],points[1][5]])
-                    N3 = np.array([points[2][3],points[2][4],points[2][5]])
-    
-                    a = np.array([list(N1),list(N2),list(N3)])
-                    b = np.array([np.dot(Point1,N1),np.dot(Point2,N2),np.dot(Point3,N3)])
-                    x1 = np.linalg.solve(a,b)
-                    q = (N1[0]*(Point1[1]-Point2[1])+N1[1]*(Point2[0]-Point1[0]))/(N1[0]*N2[1]-N1[1]*N2[0])
-                    x2 = np.array([Point2[0]+q*N2[0], Point2[1]+q*N2[1], Point2[2]+q*N2[2]]) 
-                    x = self.direction_vector(x1,x2)
-                    Angles = np.array([np.arcsin(self.calc_singlepointdist_to_line(Point1,x1,x)/self.dist_pts3d(x1,Point1)),np.arcsin(self.calc_singlepointdist_to_line(Point2,x1,x)/self.dist_pts3d(x1,Point2)),np.arcsin(self.calc_singlepointdist_to_line(Point3,x1,x)/self.dist_pts3d(x1,Point3))])
-                    Apex = x1
-                    Angle = Angles.mean()
-                    if Angle < np.radians(5) or Angle > np.radians(90):
-                        continue
-                    Direction = x
-                    cone_args = [Angle, Apex[0], Apex[1], Apex[2], Direction[0], Direction[1], Direction[2]]
-                    
-                    """Comparison and scoring of points"""
-                    comparison = self.dist_point_to_cone(cone_args,vertices) < Thresh
-                    Local_Score = comparison.sum()
-                    RANSAC_Score = Local_Score
-                    Data_Iterations[iteration] = RANSAC_Score, cone_args
-                    
-                    if RANSAC_Score > Score:
-                        Score = RANSAC_Score
-                        Best_Sample = cone_args
-                        Best_Sample_Position = iteration+1
-                            
-                        print("Iteration: {}".format(iteration+1+veces*NumIter))
-                        print("Current Aperture Angle (in degrees):", abs((Best_Sample[0]*180/np.pi)%180))
-                        print("Current Apex Position: X: {}, Y:{}, Z:{}".format(Best_Sample[1],Best_Sample[2],Best_Sample[3]))
-                        print("Current Orientation: X: {}, Y:{}, Z:{}".format(Best_Sample[4],Best_Sample[5],Best_Sample[6]))
-                        print("RANSAC Score: {}, Score: {} (Found in Iteration {})".format(RANSAC_Score,Score,Best_Sample_Position))
-                        print("----------")
-                        
-                    # else:
-                    #     print("Iteration: {}".format(iteration+1))
-                    #     print("Current Aperture Angle (in degrees):", abs((Best_Sample[0]*180/np.pi)%180))
-                    #     print("RANSAC Score: {}, Score: {} (Found in Iteration {})".format(RANSAC_Score,Score,Best_Sample_Position))
-                    #     print("----------")
-                except:
-                    continue
+            ajuste = self.parametros_orientacion[2]
+            NumIter = ajuste['num_iter']
+            Thresh = ajuste['umbral']*max_dim
+            
+            """RANSAC vectorizado, vecindades desde KD-tree e hipótesis evaluadas por lotes"""
+            Angle, Apex, Direction, reporte = ajuste_primitivas.ransac_cono(vertices_full, normales, umbral=Thresh, 
+                                                                            num_iter=NumIter, radio_vecindad=len(vertices)*0.01,
+                                                                            refinar=ajuste['refinar'], semilla=self.semilla_orientacion, 
+                                                                            procesos=self.procesos_orientacion)
+            reporte['pasada'] = veces + 1
+            self.reportes_orientacion.append(reporte)
+            Best_Sample = [Angle, Apex[0], Apex[1], Apex[2], Direction[0], Direction[1], Direction[2]]
+            
+            print("Pasada: {}, {}".format(reporte['pasada'], ajuste_primitivas.formatear_reporte(reporte)))
+            print("Current Aperture Angle (in degrees):", abs((Best_Sample[0]*180/np.pi)%180))
+            print("Current Apex Position: X: {}, Y:{}, Z:{}".format(Best_Sample[1],Best_Sample[2],Best_Sample[3]))
+            print("Current Orientation: X: {}, Y:{}, Z:{}".format(Best_Sample[4],Best_Sample[5],Best_Sample[6]))
+            print("----------")
+            veces += 1
             
             """Parametros para la generación de la primitiva del cono desde PCD"""
             Apex_Position = [Best_Sample[1],Best_Sample[2],Best_Sample[3]]
@@ -1214,6 +1302,8 @@ class Procesador:
         print("Matriz de rotacion:")
         # print(matriz)
         print('Time: {:.5} seconds'.format(stop_time - start_time))
+        self.modelo_orientacion = list(Best_Sample)
+        self.descriptor_orientacion = [Cone_Radius, np.degrees(Best_Sample[0])]
         return mesh
 
     def orientar_cono_manualmente(self, mesh: vedo.Mesh, lista_marcadores: List[vedo.shapes.Cross3D], rotaciones: List) -> Tuple[List[Rotation], vedo.Mesh, List[vedo.shapes.Cross3D]]:
@@ -1437,6 +1527,7 @@ class Procesador:
             Retorna una lista de listas. Cada elemento de la lista es una capa, la cual a su vez es una lista.
             Cada capa contiene los contornos encontrados, los cuales son np.ndarray.
             Se asume que cada contorno encontrado es una falla y será considerado como un contorno independiente.
+            Piezas sin caras se tratan como nubes de puntos y se cortan con calcular_cortes_nube.
 
             Parameters
             ----------
@@ -1465,6 +1556,10 @@ class Procesador:
                 lista donde cada elemento es una capa, y cada capa es una lista que contiene los contornos encontrados en forma de arrays.
         """
 
+        # CASO NUBE DE PUNTOS, se corta sin mallar
+        if len(pieza.faces) == 0:
+            cortes = self.calcular_cortes_nube(pieza, ancho_cordon, alto_cordon, step_over, tipo_pieza, descriptor_pieza)
+            return cortes
         # CASO PLACA
         if tipo_pieza == 0:
             cortes = self.calcular_cortes_placa(pieza, ancho_cordon, alto_cordon, step_over)
@@ -1507,24 +1602,60 @@ class Procesador:
 
         """
 
-        alturas_cortes, _ = utilidades.select_layer(pieza, height_cordon=alto_cordon, width_cordon=ancho_cordon, step_over=step_over)
-        
-        sections_dmg = pieza.section_multiplane(plane_origin=[0, 0, 0],
-                                                plane_normal=[0, 0, 1],
-                                                heights=alturas_cortes)
-        sections_dmg = [section for section in sections_dmg if section is not None]
-        geoms_dmg = [section.polygons_full for section in sections_dmg if section is not None]  # Array por capas con poly
-        geoms_dmg_multi = [shapely.geometry.MultiPolygon(list(dmg)) for dmg in geoms_dmg]
-        geoms_dmg_multi = [geoms_dmg.buffer(-ancho_cordon*0.08).buffer(ancho_cordon*0.08) for geoms_dmg in geoms_dmg_multi]
+        alturas_cortes, _ = utilidades.select_layer(pieza, height_cordon=alto_cordon, width_cordon=ancho_cordon, step_over=step_over,
+                                                    adaptativo=self.capas_adaptativas)
         
-        for i, dmg in enumerate(geoms_dmg_multi):
-            matrix = sections_dmg[i].metadata["to_3D"]
-            geoms_dmg_multi[i] = shapely.ops.transform(lambda x, y, z=matrix[2][3]: (x, y, z), dmg)
-        
-        geoms_dmg_multi = utilidades.filtrar_cortes(geoms_dmg_multi, ancho_cordon)
-        curvas_por_capa = [utilidades.extraer_coords(capa) for capa in geoms_dmg_multi if capa]
+        # Secciones ya calculadas para la misma malla se reutilizan, solo se cortan las alturas nuevas
+        clave = self.cache_secciones.clave(pieza.vertices, pieza.faces)
+        secciones = self.cache_secciones.obtener(clave, alturas_cortes)
+        faltantes = [i for i, seccion in enumerate(secciones) if seccion is None]
+        if faltantes:
+            sections_dmg = pieza.section_multiplane(plane_origin=[0, 0, 0],
+                                                    plane_normal=[0, 0, 1],
+                                                    heights=alturas_cortes[faltantes])
+            for i, section in zip(faltantes, sections_dmg):
+                secciones[i] = list(section.polygons_full) if section is not None else []
+            self.cache_secciones.guardar(clave, alturas_cortes[faltantes], [secciones[i] for i in faltantes])
+
+        # Polígonos de cada capa y su altura Z, capas donde el plano no corta la malla se descartan
+        capas = [(poligonos, altura) for poligonos, altura in zip(secciones, alturas_cortes) if poligonos]
+        curvas_por_capa = self.postprocesar_capas(capas, ancho_cordon)
         
         return curvas_por_capa
+
+    def postprocesar_capas(self, capas: List[Tuple[List[shapely.geometry.Polygon], float]], ancho_cordon: float) -> List[List[np.ndarray]]:
+        """
+            Post-procesa las capas de un corte (apertura con buffer, altura Z, filtrado y extracción de coordenadas)
+            usando utilidades.postprocesar_capas.
+            Con más de un proceso disponible y suficientes capas, las capas se reparten en lotes entre los procesos
+            del pool compartido (pool_procesos), que se crea una sola vez y se reutiliza entre cortes.
+            El orden y formato del resultado es el mismo que al procesar en serie.
+
+            Parameters
+            ----------
+            capas : List[Tuple[List[shapely.geometry.Polygon], float]]
+                lista de capas, cada una con los polígonos del corte en el plano XY y la altura Z del corte
+            ancho_cordon : float
+                ancho de cordón de soldadura
+
+            Returns
+            -------
+            List[List[np.ndarray]]
+                lista donde cada elemento es una capa, y cada capa es una lista que contiene los contornos encontrados en forma de arrays.
+        """
+
+        # Enviar las capas al pool solo vale la pena si cada proceso recibe varias capas
+        procesos = min(self.procesos_cortes, len(capas)//self.capas_por_proceso)
+        if procesos <= 1:
+            resultados = utilidades.postprocesar_capas(capas, ancho_cordon)
+        else:
+            # Lotes más pequeños que capas/procesos reparten mejor capas de distinto costo
+            tam_lote = int(np.ceil(len(capas)/(4*procesos)))
+            lotes = [capas[i:i + tam_lote] for i in range(0, len(capas), tam_lote)]
+            ejecutor = pool_procesos.obtener_ejecutor(self.procesos_cortes)
+            resultados = [capa for lote in ejecutor.map(utilidades.postprocesar_capas, lotes, repeat(ancho_cordon)) for capa in lote]
+
+        return [capa for capa in resultados if capa is not None]
     
     def calcular_cortes_cilindro(self, pieza: trimesh.Trimesh, ancho_cordon: float, alto_cordon: float, step_over: float, descriptor_pieza: Tuple[float, float]) -> List[List[np.ndarray]]:
         """
@@ -1560,8 +1691,13 @@ class Procesador:
                 lista donde cada elemento es una capa, y cada capa es una lista que contiene los contornos encontrados en forma de arrays.
         """
 
-        pieza = utilidades.transform_cilindrical_pieza(pieza=pieza, inv=False, radio=descriptor_pieza[0])
-        curvas_por_capa = self.calcular_cortes_placa(pieza, ancho_cordon, alto_cordon, step_over)
+        if self.cortes_isosuperficie:
+            curvas_por_capa = self.calcular_cortes_isosuperficie(pieza, ancho_cordon, alto_cordon, step_over,
+                                                                 tipo_pieza=1, descriptor_pieza=descriptor_pieza)
+        else:
+            # Malla desenrollada se calcula una vez por pieza y descriptor
+            pieza = self.cache_desenrollado.desenrollar(pieza, tipo_pieza=1, descriptor=descriptor_pieza)
+            curvas_por_capa = self.calcular_cortes_placa(pieza, ancho_cordon, alto_cordon, step_over)
         curvas_por_capa = utilidades.transform_cilindrical_cortes(cortes=curvas_por_capa, inv=True, radio=descriptor_pieza[0])
         return curvas_por_capa
     
@@ -1601,15 +1737,13 @@ class Procesador:
                 lista donde cada elemento es una capa, y cada capa es una lista que contiene los contornos encontrados en forma de arrays.
         """
 
-        # En el caso de conos el radio es variable
-        # Radio depende de la posición en el eje del cono y el ángulo de apertura
-        radio_cono = -1*(np.tan(np.deg2rad(descriptor_pieza[1]))*pieza.vertices[:, 0] - descriptor_pieza[0])
-        pieza = utilidades.transform_cilindrical_pieza(pieza=pieza, inv=False, radio=radio_cono)
-        # Se necesita transformar a cilindricas antes de rotar el cono, para calcular el cambio de radios
-        r = Rotation.from_euler('y', -descriptor_pieza[1], degrees=True)
-        pieza.vertices = r.apply(pieza.vertices)
-
-        curvas_por_capa = self.calcular_cortes_placa(pieza, ancho_cordon, alto_cordon, step_over)
+        if self.cortes_isosuperficie:
+            curvas_por_capa = self.calcular_cortes_isosuperficie(pieza, ancho_cordon, alto_cordon, step_over,
+                                                                 tipo_pieza=2, descriptor_pieza=descriptor_pieza)
+        else:
+            # En el caso de conos el radio es variable, la malla desenrollada y rotada se calcula una vez por pieza y descriptor
+            pieza = self.cache_desenrollado.desenrollar(pieza, tipo_pieza=2, descriptor=descriptor_pieza)
+            curvas_por_capa = self.calcular_cortes_placa(pieza, ancho_cordon, alto_cordon, step_over)
 
         # Se rota para revertir la transformación hecha antes
         r = Rotation.from_euler('y', descriptor_pieza[1], degrees=True)
@@ -1618,6 +1752,180 @@ class Procesador:
                 curvas_por_capa[i][j] = r.apply(curva)
         curvas_por_capa = utilidades.transform_cilindrical_cortes_conos(cortes=curvas_por_capa, inv=True, descriptor=descriptor_pieza)
         return curvas_por_capa
+
+    def calcular_cortes_isosuperficie(self, pieza: trimesh.Trimesh, ancho_cordon: float, alto_cordon: float, step_over: float,
+                                      tipo_pieza: int=1, descriptor_pieza: Tuple[float, float]=[1, 0]) -> List[List[np.ndarray]]:
+        """
+            Calcula cortes de cilindros y conos directamente sobre la malla original, sin desenrollarla.
+            Cada plano de corte del espacio de placa ([X, Theta*Radio, Radio], rotado en conos) corresponde en la malla original
+            a un cilindro o cono alrededor del eje X, cuyos contornos se extraen con meshcut y luego se desenrollan.
+            Las regiones de los contornos que quedan dentro de la pieza se reconocen por la regla par-impar sobre los contornos
+            del corte (utilidades.dentro_contornos_cilindricos), sin consultar la malla, y se post-procesan igual que en calcular_cortes_placa.
+            Las alturas se calculan igual que en calcular_cortes_placa sobre la malla desenrollada, incluyendo capas_adaptativas.
+            Retorna los cortes en el mismo espacio de placa que calcular_cortes_placa sobre la malla desenrollada,
+            por lo que se revierten con las mismas transformaciones.
+
+            Parameters
+            ----------
+            pieza : trimesh.Trimesh
+                pieza orientada a la cual se le quiere detectar daños.
+            
+            ancho_cordon : float
+                ancho de cordón de soldadura.
+            
+            alto_cordon : float
+                altura de cordón de soldadura.
+            
+            step_over : float
+                step-over entre cordones de soldadura.
+            
+            tipo_pieza : int, optional
+                tipo de pieza, 1 para cilindro y 2 para cono, by default 1
+            
+            descriptor_pieza : Tuple[float, float], optional
+                descriptores de la pieza, correspondientes a [radio base, ángulo apertura], by default [1, 0]
+            
+            Returns
+            -------
+            List[List[np.ndarray]]
+                lista donde cada elemento es una capa en el espacio de placa, y cada capa es una lista con los contornos encontrados.
+        """
+
+        if tipo_pieza == 2:
+            descriptor = [descriptor_pieza[0], descriptor_pieza[1]]
+            rotacion = Rotation.from_euler('y', -descriptor_pieza[1], degrees=True).as_matrix()
+        else:
+            descriptor = [descriptor_pieza[0], 0]
+            rotacion = np.eye(3)
+
+        # Alturas se calculan sobre la malla desenrollada (compartida con calcular_cortes_cilindro/cono mediante la caché)
+        malla_placa = self.cache_desenrollado.desenrollar(pieza, tipo_pieza=tipo_pieza, descriptor=descriptor)
+        alturas_cortes, _ = utilidades.select_layer(malla_placa, height_cordon=alto_cordon, width_cordon=ancho_cordon,
+                                                    step_over=step_over, adaptativo=self.capas_adaptativas)
+
+        # Plano Z = altura del espacio de placa es R20*X + R22*Radio = altura, un cono de radio altura/R22 en X = 0
+        pendiente = -rotacion[2, 0]/rotacion[2, 2]
+        malla_cortes = meshcut.CutMesh(pieza.vertices, pieza.faces)
+        capas = []
+        for altura in alturas_cortes:
+            plano = meshcut.Plane([0, 0, altura/rotacion[2, 2]], [0, 0, 1])
+            contornos = meshcut.cross_section_mesh(malla_cortes, plano, pendiente=pendiente, tipo_geometria=meshcut.GEOMETRIA_CONO,
+                                                   close_loops=True)
+            caras = utilidades.desenrollar_contornos(contornos, descriptor=descriptor, rotacion=rotacion)
+            if not caras:
+                continue
+
+            # Caras dentro de la pieza se reconocen llevando un punto interior de cada una a coordenadas cartesianas
+            # y contando los cruces con los contornos del corte
+            puntos = np.array([(*cara.representative_point().coords[0], altura) for cara in caras]) @ rotacion
+            radio_puntos = -1*(np.tan(np.deg2rad(descriptor[1]))*puntos[:, 0] - descriptor[0])
+            puntos = utilidades.transform_cilindrical(puntos, radio=radio_puntos, inv=True)
+            dentro = utilidades.dentro_contornos_cilindricos(puntos, contornos)
+            poligonos = [cara for cara, dentro_cara in zip(caras, dentro) if dentro_cara]
+            if poligonos:
+                capas.append((poligonos, altura))
+
+        return self.postprocesar_capas(capas, ancho_cordon)
+
+    def calcular_cortes_nube(self, pieza: trimesh.Trimesh, ancho_cordon: float, alto_cordon: float, step_over: float, 
+                            tipo_pieza: int=0, descriptor_pieza: Tuple[float, float]=[1, 0], 
+                            tam_celda: float=None, vecinos: int=4) -> List[List[np.ndarray]]:
+        """
+            Calcula cortes transversales de una nube de puntos con normales, sin mallarla.
+            La nube se ingresa como trimesh.Trimesh sin caras, con sus normales en vertex_normals.
+            Cada capa se evalúa sobre una grilla en el plano de corte: la distancia con signo de cada celda a los planos
+            tangentes de los puntos más cercanos indica si la celda está dentro del material (distancia negativa).
+            Las celdas dentro del material se convierten en polígonos, que siguen el mismo filtrado que los cortes de mallas.
+            Cilindros y conos se desenrollan a coordenadas cilíndricas igual que en calcular_cortes_cilindro y calcular_cortes_cono.
+            Retorna una lista de listas. Cada elemento de la lista es una capa, la cual a su vez es una lista.
+            Cada capa contiene los contornos encontrados, los cuales son np.ndarray.
+
+            Parameters
+            ----------
+            pieza : trimesh.Trimesh
+                nube de puntos de la pieza, sin caras y con normales hacia afuera del material.
+            
+            ancho_cordon : float
+                ancho de cordón de soldadura.
+            
+            alto_cordon : float
+                altura de cordón de soldadura.
+            
+            step_over : float
+                step-over entre cordones de soldadura.
+            
+            tipo_pieza : int, optional
+                indicador de tipo de pieza.
+                0=placa, 1=cilindro, 2=cono, by default 0
+            
+            descriptor_pieza : Tuple[float, float], optional
+                lista de descriptores usada en los casos de cilindro y cono, correspondientes a [radio base, ángulo apertura], by default [1, 0]
+
+            tam_celda : float, optional
+                lado de las celdas de la grilla de cada capa, by default None usa la separación mediana entre puntos
+
+            vecinos : int, optional
+                cantidad de puntos cercanos usados para la distancia con signo de cada celda, by default 4
+            
+            Returns
+            -------
+            List[List[np.ndarray]]
+                lista donde cada elemento es una capa, y cada capa es una lista que contiene los contornos encontrados en forma de arrays.
+        """
+
+        puntos = np.asarray(pieza.vertices)
+        normales = np.asarray(pieza.vertex_normals)
+
+        # Cilindros y conos se desenrollan igual que las mallas, las normales se expresan en la base cilíndrica
+        if tipo_pieza == 1:
+            normales = utilidades.transform_cilindrical_normales(puntos, normales)
+            puntos = utilidades.transform_cilindrical(puntos, radio=descriptor_pieza[0])
+        if tipo_pieza == 2:
+            radio_cono = -1*(np.tan(np.deg2rad(descriptor_pieza[1]))*puntos[:, 0] - descriptor_pieza[0])
+            normales = utilidades.transform_cilindrical_normales(puntos, normales)
+            puntos = utilidades.transform_cilindrical(puntos, radio=radio_cono)
+            r = Rotation.from_euler('y', -descriptor_pieza[1], degrees=True)
+            puntos = r.apply(puntos)
+            normales = r.apply(normales)
+
+        arbol = cKDTree(puntos)
+        if tam_celda is None:
+            muestra = puntos[np.linspace(0, len(puntos) - 1, min(len(puntos), 5000)).astype(int)]
+            distancias, _ = arbol.query(muestra, k=2)
+            tam_celda = float(np.median(distancias[:, 1]))
+
+        alturas_cortes, _ = utilidades.select_layer(trimesh.PointCloud(puntos), height_cordon=alto_cordon, width_cordon=ancho_cordon, step_over=step_over)
+
+        # Grilla cubre la nube con un margen de dos celdas, la esquina de la celda [0, 0] es minimo
+        minimo = puntos.min(axis=0) - 2*tam_celda
+        maximo = puntos.max(axis=0) + 2*tam_celda
+        grilla_x, grilla_y = np.meshgrid(np.arange(minimo[0], maximo[0], tam_celda) + tam_celda/2,
+                                         np.arange(minimo[1], maximo[1], tam_celda) + tam_celda/2, indexing='ij')
+        consultas = np.column_stack([grilla_x.ravel(), grilla_y.ravel(), np.zeros(grilla_x.size)])
+
+        capas = []
+        for altura in alturas_cortes:
+            consultas[:, 2] = altura
+            _, cercanos = arbol.query(consultas, k=vecinos)
+            cercanos = cercanos.reshape(len(consultas), -1)
+            distancia = np.einsum('ijk,ijk->ij', consultas[:, None, :] - puntos[cercanos], normales[cercanos]).mean(axis=1)
+            mascara = (distancia < 0).reshape(grilla_x.shape)
+
+            capa = utilidades.mascara_a_poligonos(mascara, (minimo[0], minimo[1]), tam_celda)
+            if not capa.is_empty:
+                capas.append((list(capa.geoms), altura))
+
+        curvas_por_capa = self.postprocesar_capas(capas, ancho_cordon)
+
+        if tipo_pieza == 1:
+            curvas_por_capa = utilidades.transform_cilindrical_cortes(cortes=curvas_por_capa, inv=True, radio=descriptor_pieza[0])
+        if tipo_pieza == 2:
+            r = Rotation.from_euler('y', descriptor_pieza[1], degrees=True)
+            for i, capa in enumerate(curvas_por_capa):
+                for j, curva in enumerate(capa):
+                    curvas_por_capa[i][j] = r.apply(curva)
+            curvas_por_capa = utilidades.transform_cilindrical_cortes_conos(cortes=curvas_por_capa, inv=True, descriptor=descriptor_pieza)
+        return curvas_por_capa
     
     def calcular_trayectorias(self, cortes: List[List[np.ndarray]], ancho_cordon: float, alto_cordon: float, offset: float, step_over: float, 
                             velocidad: float, material: str, tipo_pieza: int=0, descriptor_pieza: Tuple[float, float]=[1, 0]) -> List[List[List[np.ndarray]]]:
@@ -1724,8 +2032,12 @@ class Procesador:
                 trayectorias calculadas para cada contorno entregado en la variable cortes.
         """
 
-        anglevalues, data, nameoption, dividelist, areacompare, areadivision = param_values.testing(cortes, offset, step_over, ancho_cordon, alto_cordon, velocidad, densidad_material)
-        _, capas = param_values.generation_paths(anglevalues, data, nameoption, dividelist, areacompare, areadivision, offset, step_over, ancho_cordon, alto_cordon, velocidad, densidad_material)
+        # Un mismo pool de procesos se usa en todas las pruebas de ángulos y estrategias
+        ejecutor = pool_procesos.obtener_ejecutor(self.procesos_trayectorias)
+        anglevalues, data, nameoption, dividelist, areacompare, areadivision = param_values.testing(cortes, offset, step_over, ancho_cordon, alto_cordon, velocidad, densidad_material,
+                                                                                                        graficar=False, procesos=self.procesos_trayectorias, ejecutor=ejecutor)
+        _, capas = param_values.generation_paths(anglevalues, data, nameoption, dividelist, areacompare, areadivision, offset, step_over, ancho_cordon, alto_cordon, velocidad, densidad_material,
+                                                   graficar=False, procesos=self.procesos_trayectorias, cache=self.cache_trayectorias, ejecutor=ejecutor)
         return capas[0]
 
     def calcular_trayectorias_cilindro(self, cortes: List[List[np.ndarray]], ancho_cordon: float, alto_cordon: float, offset: float, step_over: float, 
@@ -1,30 +1,93 @@
 """
-Functions to slice a mesh. For now, computes planar cross-section
+Functions to slice a mesh. Computes cross-sections with planes, and with cylinders or cones around
+the X axis (level sets of the radius), as sets of polylines.
+
+The mesh topology (unique edges, edges of each triangle and triangles of each edge) is computed once
+per mesh in CutMesh. Each cut evaluates the signed distance of all vertices in a single NumPy pass,
+finds every crossing edge and triangle at once, and chains the crossing segments into polylines in
+linear time.
 """
 import numpy as np
-import numpy.linalg as la
 try:
     import scipy.spatial.distance as spdist
     USE_SCIPY = True
 except ImportError:
     USE_SCIPY = False
-import utilidades
+
+# Kind of level-set surface used for the cut
+GEOMETRIA_PLANO = 0
+GEOMETRIA_CILINDRO = 1
+GEOMETRIA_CONO = 2
+
+
+class Plane:
+    """
+    Cut plane given by an origin and a normal. For cylinder and cone cuts the
+    level (radius at X = 0) is the distance from the origin along the normal.
+    """
+
+    def __init__(self, orig, normal):
+        self.orig = np.asarray(orig, dtype=np.float64)
+        self.n = np.asarray(normal, dtype=np.float64)
+        self.n = self.n / np.linalg.norm(self.n)
+
+    @property
+    def nivel(self):
+        return float(np.dot(self.orig, self.n))
+
+
+class CutMesh:
+    """
+    Triangle mesh with its edge topology precomputed for repeated cuts.
+
+    Attributes:
+        verts: Nx3 array of the vertices position
+        tris: Mx3 array of the faces, containing vertex indices
+        edges: Ex2 array of the unique edges, sorted vertex indices
+        tri_edges: Mx3 array with the edge index of each triangle side
+        edge_tris_ptr, edge_tris: CSR layout of the triangles of each edge
+    """
+
+    def __init__(self, verts, tris):
+        self.verts = np.ascontiguousarray(verts, dtype=np.float64)
+        self.tris = np.ascontiguousarray(tris, dtype=np.int64)
+
+        # Triangle sides (v0, v1), (v1, v2), (v2, v0), as sorted vertex pairs
+        sides = np.stack([self.tris, np.roll(self.tris, -1, axis=1)], axis=2).reshape(-1, 2)
+        sides.sort(axis=1)
+        self.edges, side_edge = np.unique(sides, axis=0, return_inverse=True)
+        side_edge = side_edge.reshape(-1)
+        self.tri_edges = side_edge.reshape(-1, 3)
+
+        # Edge -> triangles, sorted by edge so each edge's triangles are contiguous
+        order = np.argsort(side_edge, kind='stable')
+        self.edge_tris = order // 3
+        self.edge_tris_ptr = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(side_edge, minlength=len(self.edges)), out=self.edge_tris_ptr[1:])
+
+    @classmethod
+    def from_mesh(cls, mesh):
+        """
+        Returns a CutMesh for a CutMesh, a meshcut-like mesh (verts, tris) or a
+        trimesh-like mesh (vertices, faces)
+        """
+        if isinstance(mesh, cls):
+            return mesh
+        if hasattr(mesh, 'verts'):
+            return cls(mesh.verts, mesh.tris)
+        return cls(mesh.vertices, mesh.faces)
 
 
 def point_to_cone_dist(p, cut_radius, pendiente):
-    y_sqrd = p[1] ** 2
-    z_sqrd = p[2] ** 2
-    radio_vert = np.sqrt(y_sqrd + z_sqrd)
+    radio_vert = np.sqrt(p[..., 1] ** 2 + p[..., 2] ** 2)
 
-    radio_ideal_actual = pendiente*p[0] + cut_radius
+    radio_ideal_actual = pendiente*p[..., 0] + cut_radius
 
     return radio_ideal_actual - radio_vert
 
 
 def point_to_cylinder_dist(p, radius):
-    y_sqrd = p[1]**2
-    z_sqrd = p[2]**2
-    radio_vert = np.sqrt(y_sqrd+z_sqrd)
+    radio_vert = np.sqrt(p[..., 1] ** 2 + p[..., 2] ** 2)
     return radius - radio_vert
 
 
@@ -32,189 +95,133 @@ def point_to_plane_dist(p, plane):
     return np.dot((p - plane.orig), plane.n)
 
 
+def signed_distances(verts, plane, tipo_geometria=GEOMETRIA_PLANO, pendiente=0):
+    """
+    Signed distance of all the vertices to the cut surface, in a single pass.
+    Cylinders and cones are around the X axis, with radius plane.nivel at X = 0.
+    """
+    if tipo_geometria == GEOMETRIA_CILINDRO:
+        return point_to_cylinder_dist(verts, plane.nivel)
+    if tipo_geometria == GEOMETRIA_CONO:
+        return point_to_cone_dist(verts, plane.nivel, pendiente or 0)
+    return point_to_plane_dist(verts, plane)
+
+
 def triangle_intersects_plane(mesh, tid, plane):
     """
     Returns true if the given triangle is cut by the plane. This will return
     false if a single vertex of the triangle lies on the plane
     """
-    dists = [point_to_plane_dist(mesh.verts[vid], plane)
-             for vid in mesh.tris[tid]]
+    dists = point_to_plane_dist(mesh.verts[mesh.tris[tid]], plane)
     side = np.sign(dists)
     return not (side[0] == side[1] == side[2])
 
 
-# ---- Planar cross-section
-
-INTERSECT_EDGE = 0
-INTERSECT_VERTEX = 1
-
-
-def compute_triangle_plane_intersections(mesh, tid, plane, dist_tol=1e-8, pendiente=0):
-    """
-    Compute the intersection between a triangle and a plane
-
-    Returns a list of intersections in the form
-        (INTERSECT_EDGE, <intersection point>, <edge>) for edges intersection
-        (INTERSECT_VERTEX, <intersection point>, <vertex index>) for vertices
-
-    This return between 0 and 2 intersections :
-    - 0 : the plane does not intersect the plane
-    - 1 : one of the triangle's vertices lies on the plane (so it just
-          "touches" the plane without really intersecting)
-    - 2 : the plane slice the triangle in two parts (either vertex-edge,
-          vertex-vertex or edge-edge)
-    """
-    # TODO: Use a distance cache
-    dists = {vid: point_to_plane_dist(mesh.verts[vid], plane) for vid in mesh.tris[tid]}
-    # if tipo_geometria == 1:
-    #     dists = {vid: point_to_cylinder_dist(mesh.verts[vid], plane)
-    #              for vid in mesh.tris[tid]}
-    # if tipo_geometria == 2:  # TODO
-    #     dists = {vid: point_to_cone_dist(mesh.verts[vid], plane, pendiente)
-    #              for vid in mesh.tris[tid]}
-    # TODO: Use an edge intersection cache (we currently compute each edge
-    # intersection twice : once for each tri)
-
-    # This is to avoid registering the same vertex intersection twice
-    # from two different edges
-    vert_intersect = {vid: False for vid in dists.keys()}
-
-    # Iterate through the edges, cutting the ones that intersect
-    intersections = []
-    for e in mesh.edges_for_triangle(tid):
-        v1 = mesh.verts[e[0]]
-        d1 = dists[e[0]]
-        v2 = mesh.verts[e[1]]
-        d2 = dists[e[1]]
-
-        if np.fabs(d1) < dist_tol:
-            # Avoid creating the vertex intersection twice
-            if not vert_intersect[e[0]]:
-                # point on plane
-                intersections.append((INTERSECT_VERTEX, v1, e[0]))
-                vert_intersect[e[0]] = True
-        if np.fabs(d2) < dist_tol:
-            if not vert_intersect[e[1]]:
-                # point on plane
-                intersections.append((INTERSECT_VERTEX, v2, e[1]))
-                vert_intersect[e[1]] = True
-
-        # If vertices are on opposite sides of the plane, we have an edge
-        # intersection
-        if d1 * d2 < 0:
-            # Due to numerical accuracy, we could have both a vertex intersect
-            # and an edge intersect on the same vertex, which is impossible
-            if not vert_intersect[e[0]] and not vert_intersect[e[1]]:
-                # intersection factor (between 0 and 1)
-                # here is a nice drawing :
-                # https://ravehgonen.files.wordpress.com/2013/02/slide8.png
-                # keep in mind d1, d2 are *signed* distances (=> d1 - d2)
-                s = d1 / (d1 - d2)
-                vdir = v2 - v1
-                ipos = v1 + vdir * s
-                intersections.append((INTERSECT_EDGE, ipos, e))
-
-    return intersections
-
-
-def get_next_triangle(mesh, T, plane, intersection, dist_tol, pendiente=0):
-    """
-    Returns the next triangle to visit given the intersection and
-    the list of unvisited triangles (T)
-
-    We look for a triangle that is cut by the plane (2 intersections) as
-    opposed to one that only touch the plane (1 vertex intersection)
-    """
-    if intersection[0] == INTERSECT_EDGE:
-        tris = mesh.triangles_for_edge(intersection[2])
-    elif intersection[0] == INTERSECT_VERTEX:
-        tris = mesh.triangles_for_vert(intersection[2])
-    else:
-        assert False, 'Invalid intersection[0] value : %d' % intersection[0]
-
-    # Knowing where we come from is not enough. If an edge of the triangle
-    # lies exactly on the plane, i.e. :
-    #
-    #   /t1\
-    # -v1---v2-
-    #   \t2/
-    #
-    # With v1, v2 being the vertices and t1, t2 being the triangles, then
-    # if you just try to go to the next connected triangle that intersect,
-    # you can visit v1 -> t1 -> v2 -> t2 -> v1 .
-    # Therefore, we need to limit the new candidates to the set of unvisited
-    # triangles and once we've visited a triangle and decided on a next one,
-    # remove all the neighbors of the visited triangle so we don't come
-    # back to it
-
-    T = set(T)
-    for tid in tris:
-        if tid in T:
-            intersections = compute_triangle_plane_intersections(mesh, tid, plane, dist_tol, pendiente)
-            if len(intersections) == 2:
-                T = T.difference(tris)
-                return tid, intersections, T
-    return None, [], T
-
-
-def _walk_polyline(tid, intersect, T, mesh, plane, dist_tol, pendiente=0):
+def _chain_segments(seg_a, seg_b, n_nodes):
     """
-    Given an intersection, walk through the mesh triangles, computing
-    intersection with the cut plane for each visited triangle and adding
-    those intersection to a polyline.
+    Chains segments (seg_a[i], seg_b[i]) between nodes into polylines, in
+    linear time. Returns a list of (node array, closed) tuples.
     """
-    T = set(T)
-    p = []
-    # Loop until we have explored all the triangles for the current
-    # polyline
-    while True:
-        p.append(intersect[1])
-
-        tid, intersections, T = get_next_triangle(mesh, T, plane, intersect, dist_tol, pendiente)
-        if tid is None:
-            break
-
-        # get_next_triangle returns triangles that our plane actually
-        # intersects (as opposed to touching only a single vertex),
-        # hence the assert
-        assert len(intersections) == 2
-
-        # Of the two returned intersections, one should have the
-        # intersection point equal to p[-1]
-        if la.norm(intersections[0][1] - p[-1]) < dist_tol:
-            intersect = intersections[1]
-        else:
-            assert la.norm(intersections[1][1] - p[-1]) < dist_tol, \
-                '%s not close to %s' % (str(p[-1]), str(intersections))
-            intersect = intersections[0]
-
-    return p, T
-
-
-def cross_section_mesh(mesh, plane, dist_tol=1e-8, pendiente=0):
+    n_segs = len(seg_a)
+    # Node -> segments in CSR layout
+    ends = np.concatenate([seg_a, seg_b])
+    order = np.argsort(ends, kind='stable')
+    node_segs = order % n_segs
+    ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=n_nodes), out=ptr[1:])
+    degree = np.diff(ptr)
+
+    seg_a = seg_a.tolist()
+    seg_b = seg_b.tolist()
+    node_segs = node_segs.tolist()
+    ptr = ptr.tolist()
+    used = [False]*n_segs
+
+    def walk(node):
+        # Follows unused segments from node until none is left
+        path = [node]
+        while True:
+            for k in range(ptr[node], ptr[node + 1]):
+                s = node_segs[k]
+                if not used[s]:
+                    used[s] = True
+                    node = seg_b[s] if seg_a[s] == node else seg_a[s]
+                    path.append(node)
+                    break
+            else:
+                return path
+
+    polylines = []
+    # Open polylines start at nodes with an odd number of segments (mesh borders)
+    for node in np.flatnonzero(degree % 2 == 1).tolist():
+        path = walk(node)
+        if len(path) > 1:
+            polylines.append((path, False))
+    # Remaining segments form closed loops
+    for s in range(n_segs):
+        if not used[s]:
+            path = walk(seg_a[s])
+            closed = path[0] == path[-1]
+            polylines.append((path[:-1] if closed else path, closed))
+    return polylines
+
+
+def cross_section_mesh(mesh, plane, dist_tol=1e-8, pendiente=0, tipo_geometria=GEOMETRIA_PLANO,
+                       close_loops=False):
     """
     Args:
-        mesh: A geom.TriangleMesh instance
-        plane: The cut plane : geom.Plane instance
-        tipo_geometria: Value used to distinguish between planes and cylinders
+        mesh: A CutMesh instance (a mesh with verts/tris or vertices/faces is
+              converted, prefer building the CutMesh once for repeated cuts)
+        plane: The cut plane : Plane instance
         dist_tol: If two points are closer than dist_tol, they are considered
                   the same
-    """
-    # Set of all triangles
-    T = set(range(len(mesh.tris)))
-    # List of all cross-section polylines
-    P = []
+        pendiente: Slope of the cone radius along X, only for cone cuts
+        tipo_geometria: 0 for planes, 1 for cylinders and 2 for cones
+        close_loops: If True, closed polylines repeat their first point at
+                     the end, so open and closed ones can be told apart
 
-    while len(T) > 0:
-        tid = T.pop()
-
-        intersections = compute_triangle_plane_intersections(mesh, tid, plane, dist_tol, pendiente)
+    Returns:
+        A list of Nx3 arrays, each representing a disconnected portion
+        of the cross section as a polyline
+    """
+    mesh = CutMesh.from_mesh(mesh)
+    dists = signed_distances(mesh.verts, plane, tipo_geometria, pendiente)
+    # Vertices on the surface count as being above it, so each cut triangle
+    # has exactly two crossing edges and touching vertices add no segment
+    above = dists >= -dist_tol
+
+    e0, e1 = mesh.edges[:, 0], mesh.edges[:, 1]
+    crossing = above[e0] != above[e1]
+    if not np.any(crossing):
+        return []
+    edge_ids = np.flatnonzero(crossing)
+
+    # Intersection point of each crossing edge
+    d0, d1 = dists[e0[edge_ids]], dists[e1[edge_ids]]
+    s = np.clip(np.divide(d0, d0 - d1, out=np.zeros_like(d0), where=(d0 - d1) != 0), 0, 1)
+    v0 = mesh.verts[e0[edge_ids]]
+    points = v0 + (mesh.verts[e1[edge_ids]] - v0)*s[:, None]
+
+    # Each cut triangle joins its two crossing edges with one segment
+    node_of_edge = np.full(len(mesh.edges), -1, dtype=np.int64)
+    node_of_edge[edge_ids] = np.arange(len(edge_ids))
+    tri_nodes = node_of_edge[mesh.tri_edges]
+    cut = (tri_nodes >= 0).sum(axis=1) == 2
+    tri_nodes = np.sort(tri_nodes[cut], axis=1)[:, 1:]
 
-        if len(intersections) == 2:
-            for intersection in intersections:
-                p, T = _walk_polyline(tid, intersection, T, mesh, plane, dist_tol, pendiente)
-                if len(p) > 1:
-                    P.append(np.array(p))
+    P = []
+    for nodes, closed in _chain_segments(tri_nodes[:, 0], tri_nodes[:, 1], len(edge_ids)):
+        p = points[nodes]
+        # Edges meeting at a vertex on the surface give repeated points
+        keep = np.ones(len(p), dtype=bool)
+        keep[1:] = np.linalg.norm(np.diff(p, axis=0), axis=1) >= dist_tol
+        p = p[keep]
+        if closed and len(p) > 1 and np.linalg.norm(p[-1] - p[0]) < dist_tol:
+            p = p[:-1]
+        if len(p) > 1:
+            if closed and close_loops:
+                p = np.vstack([p, p[:1]])
+            P.append(p)
     return P
 
 
@@ -233,8 +240,8 @@ def cross_section(verts, tris, plane_orig, plane_normal, **kwargs):
         A list of Nx3 arrays, each representing a disconnected portion
         of the cross section as a polyline
     """
-    mesh = utilidades.TriangleMesh(verts, tris)
-    plane = utilidades.Plane(plane_orig, plane_normal)
+    mesh = CutMesh(verts, tris)
+    plane = Plane(plane_orig, plane_normal)
     return cross_section_mesh(mesh, plane, **kwargs)
 
 
@@ -1,14 +1,15 @@
 import numpy as np
-import utilidades
 import slicing_segmentacion.meshcut
 
 
-def cortar_malla(malla_datos, alturas_cortes=None, pendiente=None):
+def cortar_malla(malla_datos, alturas_cortes=None, pendiente=None, tipo_geometria=0):
     """Función que toma una malla de pieza
     y produce contornos de fallas.
     Argumentos:
         malla_datos [TriangleMesh]: pieza elegida por usuario en formato Meshcut.
-        alto_cordon [Float]: alto de cordón de soldadura.
+        alturas_cortes [List]: alturas de los cortes, en cilindros y conos son los radios en X = 0.
+        pendiente [Float]: pendiente del radio del cono en X, solo para conos.
+        tipo_geometria [Int]: 0 para planos, 1 para cilindros y 2 para conos.
 
     Return:
         cortes [List]: lista de capas, cada capa otra lista.
@@ -22,14 +23,17 @@ def cortar_malla(malla_datos, alturas_cortes=None, pendiente=None):
         alturas_cortes = []
 
     lista_cortes = []
+    # Topología de la malla se calcula una sola vez para todos los cortes
+    malla_datos = slicing_segmentacion.meshcut.CutMesh.from_mesh(malla_datos)
     # origen_plano = np.asarray([0.0, 0.0, 0.0])
     normal_plano = np.asarray([0, 0, 1])
 
     for i, altura_corte in enumerate(alturas_cortes):
         origen_plano = np.asarray([0, 0, altura_corte])
-        plano_corte = utilidades.Plane(origen_plano, normal_plano)  # CREA UN PLANO EN EL FORMATO DE MESHCUT
+        plano_corte = slicing_segmentacion.meshcut.Plane(origen_plano, normal_plano)  # CREA UN PLANO EN EL FORMATO DE MESHCUT
 
-        corte = slicing_segmentacion.meshcut.cross_section_mesh(malla_datos, plano_corte, pendiente=pendiente)
+        corte = slicing_segmentacion.meshcut.cross_section_mesh(malla_datos, plano_corte, pendiente=pendiente,
+                                                                tipo_geometria=tipo_geometria)
 
         print("\nNÚMERO CONTORNOS: ", len(corte), ', CAPA:', i, ', ALTURA:', altura_corte)
 
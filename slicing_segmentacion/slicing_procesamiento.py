@@ -1,5 +1,6 @@
 import open3d as o3d
 import numpy as np
+import scipy.ndimage
 import matplotlib.pyplot as plt
 from itertools import combinations
 import skimage.segmentation
@@ -15,150 +16,44 @@ def slice_nube(nube, tipo_geom='placa'):
         nube.translate((0, -nube.get_min_bound()[1], -nube.get_min_bound()[2]), relative=True)
         nube_cilin_coords_np, nube = cambio_a_cilin(nube)  # NUBE AHORA SE TRANSFORMA A UNA PLACA AL ESTAR EN COORDENADAS CILÍNDRICAS
         nube.translate((-nube.get_min_bound()[0], -nube.get_min_bound()[1], -nube.get_min_bound()[2]), relative=True)
-    # FACTOR PARA ENCONTRAR POSICIONES ADECUADAS
-    i = 0
-    j = 2
     # LARGO DE LA ARISTA DE VOXEL CORRESPONDE A 4 VECES LA DISTANCIA PROM ENTRE PTOS, SIGUE LÓGICA DE DBSCAN
     dist_prom = np.round(np.mean(nube.compute_nearest_neighbor_distance()), decimals=5)
     arista_voxel = np.round(dist_prom * 4, 5)
-    # SE VOXELIZA, OBTIENE LISTA COMPLETA DE VOXELS (ÍNDICES Y COLORES) Y SE RESCATAN LOS ÍNDICES
-    voxelgrid = o3d.geometry.VoxelGrid.create_from_point_cloud(input=nube, voxel_size=arista_voxel)
-    lista_total_voxels = np.asarray(voxelgrid.get_voxels())
-    voxels_indices = np.asarray([lista_total_voxels[i].grid_index for i in range(len(lista_total_voxels))])
-    # SE CREA DICCIONARIO PARA GUARDAR LAS CAPAS, CAPA ES EL VALOR Y LA LLAVE ES EL NÚMERO DE SU NIVEL
-    # CADA CAPA ES UNA GRILLA CORRESPONDIENTE AL VOXELGRID, ES DEL MISMO TAMAÑO EN EL PLANO XY
-    diccionario_capas = {}
-    capa = {(x, y): ['white'] for y in range(voxelgrid.get_voxel(voxelgrid.get_max_bound())[1] + 1) for x in range(voxelgrid.get_voxel(voxelgrid.get_max_bound())[0] + 1)}
-    # SE TOMA UN RANGO IGUAL A LA CANTIDAD DE VOXELS EN DIRECCIÓN Z
-    for nivel in range(voxelgrid.get_voxel(voxelgrid.get_max_bound())[j] - 1):
-        # SE CREA LA CAPA, SE RENUEVA CADA CICLO, NO BORRA EL DICCIONARIO NI LO REEMPLAZA POR OTRO NUEVO
-        capa.update((k, ['white']) for k in capa)
-        # SE BUSCAN TODOS LOS VOXEL QUE ESTÁN EN EL MISMO NIVEL Y POR SOBRE EL NIVEL
-        # EQUIVALENTE A PARARSE ENTRE MEDIO DE LOS DOS NIVELES
-        voxels_capa = voxels_indices[np.logical_or(voxels_indices[:, j] == nivel, voxels_indices[:, j] == nivel + 1)]
-        # SE BUSCA POR NIVEL PRIMERO, LUEGO SE COLOCA COLOR SEGÚN ÍNDICES (X, Y)
-        for voxel in voxels_capa:
-            if voxel[j] == nivel:  # ESTO QUIERE DECIR QUE ESTÁ ABAJO
-                capa[(voxel[i], voxel[i+1])][0] = 'blue'
-        for voxel in voxels_capa:
-            if voxel[j] > nivel:  # ESTO QUIERE DECIR QUE ESTÁ ARRIBA, DUH
-                if capa[(voxel[i], voxel[i+1])][0] == 'white':  # SI NO SE MARCÓ EN LA PASADA ANTERIOR, SE MARCA ROJO
-                    capa[(voxel[i], voxel[i+1])][0] = 'red'
-                if capa[(voxel[i], voxel[i+1])][0] == 'blue':  # SI YA ESTABA MARCADO DE AZUL, SE MARCA NEGRO
-                    capa[(voxel[i], voxel[i+1])][0] = 'black'
-        # AHORA SE REVISA LA INTERFAZ ENTRE RED Y BLUE, SI HAY INTERFAZ RED-BLUE AMBOS SE PONEN NEGRO
-        voxels_pintados = [voxel for voxel in voxels_capa if capa[(voxel[i], voxel[i+1])][0] != 'black' and capa[(voxel[i], voxel[i+1])][0] != 'white']
-        for voxel in voxels_pintados:
-            color = capa[(voxel[i], voxel[i+1])][0]
-            # ES NECESARIO PORQUE A PRIORI LAS CELDAS SOLOS ON ROJAS-AZULES, PERO PUEDEN CAMBIAR A NEGRO ANTES DE CHEQUEAR
-            if color != 'black':
-                try:
-                    color_der = capa[(voxel[i] + 1, voxel[i+1])][0]
-                    if color != color_der and color_der != 'white' and color_der != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] + 1, voxel[i+1])][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_diag_der_sup = capa[(voxel[i] + 1, voxel[i+1] + 1)][0]
-                    if color != color_diag_der_sup and color_diag_der_sup != 'white' and color_diag_der_sup != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] + 1, voxel[i+1] + 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_up = capa[(voxel[i], voxel[i+1] + 1)][0]
-                    if color != color_up and color_up != 'white' and color_up != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i], voxel[i+1] + 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_diag_izq_sup = capa[(voxel[i] - 1, voxel[i+1] + 1)][0]
-                    if color != color_diag_izq_sup and color_diag_izq_sup != 'white' and color_diag_izq_sup != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] - 1, voxel[i+1] + 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_izq = capa[(voxel[i] - 1, voxel[i+1])][0]
-                    if color != color_izq and color_izq != 'white' and color_izq != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] - 1, voxel[i+1])][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_diag_izq_inf = capa[(voxel[i] - 1, voxel[i+1] - 1)][0]
-                    if color != color_diag_izq_inf and color_diag_izq_inf != 'white' and color_diag_izq_inf != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] - 1, voxel[i+1] - 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_down = capa[(voxel[i], voxel[i+1] - 1)][0]
-                    if color != color_down and color_down != 'white' and color_down != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i], voxel[i+1] - 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-                try:
-                    color_diag_der_inf = capa[(voxel[i] + 1, voxel[i+1] - 1)][0]
-                    if color != color_diag_der_inf and color_diag_der_inf != 'white' and color_diag_der_inf != 'black':
-                        capa[(voxel[i], voxel[i+1])][0] = 'black'
-                        capa[(voxel[i] + 1, voxel[i+1] - 1)][0] = 'black'
-                except KeyError:
-                    pass
-
-        # ELIMINO TODAS LAS CELDAS QUE NO SEAN NEGRAS PARA AHORRAR ESPACIO, DICCIONARIO FINAL, CADA NIVEL ES UNA LLAVE, CADA VALOR ES UN DICCIONARIO DE LA CAPA
-        diccionario_capas[nivel] = {celda: ['nonvisited', 'nocenter'] for celda, color in capa.items() if color[0] == 'black'}
+    # SE VOXELIZA EN UNA GRILLA DENSA DE BOOLEANOS, MISMA CONVENCIÓN DE OPEN3D (ORIGEN MEDIA ARISTA BAJO EL MÍNIMO)
+    puntos = np.asarray(nube.points)
+    origen_grilla = puntos.min(axis=0) - arista_voxel/2
+    voxels_indices = np.floor((puntos - origen_grilla)/arista_voxel).astype(np.int64)
+    ocupados = np.zeros(voxels_indices.max(axis=0) + 1, dtype=bool)
+    ocupados[voxels_indices[:, 0], voxels_indices[:, 1], voxels_indices[:, 2]] = True
+    # CADA NIVEL SE COMPARA CON EL SIGUIENTE, EQUIVALENTE A PARARSE ENTRE MEDIO DE LOS DOS NIVELES
+    # TODOS LOS NIVELES SE CLASIFICAN A LA VEZ, EL EJE 2 DE CADA ARREGLO ES EL NIVEL
+    niveles = max(ocupados.shape[2] - 2, 0)
+    abajo = ocupados[:, :, :niveles]
+    arriba = ocupados[:, :, 1:niveles + 1]
+    azul = abajo & ~arriba  # SOLO ABAJO
+    rojo = arriba & ~abajo  # SOLO ARRIBA
+    negro = abajo & arriba  # ABAJO Y ARRIBA
+    # INTERFAZ ENTRE RED Y BLUE EN LA VECINDAD DE 8 CELDAS DE LA CAPA, AMBOS SE PONEN NEGRO
+    vecindad = np.ones((3, 3, 1), dtype=bool)
+    negro |= azul & scipy.ndimage.binary_dilation(rojo, structure=vecindad)
+    negro |= rojo & scipy.ndimage.binary_dilation(azul, structure=vecindad)
+    # DICCIONARIO FINAL, CADA NIVEL ES UNA LLAVE, CADA VALOR ES LA MÁSCARA DE CELDAS NEGRAS DE LA CAPA, INDEXADA COMO [X, Y]
+    diccionario_capas = {nivel: negro[:, :, nivel] for nivel in range(negro.shape[2])}
     return diccionario_capas, arista_voxel
 
 
-def buscar_marcar_vecinos(celda_inicial, capa_busqueda):
-    # FUNCIÓN PARA BUSCAR CELDAS VECINAS EN LAS CURVAS DE LA CAPA, DADA UNA CELDA INICIAL Y UN DICCIONARIO CON TODOS LOS PUNTOS
-    # TOMO LA CELDA Y VEO SUS 8 VECINOS, LOS MARCO TODOS COMO VISITED, CELDA ELEGIDA ADEMÁS SE MARCA COMO CENTER
-    capa_busqueda[celda_inicial][0] = 'visited'
-    capa_busqueda[celda_inicial][1] = 'center'
-    # HAY QUE USAR TRY PORQUE PUEDE QUE SE PASE A CELDAS BLANCAS, NO IMPORTA ESO PORQUE NO HAY PUNTOS AHÍ, NO AFECTA
-    try:  # REVISO DERECHA
-        capa_busqueda[(celda_inicial[0] + 1, celda_inicial[1])][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO DIAGONAL SUPERIOR DERECHA
-        capa_busqueda[(celda_inicial[0] + 1, celda_inicial[1] + 1)][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO ARRIBA
-        capa_busqueda[(celda_inicial[0], celda_inicial[1] + 1)][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO DIAGONAL IZQUIERDA SUPERIOR
-        capa_busqueda[(celda_inicial[0] - 1, celda_inicial[1] + 1)][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO IZQUIERDA
-        capa_busqueda[(celda_inicial[0] - 1, celda_inicial[1])][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO DIAGONAL IZQUIERDA INFERIOR
-        capa_busqueda[(celda_inicial[0] - 1, celda_inicial[1] - 1)][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO ABAJO
-        capa_busqueda[(celda_inicial[0], celda_inicial[1] - 1)][0] = 'visited'
-    except KeyError:
-        pass
-    try:  # REVISO DIAGONAL INFERIOR DERECHA
-        capa_busqueda[(celda_inicial[0] + 1, celda_inicial[1] - 1)][0] = 'visited'
-    except KeyError:
-        pass
+def celdas_de_plano(plano):
+    # IN: PLANO COMO MÁSCARA BOOLEANA [X, Y], DICCIONARIO CON CELDAS COMO LLAVES O ARRAY DE CELDAS
+    # OUT: MÁSCARA BOOLEANA Y ORIGEN (X, Y) DE LA MÁSCARA, LAS CELDAS PUEDEN TENER ÍNDICES NEGATIVOS
+    if isinstance(plano, np.ndarray) and plano.dtype == bool:
+        return plano, np.zeros(2, dtype=np.int64)
+    celdas = np.asarray(list(plano.keys()) if isinstance(plano, dict) else plano, dtype=np.int64).reshape(-1, 2)
+    if len(celdas) == 0:
+        return np.zeros((0, 0), dtype=bool), np.zeros(2, dtype=np.int64)
+    origen = celdas.min(axis=0)
+    mascara = np.zeros(celdas.max(axis=0) - origen + 1, dtype=bool)
+    mascara[celdas[:, 0] - origen[0], celdas[:, 1] - origen[1]] = True
+    return mascara, origen
 
 
 def vecinos(p, tier=1):
@@ -203,36 +98,29 @@ def vecinos(p, tier=1):
                 [p[0] - 1, p[1] - 2]]
 
 
+# DESPLAZAMIENTOS DE LOS VECINOS DE CADA TIER, PARA CALCULAR LOS VECINOS DE TODOS LOS PUNTOS DE UNA CURVA A LA VEZ
+OFFSETS_VECINOS = {tier: np.asarray(vecinos([0, 0], tier)) for tier in (0, 1, 2)}
+
+
 def obtener_curvas_en_capa(plano_capa):
-    curvas = []
-    while ['nonvisited', 'nocenter'] in plano_capa.values():  # CONDICIÓN PARA SEGUIR BUSCANDO EN LA CAPA
-        celda_ini = [celda for celda, estado in plano_capa.items() if estado == ['nonvisited', 'nocenter']][0]  # CELDA INICIAL, NO IMPORTA CUAL SEA
-        buscar_marcar_vecinos(celda_ini, plano_capa)  # SE BUSCAN LOS VECINOS PARA DAR UNA VECINDAD INICIAL
-        while ['visited', 'nocenter'] in plano_capa.values():  # CONDICIÓN PARA SEGUIR BUSCANDO EN LA CURVA
-            # SE ELIGE CUALQUIER PUNTO DE LOS VISITADOS QUE NO SEA CENTRO PARA SEGUIR
-            celda = [celda for celda, estado in plano_capa.items() if estado == ['visited', 'nocenter']][0]
-            buscar_marcar_vecinos(celda, plano_capa)
-        # PARA GUARDARLAS TIENE QUE HABERSE VISITADO Y SIDO CENTRO Y ADEMÁS SE BUSCA QUE NO HAYAN SIDO VISTAS EN UN CICLO ANTERIOR
-        puntos_curva = [celda for celda, estado in plano_capa.items() if estado == ['visited', 'center']]
-        curvas.append(puntos_curva)  # A MEDIDA QUE RECONOCEMOS MÁS CURVAS, SE CONVIERTE EN EL AGREGADO
-
-    x = []  # RESULTADO FINAL ES LISTA DE ARRAYS, CADA ARRAY ES UNA CURVA
-    for i in range(len(curvas)):
-        if i == 0:
-            x.append(np.asarray(curvas[i]))
-        else:
-            x.append(np.asarray([punto for punto in curvas[i] if punto not in curvas[i - 1]]))
-    return x
+    # SEPARA LAS CELDAS DE LA CAPA EN CURVAS, CADA CURVA ES UNA COMPONENTE CONEXA CON VECINDAD DE 8 CELDAS
+    # PLANO PUEDE SER MÁSCARA BOOLEANA, DICCIONARIO CON CELDAS COMO LLAVES O ARRAY DE CELDAS
+    mascara, origen = celdas_de_plano(plano_capa)
+    etiquetas, n_curvas = scipy.ndimage.label(mascara, structure=np.ones((3, 3), dtype=bool))
+    if n_curvas == 0:
+        return []
+    # CELDAS AGRUPADAS POR ETIQUETA EN UNA SOLA PASADA
+    celdas = np.argwhere(etiquetas)
+    etiquetas_celdas = etiquetas[celdas[:, 0], celdas[:, 1]]
+    orden = np.argsort(etiquetas_celdas, kind='stable')
+    cortes = np.cumsum(np.bincount(etiquetas_celdas, minlength=n_curvas + 1)[1:])[:-1]
+    return np.split(celdas[orden] + origen, cortes)  # RESULTADO FINAL ES LISTA DE ARRAYS, CADA ARRAY ES UNA CURVA
 
 
 def tapar_hoyos(capa_de_curvas):
     capas = []
     for elemento in capa_de_curvas:
-        vecinos_puntos = []
-        # vecinos_puntos = [vecinos(punto, 0) for punto in elemento]
-        for punto in elemento:
-            vecinos_puntos.append(vecinos(punto, 0))
-        vecinos_puntos = np.concatenate(vecinos_puntos)
+        vecinos_puntos = (np.asarray(elemento)[:, None, :] + OFFSETS_VECINOS[0]).reshape(-1, 2)
         compartidos = np.unique(vecinos_puntos, return_counts=True, axis=0)
         indxs4 = np.where(compartidos[1] == 4)[0]
         indxs3 = np.where(compartidos[1] == 3)[0]
@@ -249,9 +137,9 @@ def tapar_hoyos(capa_de_curvas):
 def cerrar_curvas(coleccion_curvas, plano):
     # IN: LISTA DE ARRAYS Y UN DICCIONARIO QUE DESCRIBE TODA LA CAPA
     # OUT: DICCIONARIO DEL PLANO CON LOS PTOS FALTANTES PARA CERRAR LAS CURVAS AGREGADOS
-    plano.update((k, ['nonvisited', 'nocenter']) for k in plano)
     # LISTA DE LISTAS DONDE CADA LISTA CORRESPONDE A LOS VECINOS DE CADA CURVA
-    vecinos_posibles = [np.unique(np.concatenate([vecinos(p, 2) for p in elemento]), axis=0) for elemento in coleccion_curvas]
+    vecinos_posibles = [np.unique((np.asarray(elemento)[:, None, :] + OFFSETS_VECINOS[2]).reshape(-1, 2), axis=0)
+                        for elemento in coleccion_curvas if len(elemento)]
     # SE JUNTAN TODOS, SE ENCUENTRAN LOS QUE SE REPITEN 2 VECES (UNIONES) Y SE GUARDAN
     if len(vecinos_posibles):
         puntos_posibles = []
@@ -261,9 +149,7 @@ def cerrar_curvas(coleccion_curvas, plano):
             indx_pc = np.where(puntos_compartidos[1] == 2)[0]
             if len(indx_pc) != 0:  # PARA ASEGURARSE QUE SE TENGAN ÍNDICES
                 candidatos = puntos_compartidos[0][indx_pc]
-                # SE CREA UN DICCIONARIO CON LOS PUNTOS OBTENIDOS
-                capa_candidatos = {(candidate[0], candidate[1]): ['nonvisited', 'nocenter'] for candidate in candidatos}
-                separados = obtener_curvas_en_capa(capa_candidatos)  # SE AISLAN LOS GRUPOS DE PUNTOS EN "CURVAS"
+                separados = obtener_curvas_en_capa(candidatos)  # SE AISLAN LOS GRUPOS DE PUNTOS EN "CURVAS"
                 for stem in separados:  # POR CADA CONJUNTO DE PUNTOS A AGREGAR
                     # QUEDARSE CON 1 O 2 PUNTOS POSIBLES
                     mid = np.mean(stem, axis=0)
@@ -278,10 +164,9 @@ def cerrar_curvas(coleccion_curvas, plano):
         # AGREGAR TODOS LOS PUNTOS POSIBLES AL PLANO
         if len(puntos_posibles) != 0:  # EN CASO DE QUE EFECTIVAMENTE HAYAN PUNTOS POSIBLES
             puntos_posibles = np.concatenate(puntos_posibles, axis=0)  # SE CONCATENAN TODOS PARA PODER AGREGARLOS COMO LISTA
-            for punto in puntos_posibles:
-                punto_agregado = {(punto[0], punto[1]): ['nonvisited', 'nocenter']}
-                plano.update(punto_agregado)
-            nueva_coleccion_curvas = obtener_curvas_en_capa(plano)
+            mascara, origen = celdas_de_plano(plano)
+            celdas_plano = np.vstack((np.argwhere(mascara) + origen, puntos_posibles))
+            nueva_coleccion_curvas = obtener_curvas_en_capa(celdas_plano)
             coleccion_curvas_tapada = tapar_hoyos(nueva_coleccion_curvas)
             return coleccion_curvas_tapada
         else:
@@ -313,9 +198,8 @@ def randomize_join(curva, n=3, p=0.05):
     for i in range(n):
         indx = rd.sample(range(len(curva)), int(len(curva) * (1 - p)))  # GUARDAR INDX DE LOS PUNTOS ELIMINADOS
         curva_random = curva[indx]  # SE TOMAN SOLO LOS PUNTOS NO ELIMINADOS
-        capa_rand = {(punto[0], punto[1]): ['nonvisited', 'nocenter'] for punto in curva_random}
-        curvas_rand = obtener_curvas_en_capa(capa_rand)
-        curvas_rand = cerrar_curvas(curvas_rand, capa_rand)
+        curvas_rand = obtener_curvas_en_capa(curva_random)
+        curvas_rand = cerrar_curvas(curvas_rand, curva_random)
         # pl.append(curvas_rand)
         if len(curvas_rand) == 1:
             pl.append(curvas_rand[0])
@@ -323,9 +207,8 @@ def randomize_join(curva, n=3, p=0.05):
             pl.append(np.concatenate(curvas_rand))
     try:
         joined_pl = np.unique(np.concatenate(pl), axis=0)  # SE CONCATENAN Y HACEN ÚNICOS LOS PUNTOS PARA VOLVER A TENER LA CURVA
-        capa_random = {(punto[0], punto[1]): ['nonvisited', 'nocenter'] for punto in joined_pl}
-        # plano_random_cerrado = cerrar_curvas([pl], capa_random)  # SE AGREGAN LOS PUNTOS AL PLANO Y SE CIERRA DE NUEVO
-        curvas_cerradas_rand = obtener_curvas_en_capa(capa_random)  # SE SACAN LAS CURVAS DE LA CAPA ENTERA DE NUEVO, AHORA CON LA CURVA CERRADA
+        # plano_random_cerrado = cerrar_curvas([pl], joined_pl)  # SE AGREGAN LOS PUNTOS AL PLANO Y SE CIERRA DE NUEVO
+        curvas_cerradas_rand = obtener_curvas_en_capa(joined_pl)  # SE SACAN LAS CURVAS DE LA CAPA ENTERA DE NUEVO, AHORA CON LA CURVA CERRADA
         # SE DEVUELVE SOLO EL PRIMER ELEMENTO PORQUE ES UNA LISTA DE ARRAYS DE LARGO 1, ÚNICO ELEMENTO = CURVA RANDOMIZADA
         return curvas_cerradas_rand[0]
     except ValueError:
@@ -1,5 +1,6 @@
 import wx
 import shapely
+import shapely.ops
 import trimesh
 import numpy as np
 import numpy.linalg as la
@@ -82,6 +83,38 @@ def rotar_pieza(pieza: np.ndarray, centro: Tuple[float, float, float], grados: T
     return pieza_rotada
 
 
+def estimar_transformacion_rigida(origen: np.ndarray, destino: np.ndarray) -> np.ndarray:
+    """
+        Estima la transformación rígida (rotación y traslación) que lleva los puntos de origen a los de destino,
+        mediante el algoritmo de Kabsch. Los puntos deben estar en correspondencia.
+
+        Parameters
+        ----------
+        origen : np.ndarray
+            puntos antes de transformar, con forma (N, 3)
+        destino : np.ndarray
+            puntos después de transformar, con forma (N, 3)
+
+        Returns
+        -------
+        np.ndarray
+            matriz de transformación homogénea, con forma (4, 4)
+    """
+
+    origen = np.asarray(origen, dtype=np.float64)
+    destino = np.asarray(destino, dtype=np.float64)
+    centro_origen = origen.mean(axis=0)
+    centro_destino = destino.mean(axis=0)
+    u, _, vt = np.linalg.svd((origen - centro_origen).T @ (destino - centro_destino))
+    signo = np.sign(np.linalg.det(vt.T @ u.T))
+    rotacion = vt.T @ np.diag([1, 1, signo]) @ u.T
+
+    transformacion = np.eye(4)
+    transformacion[:3, :3] = rotacion
+    transformacion[:3, 3] = centro_destino - rotacion @ centro_origen
+    return transformacion
+
+
 def agregar_validador(elementos: List[wx.TextEntry], validador: Callable) -> None:
     """
         Realiza Bind de la función validadora a la lista de elementos.
@@ -213,7 +246,7 @@ def validador_numerico_general(event: wx.EVT_CHAR) -> None:
 
 def select_layer(data: Union[trimesh.Trimesh, Tuple[trimesh.Trimesh, trimesh.Trimesh]], 
                 height_cordon: float=0, width_cordon: float=0, 
-                step_over: float=0) -> Tuple[np.ndarray, str]:
+                step_over: float=0, adaptativo: bool=False, tolerancia_cambio: float=0.1) -> Tuple[np.ndarray, str]:
     """
         Calcula las alturas a usar para cortar pieza trimesh.Trimesh. En caso de ingresar una lista con 
         dos piezas, se asume que la primera es la dañada y la segunda es modelo ideal. En ese caso se
@@ -221,6 +254,8 @@ def select_layer(data: Union[trimesh.Trimesh, Tuple[trimesh.Trimesh, trimesh.Tri
         Ese modo es útil para cuando se quieren cortar los modelos y luego comparar cortes.
         Retorna np.ndarray con las alturas calculadas para cortes. 
         Alturas son calculadas de acuerdo a la geometría de los cordones de soldadura.
+        En modo adaptativo el espesor de cada capa varía entre la mitad del paso uniforme y la altura del cordón,
+        según cuánto cambia la sección transversal, ver alturas_adaptativas.
 
         Parameters
         ----------
@@ -232,6 +267,10 @@ def select_layer(data: Union[trimesh.Trimesh, Tuple[trimesh.Trimesh, trimesh.Tri
             ancho de cordón de soldadura, by default 0
         step_over : float, optional
             step-over entre cordones de soldadura, by default 0
+        adaptativo : bool, optional
+            indicador de alturas adaptativas, solo aplica a una malla con caras, by default False
+        tolerancia_cambio : float, optional
+            cambio relativo máximo de área y perímetro de la sección dentro de una capa adaptativa, by default 0.1
 
         Returns
         -------
@@ -250,7 +289,12 @@ def select_layer(data: Union[trimesh.Trimesh, Tuple[trimesh.Trimesh, trimesh.Tri
     t = height_cordon * (1 - ((step_over / width_cordon) ** 2))
     # Alturas de capas dependen de P, óptimo P == H
     # Alturas en milímetros, parte en altura H para dar espacio al cordón
-    alturas_z = np.arange(start=start, stop=stop, step=t)
+    adaptativo = adaptativo and isinstance(data, trimesh.Trimesh) and len(data.faces) > 0
+    if adaptativo:
+        alturas_z = alturas_adaptativas(data, start, stop, espesor_min=t/2, espesor_max=max(height_cordon, t),
+                                        tolerancia_cambio=tolerancia_cambio)
+    else:
+        alturas_z = np.arange(start=start, stop=stop, step=t)
     # Espacio entre alturas de cordones y altura de las capas
     vacio_z = stop - alturas_z[-1]
 
@@ -262,11 +306,99 @@ def select_layer(data: Union[trimesh.Trimesh, Tuple[trimesh.Trimesh, trimesh.Tri
         v_t = t + alturas_z[-1]
         alturas_z = np.append(alturas_z, v_t)
 
+    if adaptativo:
+        msge += 'ALTURAS ADAPTATIVAS, '
     msge += 'CANTIDAD DE CORTES A UTILIZAR: {}\n'.format(len(alturas_z))
 
     return alturas_z, msge
 
 
+def alturas_adaptativas(pieza: trimesh.Trimesh, start: float, stop: float, espesor_min: float, espesor_max: float,
+                        tolerancia_cambio: float=0.1) -> np.ndarray:
+    """
+        Calcula alturas de corte con espesor de capa variable.
+        Se hace un pre-corte grueso de la pieza con paso espesor_max y se mide el área y perímetro de cada sección.
+        Las capas cuyo área o perímetro cambian más que tolerancia_cambio (relativo) entre su sección inferior y
+        superior se dividen por la mitad, cortando solo las alturas nuevas, hasta que el cambio quede dentro de la
+        tolerancia o dividirlas deje capas más delgadas que espesor_min.
+        Zonas prismáticas quedan con capas de espesor_max y zonas con cambios con capas finas.
+
+        Parameters
+        ----------
+        pieza : trimesh.Trimesh
+            pieza a cortar
+        start : float
+            altura inicial de cortes
+        stop : float
+            altura final de la pieza
+        espesor_min : float
+            espesor mínimo de capa
+        espesor_max : float
+            espesor máximo de capa, no mayor a la altura del cordón de soldadura
+        tolerancia_cambio : float, optional
+            cambio relativo máximo de área y perímetro de la sección dentro de una capa, by default 0.1
+
+        Returns
+        -------
+        np.ndarray
+            alturas de corte ordenadas, comenzando en start
+    """
+
+    alturas_muestra = np.arange(start, stop + espesor_max, espesor_max)
+    metricas = _metricas_secciones(pieza, alturas_muestra)
+    # Capas por revisar: (altura inferior, altura superior, métricas inferiores, métricas superiores)
+    capas = [(alturas_muestra[i], alturas_muestra[i + 1], metricas[i], metricas[i + 1]) for i in range(len(alturas_muestra) - 1)]
+
+    alturas_z = []
+    while capas:
+        dividir = []
+        for capa in capas:
+            inferior, superior, metricas_inferior, metricas_superior = capa
+            cambio = np.abs(metricas_superior - metricas_inferior)/np.maximum(metricas_inferior, 1e-12)
+            if np.any(cambio > tolerancia_cambio) and (superior - inferior)/2 >= espesor_min - 1e-9:
+                dividir.append(capa)
+            else:
+                alturas_z.append(inferior)
+        if not dividir:
+            break
+
+        alturas_medias = np.array([(inferior + superior)/2 for inferior, superior, _, _ in dividir])
+        metricas_medias = _metricas_secciones(pieza, alturas_medias)
+        capas = []
+        for (inferior, superior, metricas_inferior, metricas_superior), media, metricas_media in zip(dividir, alturas_medias, metricas_medias):
+            capas.append((inferior, media, metricas_inferior, metricas_media))
+            capas.append((media, superior, metricas_media, metricas_superior))
+
+    alturas_z = np.sort(alturas_z)
+    return alturas_z[alturas_z < stop]
+
+
+def _metricas_secciones(pieza: trimesh.Trimesh, alturas: np.ndarray) -> np.ndarray:
+    """
+        Calcula el área y perímetro de las secciones de la pieza a las alturas indicadas.
+
+        Parameters
+        ----------
+        pieza : trimesh.Trimesh
+            pieza a cortar
+        alturas : np.ndarray
+            alturas de las secciones
+
+        Returns
+        -------
+        np.ndarray
+            área y perímetro de cada sección, con forma (len(alturas), 2). Alturas sin sección entregan cero
+    """
+
+    secciones = pieza.section_multiplane(plane_origin=[0, 0, 0], plane_normal=[0, 0, 1], heights=alturas)
+    metricas = np.zeros((len(alturas), 2))
+    for i, seccion in enumerate(secciones):
+        if seccion is not None:
+            poligonos = seccion.polygons_full
+            metricas[i] = sum(poligono.area for poligono in poligonos), sum(poligono.length for poligono in poligonos)
+    return metricas
+
+
 def calcular_cilindro(puntos: Tuple[Tuple[float, float, float],
                             Tuple[float, float, float],
                             Tuple[float, float, float]]) -> Tuple[Tuple[float, float], float]:
@@ -597,3 +729,240 @@ def extraer_coords(poly: Union[shapely.geometry.polygon.Polygon,
                 curvas.append(np.asarray(interior.coords))
 
     return curvas
+
+
+def transform_cilindrical_normales(points: np.ndarray, normales: np.ndarray) -> np.ndarray:
+    """
+        Expresa normales en la base local del sistema de coordenadas Cilíndrico de transform_cilindrical.
+        Mapeo corresponde a [X, Y, Z] ---> [X, Theta, Radio], la componente axial se mantiene en X,
+        la tangencial pasa a Y y la radial a Z. Distorsión de escala del desenrollado no se considera,
+        por lo que solo se conserva la dirección aproximada de las normales.
+
+        Parameters
+        ----------
+        points : np.ndarray
+            puntos en coordenadas Cartesianas, con forma (n, 3)
+        normales : np.ndarray
+            normales de los puntos en coordenadas Cartesianas, con forma (n, 3)
+
+        Returns
+        -------
+        np.ndarray
+            normales en la base local Cilíndrica, con forma (n, 3)
+    """
+
+    theta = np.arctan2(points[:, 1], points[:, 2])
+    normales_cilin = np.zeros(normales.shape)
+    normales_cilin[:, 0] = normales[:, 0]
+    normales_cilin[:, 1] = normales[:, 1]*np.cos(theta) - normales[:, 2]*np.sin(theta)
+    normales_cilin[:, 2] = normales[:, 1]*np.sin(theta) + normales[:, 2]*np.cos(theta)
+
+    return normales_cilin
+
+
+def mascara_a_poligonos(mascara: np.ndarray, origen: Tuple[float, float], tam_celda: float) -> shapely.geometry.multipolygon.MultiPolygon:
+    """
+        Convierte una grilla booleana en polígonos de Shapely.
+        Cada fila de la grilla se recorre como tramos de celdas consecutivas marcadas, los tramos se unen en
+        polígonos y el borde escalonado se simplifica con una tolerancia igual al tamaño de celda.
+
+        Parameters
+        ----------
+        mascara : np.ndarray
+            grilla booleana con forma (nx, ny), True en celdas dentro de los polígonos
+        origen : Tuple[float, float]
+            coordenadas (x, y) de la esquina de la celda [0, 0]
+        tam_celda : float
+            largo del lado de cada celda
+
+        Returns
+        -------
+        shapely.geometry.multipolygon.MultiPolygon
+            polígonos que cubren las celdas marcadas
+    """
+
+    # Inicios y fines de tramos marcados en cada fila, detectados como cambios de valor
+    bordes = np.diff(np.pad(mascara.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    filas_inicio, inicios = np.nonzero(bordes == 1)
+    _, fines = np.nonzero(bordes == -1)
+
+    tramos = [shapely.geometry.box(origen[0] + fila*tam_celda, origen[1] + inicio*tam_celda,
+                                   origen[0] + (fila + 1)*tam_celda, origen[1] + fin*tam_celda)
+              for fila, inicio, fin in zip(filas_inicio, inicios, fines)]
+    union = shapely.ops.unary_union(tramos).simplify(tam_celda)
+
+    if isinstance(union, shapely.geometry.polygon.Polygon):
+        return shapely.geometry.multipolygon.MultiPolygon([union])
+    if isinstance(union, shapely.geometry.multipolygon.MultiPolygon):
+        return union
+    return shapely.geometry.multipolygon.MultiPolygon()
+
+
+def postprocesar_capas(capas: List[Tuple[List[shapely.geometry.polygon.Polygon], float]], ancho_cordon: float) -> List[Union[List[np.ndarray], None]]:
+    """
+        Post-procesa capas de cortes: apertura morfológica con buffer, asignación de altura Z,
+        filtrado con filtrar_cortes y extracción de coordenadas con extraer_coords.
+        Cada capa se procesa de forma independiente, por lo que la lista puede dividirse en lotes y procesarse
+        en paralelo. Función de nivel de módulo para poder usarla en procesos hijos.
+
+        Parameters
+        ----------
+        capas : List[Tuple[List[shapely.geometry.polygon.Polygon], float]]
+            lista de capas, cada una con los polígonos del corte en el plano XY y la altura Z del corte
+        ancho_cordon : float
+            ancho de cordón de soldadura
+
+        Returns
+        -------
+        List[Union[List[np.ndarray], None]]
+            contornos de cada capa en el mismo orden de entrada, None para capas que no pasan los filtros
+    """
+
+    geoms_dmg_multi = [shapely.geometry.MultiPolygon(list(poligonos)) for poligonos, _ in capas]
+    geoms_dmg_multi = [geoms_dmg.buffer(-ancho_cordon*0.08).buffer(ancho_cordon*0.08) for geoms_dmg in geoms_dmg_multi]
+
+    for i, (_, altura) in enumerate(capas):
+        geoms_dmg_multi[i] = shapely.ops.transform(lambda x, y, z=altura: (x, y, np.full(np.shape(x), z)), geoms_dmg_multi[i])
+
+    geoms_dmg_multi = filtrar_cortes(geoms_dmg_multi, ancho_cordon)
+    return [extraer_coords(capa) if capa else None for capa in geoms_dmg_multi]
+
+
+def desenrollar_contornos(contornos: List[np.ndarray], descriptor: Tuple[float, float]=[1, 0], 
+                          rotacion: np.ndarray=None) -> List[shapely.geometry.polygon.Polygon]:
+    """
+        Desenrolla contornos de un corte cilíndrico o cónico, hechos sobre la malla original, al espacio de placa
+        usado en los cortes de cilindros y conos ([X, Theta*Radio, Radio], rotado en conos por rotacion).
+        Los contornos que cruzan la costura en Theta = ±pi se dividen en la costura, y la costura se agrega
+        como borde para cerrar las regiones. Retorna todas las caras planas que forman los contornos,
+        sin distinguir si están dentro o fuera de la pieza.
+
+        Parameters
+        ----------
+        contornos : List[np.ndarray]
+            contornos en coordenadas Cartesianas, los cerrados repiten su primer punto al final
+        descriptor : Tuple[float, float], optional
+            descriptores de la pieza, correspondientes a [radio base, ángulo apertura], by default [1, 0]
+        rotacion : np.ndarray, optional
+            matriz de rotación (3, 3) aplicada después de desenrollar, by default None
+
+        Returns
+        -------
+        List[shapely.geometry.polygon.Polygon]
+            caras formadas por los contornos en el plano XY del espacio de placa
+    """
+
+    if rotacion is None:
+        rotacion = np.eye(3)
+
+    def a_placa(x, theta, r):
+        # Radio ideal depende de X en conos, en cilindros el ángulo es 0 y el radio es constante
+        radio = -1*(np.tan(np.deg2rad(descriptor[1]))*x - descriptor[0])
+        puntos = np.column_stack([x, theta*radio, r]) @ rotacion.T
+        return puntos[:, :2]
+
+    lineas = []
+    costuras = {1: [], -1: []}
+    for contorno in contornos:
+        x = contorno[:, 0]
+        theta = np.arctan2(contorno[:, 1], contorno[:, 2])
+        r = np.sqrt(contorno[:, 1] ** 2 + contorno[:, 2] ** 2)
+        cerrado = len(contorno) > 2 and np.allclose(contorno[0], contorno[-1])
+
+        saltos = np.flatnonzero(np.abs(np.diff(theta)) > np.pi)
+        if len(saltos) == 0:
+            lineas.append(shapely.geometry.LineString(a_placa(x, theta, r)))
+            continue
+
+        # Punto de cruce con la costura en cada salto, interpolado entre los puntos del salto
+        tramos = []
+        inicio = 0
+        entrada = None
+        for i in saltos:
+            lado = np.sign(theta[i])
+            theta_siguiente = theta[i + 1] + 2*np.pi*lado
+            fraccion = (lado*np.pi - theta[i])/(theta_siguiente - theta[i])
+            x_c = x[i] + fraccion*(x[i + 1] - x[i])
+            r_c = r[i] + fraccion*(r[i + 1] - r[i])
+            costuras[lado].append((x_c, r_c))
+            costuras[-lado].append((x_c, r_c))
+
+            tramo = [(x[inicio:i + 1], theta[inicio:i + 1], r[inicio:i + 1])]
+            if entrada is not None:
+                tramo.insert(0, entrada)
+            tramo.append(([x_c], [lado*np.pi], [r_c]))
+            tramos.append(tramo)
+            entrada = ([x_c], [-lado*np.pi], [r_c])
+            inicio = i + 1
+        ultimo = [entrada, (x[inicio:], theta[inicio:], r[inicio:])]
+        if cerrado:
+            # Contorno cerrado: el último tramo continúa en el primero
+            tramos[0] = ultimo + tramos[0]
+        else:
+            tramos.append(ultimo)
+
+        for tramo in tramos:
+            x_t, theta_t, r_t = (np.concatenate(componente) for componente in zip(*tramo))
+            if len(x_t) > 1:
+                lineas.append(shapely.geometry.LineString(a_placa(x_t, theta_t, r_t)))
+
+    # Costura en Theta = ±pi une los cruces de cada lado
+    for lado, cruces in costuras.items():
+        if len(cruces) > 1:
+            x_c, r_c = np.asarray(cruces).T
+            puntos = a_placa(x_c, np.full(len(x_c), lado*np.pi), r_c)
+            lineas.append(shapely.geometry.LineString(puntos[np.argsort(puntos[:, 0])]))
+
+    if not lineas:
+        return []
+    return list(shapely.ops.polygonize(shapely.ops.unary_union(lineas)))
+
+
+def dentro_contornos_cilindricos(puntos: np.ndarray, contornos: List[np.ndarray]) -> np.ndarray:
+    """
+        Indica qué puntos de una superficie de corte cilíndrica o cónica (alrededor del eje X) están dentro del material,
+        según la regla par-impar sobre los contornos del corte, sin consultar la malla.
+        Cada punto se lleva a coordenadas (X, Theta) de la superficie y se cuentan los cruces de los contornos con el rayo
+        de Theta constante hacia X negativo. Como la pieza es acotada en X, el rayo termina fuera del material, por lo
+        que una cantidad impar de cruces indica que el punto está dentro. Los tramos que cruzan la costura en Theta = ±pi
+        se evalúan desenrollados, de esta forma la costura no cuenta como borde.
+
+        Parameters
+        ----------
+        puntos : np.ndarray
+            puntos sobre la superficie de corte en coordenadas Cartesianas, con forma (N, 3)
+        contornos : List[np.ndarray]
+            contornos del corte en coordenadas Cartesianas, los cerrados repiten su primer punto al final
+
+        Returns
+        -------
+        np.ndarray
+            array booleano (N,), True en los puntos dentro del material
+    """
+
+    puntos = np.asarray(puntos, dtype=np.float64)
+    if len(puntos) == 0 or not contornos:
+        return np.zeros(len(puntos), dtype=bool)
+
+    # Tramos de todos los contornos en coordenadas (X, Theta)
+    x1, t1, x2, t2 = [], [], [], []
+    for contorno in contornos:
+        theta = np.arctan2(contorno[:, 1], contorno[:, 2])
+        x1.append(contorno[:-1, 0])
+        x2.append(contorno[1:, 0])
+        t1.append(theta[:-1])
+        t2.append(theta[1:])
+    x1, t1, x2, t2 = (np.concatenate(valores) for valores in (x1, t1, x2, t2))
+    # Tramos que cruzan la costura se desenrollan, continuando Theta más allá de ±pi
+    salto = np.abs(t2 - t1) > np.pi
+    t2 = np.where(salto, t2 + 2*np.pi*np.sign(t1), t2)
+
+    x0 = puntos[:, 0][:, None, None]
+    t0 = np.arctan2(puntos[:, 1], puntos[:, 2])[:, None, None] + np.array([-2*np.pi, 0, 2*np.pi])[None, None, :]
+    t1, t2, x1, x2 = (valores[None, :, None] for valores in (t1, t2, x1, x2))
+    # Regla semiabierta, un rayo que pasa por un vértice cuenta un solo cruce
+    cruza = (t1 <= t0) != (t2 <= t0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cruce = x1 + (t0 - t1)/(t2 - t1)*(x2 - x1)
+    cruces = np.sum(cruza & (x_cruce < x0), axis=(1, 2))
+    return cruces % 2 == 1